@@ -1,16 +1,49 @@
+import time
+import asyncio
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse, RedirectResponse
 from uvicorn import run as app_run
 
-from typing import Optional
+from pydantic import BaseModel
+from typing import List, Optional, Union
 
-from us_visa.constants import APP_HOST, APP_PORT
-from us_visa.pipeline.prediction_pipeline import USvisaData, USvisaClassifier
-from us_visa.pipeline.training_pipeline import TrainingPipeline
+from us_visa.constants import (
+    APP_HOST,
+    APP_PORT,
+    METRICS_ENABLED,
+    PREDICTION_BATCH_MAX_ROWS,
+)
+from us_visa.entity.config_entity import (
+    ModelWarmupConfig,
+    PredictionMicroBatcherConfig,
+    PredictionStreamConfig,
+    USvisaExecutorConfig,
+)
+from us_visa.pipeline.prediction_pipeline import (
+    USvisaData,
+    USvisaBatchData,
+    USvisaClassifier,
+)
+from us_visa.pipeline.micro_batcher import PredictionMicroBatcher
+from us_visa.pipeline.executor import USvisaExecutor
+from us_visa.pipeline.stream_prediction import NDJSONStreamPredictor
+from us_visa.pipeline.training_jobs import TrainingJobManager
+from us_visa.pipeline.warmup import USvisaModelWarmer
+from us_visa.monitoring.metrics import (
+    FORM_PARSE_SECONDS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    PREDICTION_ERRORS,
+    PREDICTIONS_IN_FLIGHT,
+    REGISTRY,
+)
+from us_visa.logger import logging
 
 app = FastAPI()
 
@@ -29,6 +62,85 @@ app.add_middleware(
 )
 
 
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests by route and status code and timing them.
+    It does not touch the request body, so streaming uploads keep working
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # the route template, so /train/{job_id} is one series; static files and 404s share "other"
+            route = scope.get("route")
+            route_path = getattr(route, "path", "other")
+            HTTP_REQUESTS.labels(scope["method"], route_path, status_code).inc()
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path).observe(
+                time.perf_counter() - start
+            )
+
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+executor = USvisaExecutor(executor_config=USvisaExecutorConfig())
+
+
+async def predict_records(records):
+    model_predictor = USvisaClassifier()
+
+    with PREDICTIONS_IN_FLIGHT.track_inprogress():
+        # only a missing or expired model needs the io pool, a loaded one is predicted with right away
+        if not model_predictor.model_cache.is_fresh():
+            await executor.run_io(model_predictor.load_model)
+
+        return await executor.run_predict(model_predictor.predict_records, records)
+
+
+training_job_manager = TrainingJobManager(
+    on_completed=lambda: USvisaClassifier().model_cache.invalidate()
+)
+
+model_warmup_config = ModelWarmupConfig()
+
+model_warmer = USvisaModelWarmer(model_warmup_config=model_warmup_config)
+
+micro_batcher_config = PredictionMicroBatcherConfig()
+
+micro_batcher = (
+    PredictionMicroBatcher(
+        predict_fn=predict_records,
+        micro_batcher_config=micro_batcher_config,
+    )
+    if micro_batcher_config.enabled
+    else None
+)
+
+stream_predictor = NDJSONStreamPredictor(
+    predict_fn=predict_records,
+    prediction_stream_config=PredictionStreamConfig(),
+)
+
+
 class DataForm:
     def __init__(self, request: Request):
         self.request: Request = request
@@ -57,6 +169,49 @@ class DataForm:
         self.full_time_position = form.get("full_time_position")
 
 
+class USvisaApplication(BaseModel):
+    continent: str
+    education_of_employee: str
+    has_job_experience: str
+    requires_job_training: str
+    no_of_employees: Union[int, float, str]
+    company_age: Union[int, float, str]
+    region_of_employment: str
+    prevailing_wage: Union[int, float, str]
+    unit_of_wage: str
+    full_time_position: str
+
+
+class USvisaBatchRequest(BaseModel):
+    applications: List[USvisaApplication]
+
+
+async def warm_up_until_ready():
+    while not model_warmer.is_ready:
+        try:
+            await executor.run_io(model_warmer.warm_up)
+        except Exception as e:
+            logging.info(
+                f"Model warm up failed, retrying in {model_warmup_config.retry_seconds} seconds: {e}"
+            )
+            await asyncio.sleep(model_warmup_config.retry_seconds)
+
+
+@app.on_event("startup")
+async def start_model_warmup():
+    app.state.warmup_task = asyncio.create_task(warm_up_until_ready())
+
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    USvisaExecutor.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_training_jobs():
+    training_job_manager.shutdown()
+
+
 @app.get("/", tags=["authentication"])
 async def index(request: Request):
 
@@ -65,24 +220,65 @@ async def index(request: Request):
     )
 
 
+@app.get("/health")
+async def healthRouteClient():
+    return {"status": True}
+
+
+@app.get("/ready")
+async def readyRouteClient():
+    return JSONResponse(
+        status_code=200 if model_warmer.is_ready else 503,
+        content=model_warmer.status(),
+    )
+
+
+@app.get("/metrics")
+async def metricsRouteClient():
+    if not METRICS_ENABLED:
+        return Response(status_code=404)
+
+    return PlainTextResponse(REGISTRY.exposition(), media_type=REGISTRY.content_type)
+
+
 @app.get("/train")
 async def trainRouteClient():
     try:
-        train_pipeline = TrainingPipeline()
+        training_job = await executor.run_io(training_job_manager.submit)
+
+        return {"status": True, "job": training_job.to_dict()}
+
+    except Exception as e:
+        return {"status": False, "error": f"{e}"}
+
+
+@app.get("/train/{job_id}")
+async def trainStatusRouteClient(job_id: str):
+    training_job = training_job_manager.get_job(job_id)
+
+    if training_job is None:
+        return {"status": False, "error": f"Training job {job_id} not found"}
+
+    return {"status": True, "job": training_job.to_dict()}
+
 
-        train_pipeline.run_pipeline()
+@app.post("/model/reload")
+async def reloadModelRouteClient():
+    try:
+        await executor.run_io(USvisaClassifier().reload_model)
 
-        return Response("Training successful !!")
+        return {"status": True}
 
     except Exception as e:
-        return Response(f"Error Occurred! {e}")
+        return {"status": False, "error": f"{e}"}
 
 
 @app.post("/")
 async def predictRouteClient(request: Request):
     try:
         form = DataForm(request)
-        await form.get_usvisa_data()
+        with FORM_PARSE_SECONDS.time():
+            await form.get_usvisa_data()
 
         usvisa_data = USvisaData(
             continent=form.continent,
@@ -97,11 +293,13 @@ async def predictRouteClient(request: Request):
             full_time_position=form.full_time_position,
         )
 
-        usvisa_df = usvisa_data.get_usvisa_input_data_frame()
-
-        model_predictor = USvisaClassifier()
+        # a bad form fails here, not the batch it would be scored with
+        usvisa_record = USvisaBatchData.validate_application(usvisa_data.get_us_visa_data_as_record())
 
-        value = model_predictor.predict(dataframe=usvisa_df)[0]
+        if micro_batcher is not None:
+            value = await micro_batcher.predict(usvisa_record)
+        else:
+            value = (await predict_records([usvisa_record]))[0]
 
         status = None
         if value == 1:
@@ -115,8 +313,82 @@ async def predictRouteClient(request: Request):
         )
 
     except Exception as e:
+        PREDICTION_ERRORS.labels(route="/").inc()
         return {"status": False, "error": f"{e}"}
 
 
+@app.get("/predict/batcher")
+async def batcherStatsRouteClient():
+    if micro_batcher is None:
+        return {"enabled": False}
+
+    return {"enabled": True, **micro_batcher.stats()}
+
+
+@app.get("/predict/cache")
+async def predictionCacheStatsRouteClient():
+    if USvisaClassifier.prediction_cache is None:
+        return {"enabled": False}
+
+    return {"enabled": True, **USvisaClassifier.prediction_cache.stats()}
+
+
+@app.post("/predict/batch")
+async def predictBatchRouteClient(batch_request: USvisaBatchRequest):
+    try:
+        if len(batch_request.applications) > PREDICTION_BATCH_MAX_ROWS:
+            raise Exception(
+                f"Batch of {len(batch_request.applications)} rows is larger than {PREDICTION_BATCH_MAX_ROWS}"
+            )
+
+        usvisa_batch_data = USvisaBatchData(
+            applications=[
+                application.dict() for application in batch_request.applications
+            ]
+        )
+
+        usvisa_df = await executor.run_predict(
+            usvisa_batch_data.get_usvisa_input_data_frame
+        )
+
+        model_predictor = USvisaClassifier()
+
+        if not model_predictor.model_cache.is_fresh():
+            await executor.run_io(model_predictor.load_model)
+
+        predictions = await executor.run_predict(
+            model_predictor.predict_labels, dataframe=usvisa_df
+        )
+
+        return {"status": True, "predictions": predictions}
+
+    except Exception as e:
+        PREDICTION_ERRORS.labels(route="/predict/batch").inc()
+        return {"status": False, "error": f"{e}"}
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves receive() to the body iterator, so the request body can still be read
+    while the response streams; the default one consumes request messages while waiting for a disconnect.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/predict/stream")
+async def predictStreamRouteClient(request: Request):
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+
+    return UploadStreamingResponse(
+        stream_predictor.predict_stream(request.stream(), gzipped=gzipped),
+        media_type="application/x-ndjson",
+    )
+
+
 if __name__ == "__main__":
     app_run(app, host=APP_HOST, port=APP_PORT)
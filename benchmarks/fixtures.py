@@ -0,0 +1,120 @@
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+from us_visa.components.data_ingestion import DataIngestion
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.components.model_trainer import ModelTrainer
+from us_visa.constants import *
+from us_visa.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
+from us_visa.entity.config_entity import (
+    DataIngestionConfig,
+    DataTransformationConfig,
+    ModelTrainerConfig,
+)
+from us_visa.entity.model_bundle import get_bundle_path
+from us_visa.logger import logging
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_FILE_PATH = os.path.join("Notebook", "Visadataset.csv")
+BENCHMARK_MODEL_CONFIG_FILE_PATH = os.path.join(BENCHMARK_DIR, "model.yaml")
+
+
+@dataclass
+class BenchmarkModel:
+    model_file_path: str
+    bundle_file_path: str
+    test_file_path: str
+
+
+def train_benchmark_model(
+    work_dir: str,
+    dataset_file_path: str = DATASET_FILE_PATH,
+    model_config_file_path: str = BENCHMARK_MODEL_CONFIG_FILE_PATH,
+    retrain: bool = False,
+) -> BenchmarkModel:
+    """
+    Train a model from the csv dataset with the training components, reading no mongo collection and
+    writing to no s3 bucket. The model of an earlier run in work_dir is reused unless retrain is set
+    :param work_dir: Directory for the artifacts of the benchmark model
+    """
+    data_ingestion_config = DataIngestionConfig(
+        data_ingested_dir=os.path.join(work_dir, DATA_INGESTION_DIR_NAME),
+        feature_store_file_path=os.path.join(
+            work_dir, DATA_INGESTION_DIR_NAME, DATA_INGESTION_FEATURE_STORE, FILE_NAME
+        ),
+        training_file_path=os.path.join(
+            work_dir, DATA_INGESTION_DIR_NAME, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME
+        ),
+        testing_file_path=os.path.join(
+            work_dir, DATA_INGESTION_DIR_NAME, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME
+        ),
+    )
+    data_transformation_dir = os.path.join(work_dir, DATA_TRANSFORMATION_DIR)
+    data_transformation_config = DataTransformationConfig(
+        data_transformation_dir=data_transformation_dir,
+        transformed_obj_file_path=os.path.join(
+            data_transformation_dir,
+            DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+            PREPROCESSING_OBJ_FILE_NAME,
+        ),
+        transformed_train_file_path=os.path.join(
+            data_transformation_dir,
+            DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+            TRAIN_FILE_NAME_NUMPY,
+        ),
+        transformed_test_file_path=os.path.join(
+            data_transformation_dir,
+            DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+            TEST_FILE_NAME_NUMPY,
+        ),
+    )
+    model_trainer_dir = os.path.join(work_dir, MODEL_TRAINER_DIR_NAME)
+    model_trainer_config = ModelTrainerConfig(
+        model_trainer_dir=model_trainer_dir,
+        trained_model_file_path=os.path.join(
+            model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, TRAINED_MODEL_FILENAME
+        ),
+        model_trainer_config_file_path=model_config_file_path,
+        knn_report_file_path=os.path.join(
+            model_trainer_dir, MODEL_TRAINER_KNN_REPORT_FILE_NAME
+        ),
+    )
+
+    benchmark_model = BenchmarkModel(
+        model_file_path=model_trainer_config.trained_model_file_path,
+        bundle_file_path=get_bundle_path(model_trainer_config.trained_model_file_path),
+        test_file_path=data_ingestion_config.testing_file_path,
+    )
+    if not retrain and all(
+        os.path.exists(path)
+        for path in (benchmark_model.model_file_path, benchmark_model.test_file_path)
+    ):
+        logging.info(f"Reusing benchmark model {benchmark_model.model_file_path}")
+        return benchmark_model
+
+    logging.info(f"Training benchmark model from {dataset_file_path} in {work_dir}")
+    data_ingestion = DataIngestion(data_ingestion_config=data_ingestion_config)
+    data_ingestion.split_data_as_train_test(pd.read_csv(dataset_file_path))
+    data_ingestion_artifact = DataIngestionArtifact(
+        train_file_path=data_ingestion_config.training_file_path,
+        test_file_path=data_ingestion_config.testing_file_path,
+    )
+    data_validation_artifact = DataValidationArtifact(
+        drift_report_file_path="", validation_status=True, validation_error_message=""
+    )
+
+    data_transformation_artifact = DataTransformation(
+        data_transformation_config=data_transformation_config,
+        data_ingestion_artifact=data_ingestion_artifact,
+        data_validation_artifact=data_validation_artifact,
+    ).initiate_data_transformation()
+
+    ModelTrainer(
+        model_trainer_config=model_trainer_config,
+        data_transformation_artifact=data_transformation_artifact,
+    ).initiate_model_trainer()
+
+    return benchmark_model
@@ -0,0 +1,121 @@
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Callable, List
+
+import numpy as np
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    rows_per_call: int
+    iterations: int
+    total_seconds: float
+    calls_per_second: float
+    rows_per_second: float
+    mean_ms: float
+    min_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    # measured in a separate pass, tracemalloc slows the calls down
+    alloc_peak_kib: float
+    alloc_retained_kib: float
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class BenchmarkConfig:
+    warmup_calls: int = 3
+    min_iterations: int = 5
+    max_iterations: int = 2000
+    min_seconds: float = 1.0
+    alloc_iterations: int = 3
+
+
+def measure_allocations(fn: Callable[[], object], iterations: int) -> tuple:
+    """
+    :return: (largest traced peak of one call, memory still allocated after the calls) in KiB
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            fn()
+            _, call_peak = tracemalloc.get_traced_memory()
+            peak = max(peak, call_peak - start)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024, max(retained - baseline, 0) / 1024
+
+
+def run_benchmark(
+    name: str,
+    fn: Callable[[], object],
+    rows_per_call: int = 1,
+    benchmark_config: BenchmarkConfig = BenchmarkConfig(),
+) -> BenchmarkResult:
+    """
+    Call fn until both min_iterations calls and min_seconds have passed, at most max_iterations times,
+    and time every call on its own so the percentiles show the tail and not only the mean
+    """
+    for _ in range(benchmark_config.warmup_calls):
+        fn()
+
+    durations: List[float] = []
+    start = time.perf_counter()
+    while len(durations) < benchmark_config.max_iterations:
+        call_start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - call_start)
+        if (
+            len(durations) >= benchmark_config.min_iterations
+            and time.perf_counter() - start >= benchmark_config.min_seconds
+        ):
+            break
+    total_seconds = time.perf_counter() - start
+
+    alloc_peak_kib, alloc_retained_kib = measure_allocations(
+        fn, benchmark_config.alloc_iterations
+    )
+
+    durations_ms = np.array(durations) * 1000
+    measured_seconds = float(np.sum(durations))
+    return BenchmarkResult(
+        name=name,
+        rows_per_call=rows_per_call,
+        iterations=len(durations),
+        total_seconds=round(total_seconds, 6),
+        calls_per_second=round(len(durations) / measured_seconds, 3),
+        rows_per_second=round(len(durations) * rows_per_call / measured_seconds, 3),
+        mean_ms=round(float(durations_ms.mean()), 6),
+        min_ms=round(float(durations_ms.min()), 6),
+        p50_ms=round(float(np.percentile(durations_ms, 50)), 6),
+        p90_ms=round(float(np.percentile(durations_ms, 90)), 6),
+        p99_ms=round(float(np.percentile(durations_ms, 99)), 6),
+        max_ms=round(float(durations_ms.max()), 6),
+        alloc_peak_kib=round(alloc_peak_kib, 3),
+        alloc_retained_kib=round(alloc_retained_kib, 3),
+    )
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    header = f"{'case':<36}{'iters':>7}{'rows/s':>14}{'p50 ms':>11}{'p99 ms':>11}{'peak KiB':>11}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.name:<36}{result.iterations:>7}{result.rows_per_second:>14.1f}"
+            f"{result.p50_ms:>11.3f}{result.p99_ms:>11.3f}{result.alloc_peak_kib:>11.1f}"
+        )
+    return "\n".join(lines)
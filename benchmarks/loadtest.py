@@ -0,0 +1,409 @@
+"""
+Load test of the FastAPI app on one box, run from the repository root:
+
+    python -m benchmarks.loadtest --workers 1 --workers 2 --endpoint form --endpoint batch
+
+The benchmark model (see benchmarks.fixtures) is preloaded into a local S3 stand-in and the app is
+started with uvicorn against it, once per worker count. Every endpoint is then driven open loop at
+increasing request rates: requests are sent on schedule whether or not the earlier ones returned,
+and latency is measured from the scheduled send time, so a saturated server shows up as growing
+latency instead of a slower client. The results are written as json.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fixtures import train_benchmark_model
+from benchmarks.local_s3 import LocalS3Server
+from benchmarks.run_benchmarks import get_environment, load_records
+from us_visa.constants import MODEL_BUCKET_NAME, MODEL_FILE_NAME
+from us_visa.entity.model_bundle import get_bundle_path
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class LoadStepResult:
+    workers: int
+    endpoint: str
+    target_rps: float
+    duration_seconds: float
+    sent: int
+    succeeded: int
+    failed: int
+    # not sent because max_in_flight requests were already waiting, the client side of saturation
+    skipped: int
+    # failed and skipped requests over all requests due in the step
+    error_rate: float
+    achieved_rps: float
+    rows_per_second: float
+    p50_ms: Optional[float]
+    p90_ms: Optional[float]
+    p99_ms: Optional[float]
+    max_ms: Optional[float]
+    saturated: bool
+
+
+@dataclass
+class Endpoint:
+    name: str
+    rows_per_request: int
+    send: Callable
+
+
+def make_endpoints(records: List[dict], batch_size: int) -> Dict[str, Endpoint]:
+    forms = [{key: str(value) for key, value in record.items()} for record in records]
+    batches = [
+        records[start : start + batch_size]
+        for start in range(0, len(records) - batch_size + 1, batch_size)
+    ]
+    position = {"form": 0, "batch": 0, "stream": 0}
+
+    def next_item(name: str, items: list):
+        item = items[position[name] % len(items)]
+        position[name] += 1
+        return item
+
+    async def post_form(client: httpx.AsyncClient) -> bool:
+        response = await client.post("/", data=next_item("form", forms))
+        return response.status_code == 200 and response.headers.get(
+            "content-type", ""
+        ).startswith("text/html")
+
+    async def post_batch(client: httpx.AsyncClient) -> bool:
+        response = await client.post(
+            "/predict/batch", json={"applications": next_item("batch", batches)}
+        )
+        return response.status_code == 200 and response.json().get("status") is True
+
+    async def post_stream(client: httpx.AsyncClient) -> bool:
+        body = "\n".join(json.dumps(record) for record in next_item("stream", batches))
+        response = await client.post(
+            "/predict/stream",
+            content=body.encode(),
+            headers={"content-type": "application/x-ndjson"},
+        )
+        if response.status_code != 200:
+            return False
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        return len(lines) == batch_size and all("error" not in line for line in lines)
+
+    return {
+        "form": Endpoint("form", 1, post_form),
+        "batch": Endpoint("batch", batch_size, post_batch),
+        "stream": Endpoint("stream", batch_size, post_stream),
+    }
+
+
+async def run_step(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    target_rps: float,
+    duration_seconds: float,
+    max_in_flight: int,
+) -> dict:
+    loop = asyncio.get_running_loop()
+    latencies, outcomes = [], []
+    in_flight = 0
+    skipped = 0
+
+    async def send(scheduled: float) -> None:
+        nonlocal in_flight
+        try:
+            ok = await endpoint.send(client)
+        except Exception:
+            ok = False
+        finally:
+            in_flight -= 1
+        latencies.append(loop.time() - scheduled)
+        outcomes.append(ok)
+
+    tasks = []
+    start = loop.time()
+    n_requests = max(int(target_rps * duration_seconds), 1)
+    for i in range(n_requests):
+        scheduled = start + i / target_rps
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if in_flight >= max_in_flight:
+            skipped += 1
+            continue
+        in_flight += 1
+        tasks.append(asyncio.create_task(send(scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+
+    return {
+        "latencies": np.array(latencies) * 1000,
+        "outcomes": np.array(outcomes, dtype=bool),
+        "skipped": skipped,
+        "elapsed": elapsed,
+    }
+
+
+def summarize_step(
+    workers: int,
+    endpoint: Endpoint,
+    target_rps: float,
+    step: dict,
+    slo_p99_ms: float,
+    max_error_rate: float,
+) -> LoadStepResult:
+    outcomes, latencies = step["outcomes"], step["latencies"]
+    succeeded = int(outcomes.sum())
+    sent = len(outcomes)
+    attempted = sent + step["skipped"]
+    error_rate = (attempted - succeeded) / attempted if attempted else 0.0
+    achieved_rps = succeeded / step["elapsed"]
+    ok_latencies = latencies[outcomes]
+
+    def percentile(q: float) -> Optional[float]:
+        if not len(ok_latencies):
+            return None
+        return round(float(np.percentile(ok_latencies, q)), 3)
+
+    p99_ms = percentile(99)
+    saturated = (
+        error_rate > max_error_rate
+        or achieved_rps < 0.9 * target_rps
+        or p99_ms is None
+        or p99_ms > slo_p99_ms
+    )
+    return LoadStepResult(
+        workers=workers,
+        endpoint=endpoint.name,
+        target_rps=target_rps,
+        duration_seconds=round(step["elapsed"], 3),
+        sent=sent,
+        succeeded=succeeded,
+        failed=sent - succeeded,
+        skipped=step["skipped"],
+        error_rate=round(error_rate, 6),
+        achieved_rps=round(achieved_rps, 3),
+        rows_per_second=round(achieved_rps * endpoint.rows_per_request, 3),
+        p50_ms=percentile(50),
+        p90_ms=percentile(90),
+        p99_ms=p99_ms,
+        max_ms=round(float(ok_latencies.max()), 3) if len(ok_latencies) else None,
+        saturated=saturated,
+    )
+
+
+async def ramp_endpoint(base_url: str, workers: int, endpoint: Endpoint, args) -> List[LoadStepResult]:
+    """
+    Step through the request rates until one of them saturates the app
+    """
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    timeout = httpx.Timeout(args.request_timeout)
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        if args.warmup_seconds > 0:
+            await run_step(client, endpoint, args.rates[0], args.warmup_seconds, args.max_in_flight)
+
+        for target_rps in args.rates:
+            step = await run_step(client, endpoint, target_rps, args.duration, args.max_in_flight)
+            result = summarize_step(
+                workers, endpoint, target_rps, step, args.slo_p99_ms, args.max_error_rate
+            )
+            print(
+                f"workers={workers} {endpoint.name} target {target_rps:g} rps: "
+                f"achieved {result.achieved_rps:.1f} rps, p50 {result.p50_ms} ms, "
+                f"p99 {result.p99_ms} ms, errors {result.error_rate:.2%}"
+                + (" (saturated)" if result.saturated else ""),
+                flush=True,
+            )
+            results.append(result)
+            if result.saturated and not args.no_stop_on_saturation:
+                break
+    return results
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(workers: int, env: dict, ready_timeout: float) -> tuple:
+    """
+    Start app.py with uvicorn and wait until /ready reports the model warmed up
+    :return: (process, base url)
+    """
+    port = get_free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--workers", str(workers),
+            "--log-level", "warning",
+        ],
+        cwd=REPO_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + ready_timeout
+    # every worker warms up on its own and /ready answers from one of them, so ask a few times in a row
+    ready_in_a_row = 0
+    while ready_in_a_row < 2 * workers:
+        if process.poll() is not None:
+            raise Exception(f"App exited with code {process.returncode} before it was ready")
+        if time.monotonic() > deadline:
+            stop_app(process)
+            raise Exception(f"App was not ready after {ready_timeout} seconds")
+        try:
+            ready = httpx.get(f"{base_url}/ready", timeout=5).status_code == 200
+        except httpx.HTTPError:
+            ready = False
+        ready_in_a_row = ready_in_a_row + 1 if ready else 0
+        time.sleep(0.1 if ready else 0.5)
+    return process, base_url
+
+
+def stop_app(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def saturation_summary(results: List[LoadStepResult]) -> List[dict]:
+    """
+    Highest rate every (workers, endpoint) pair served within the latency and error limits
+    """
+    summary = []
+    for key in dict.fromkeys((result.workers, result.endpoint) for result in results):
+        steps = [result for result in results if (result.workers, result.endpoint) == key]
+        within_limits = [step for step in steps if not step.saturated]
+        best = max(within_limits, key=lambda step: step.achieved_rps, default=None)
+        summary.append(
+            {
+                "workers": key[0],
+                "endpoint": key[1],
+                "saturation_rps": best.achieved_rps if best else 0.0,
+                "saturation_rows_per_second": best.rows_per_second if best else 0.0,
+                "p99_ms_at_saturation": best.p99_ms if best else None,
+                "max_achieved_rps": max(step.achieved_rps for step in steps),
+            }
+        )
+    return summary
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Load test the us visa app against a local S3 stand-in")
+    parser.add_argument("--workers", type=int, action="append", help="uvicorn worker counts, default 1")
+    parser.add_argument(
+        "--endpoint",
+        action="append",
+        choices=["form", "batch", "stream"],
+        help="Endpoints to load, default form and batch",
+    )
+    parser.add_argument(
+        "--rates",
+        type=lambda value: [float(rate) for rate in value.split(",")],
+        default=[5, 10, 20, 40, 80, 160, 320, 640],
+        help="Comma separated requests per second, stepped through in order",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per rate step")
+    parser.add_argument("--warmup-seconds", type=float, default=3.0)
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per batch and stream request")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--slo-p99-ms", type=float, default=1000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--no-stop-on-saturation", action="store_true")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--app-env",
+        action="append",
+        default=[],
+        help="NAME=VALUE environment variable for the app, e.g. PREDICTION_MICRO_BATCH_ENABLED=true",
+    )
+    parser.add_argument("--work-dir", default=os.path.join("benchmarks", ".work"))
+    parser.add_argument(
+        "--output",
+        default=os.path.join(
+            "benchmarks",
+            "results",
+            f"loadtest_{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.json",
+        ),
+    )
+    args = parser.parse_args(argv)
+    args.workers = args.workers or [1]
+    args.endpoint = args.endpoint or ["form", "batch"]
+
+    benchmark_model = train_benchmark_model(args.work_dir)
+    endpoints = make_endpoints(load_records(benchmark_model.test_file_path), args.batch_size)
+
+    results: List[LoadStepResult] = []
+    with tempfile.TemporaryDirectory() as run_dir:
+        with LocalS3Server(os.path.join(run_dir, "s3")) as local_s3:
+            local_s3.put_file(MODEL_BUCKET_NAME, MODEL_FILE_NAME, benchmark_model.model_file_path)
+            if os.path.exists(benchmark_model.bundle_file_path):
+                local_s3.put_file(
+                    MODEL_BUCKET_NAME,
+                    get_bundle_path(MODEL_FILE_NAME),
+                    benchmark_model.bundle_file_path,
+                )
+
+            app_env = {
+                **os.environ,
+                "AWS_ACCESS_KEY_ID": "loadtest",
+                "AWS_SECRET_ACCESS_KEY": "loadtest",
+                "AWS_S3_ENDPOINT_URL": local_s3.endpoint_url,
+                "S3_CACHE_DIR": os.path.join(run_dir, "s3_cache"),
+                "PREDICTION_CACHE_ENABLED": "false",
+                "MODEL_CACHE_TTL_SECONDS": "0",
+            }
+            app_env.update(dict(entry.split("=", 1) for entry in args.app_env))
+
+            for workers in args.workers:
+                process, base_url = start_app(workers, app_env, args.ready_timeout)
+                try:
+                    for endpoint_name in args.endpoint:
+                        results += asyncio.run(
+                            ramp_endpoint(base_url, workers, endpoints[endpoint_name], args)
+                        )
+                finally:
+                    stop_app(process)
+
+    summary = saturation_summary(results)
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "environment": get_environment(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "work_dir")
+        },
+        "saturation": summary,
+        "steps": [asdict(result) for result in results],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for entry in summary:
+        print(
+            f"workers={entry['workers']} {entry['endpoint']}: saturation {entry['saturation_rps']} rps "
+            f"({entry['saturation_rows_per_second']} rows/s), p99 {entry['p99_ms_at_saturation']} ms"
+        )
+    print(f"Wrote {len(results)} steps to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+
+class LocalS3RequestHandler(BaseHTTPRequestHandler):
+    """
+    Path style S3 requests on top of a directory: the first path segment is the bucket, the rest the key.
+    Covers what the app and the pipeline send: GET with If-None-Match, If-Match and Range, HEAD, PUT, DELETE,
+    multipart uploads and ListObjects v1/v2 by prefix. Requests are not authenticated.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: "LocalS3Server"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _split_path(self) -> Tuple[str, str, dict]:
+        url = urlparse(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+
+    def _object_path(self, bucket: str, key: str) -> str:
+        root = os.path.realpath(self.server.root_dir)
+        path = os.path.realpath(os.path.join(root, bucket, key))
+        if not path.startswith(root + os.sep):
+            raise PermissionError(key)
+        return path
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_error(self, status: int, code: str, resource: str = "") -> None:
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f"<Error><Code>{code}</Code><Message>{code}</Message>"
+            f"<Resource>{escape(resource)}</Resource></Error>"
+        ).encode()
+        self._send(status, body, {"Content-Type": "application/xml"})
+
+    def _read_body(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if "aws-chunked" in self.headers.get("Content-Encoding", ""):
+            body = self._decode_aws_chunked(body)
+        return body
+
+    @staticmethod
+    def _decode_aws_chunked(body: bytes) -> bytes:
+        # <hex size>[;chunk-signature=...]\r\n<data>\r\n ... 0\r\n<trailers>
+        decoded, position = [], 0
+        while True:
+            line_end = body.index(b"\r\n", position)
+            size = int(body[position:line_end].split(b";")[0], 16)
+            if size == 0:
+                return b"".join(decoded)
+            decoded.append(body[line_end + 2 : line_end + 2 + size])
+            position = line_end + 2 + size + 2
+
+    def _object_headers(self, path: str) -> dict:
+        stat = os.stat(path)
+        return {
+            "ETag": f'"{self.server.etag(path, stat)}"',
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Content-Type": "binary/octet-stream",
+            "Accept-Ranges": "bytes",
+        }
+
+    def do_HEAD(self) -> None:
+        self.do_GET()
+
+    def do_GET(self) -> None:
+        bucket, key, query = self._split_path()
+        if not key:
+            return self._list_objects(bucket, query)
+
+        path = self._object_path(bucket, key)
+        if not os.path.isfile(path):
+            return self._send_error(404, "NoSuchKey", key)
+
+        headers = self._object_headers(path)
+        if self.headers.get("If-None-Match") in (headers["ETag"], headers["ETag"].strip('"')):
+            return self._send(304, headers={**headers, "Content-Length": "0"})
+        if_match = self.headers.get("If-Match")
+        if if_match is not None and if_match not in (headers["ETag"], headers["ETag"].strip('"')):
+            return self._send_error(412, "PreconditionFailed", key)
+
+        size = os.path.getsize(path)
+        start, end, status = 0, size - 1, 200
+        range_match = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        if range_match and size:
+            first, last = range_match.groups()
+            if first:
+                start, end = int(first), min(int(last), size - 1) if last else size - 1
+            else:
+                start = max(size - int(last), 0)
+            if start > end:
+                return self._send_error(416, "InvalidRange", key)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        length = max(end - start + 1, 0)
+        headers["Content-Length"] = str(length)
+        self._send(status, headers=headers)
+        if self.command == "HEAD":
+            return
+        with open(path, "rb") as object_file:
+            object_file.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = object_file.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def do_PUT(self) -> None:
+        bucket, key, query = self._split_path()
+        body = self._read_body()
+        if "uploadId" in query:
+            return self._upload_part(query, body)
+        if not key:
+            os.makedirs(os.path.join(self.server.root_dir, bucket), exist_ok=True)
+            return self._send(200)
+
+        if not os.path.isdir(os.path.join(self.server.root_dir, bucket)):
+            return self._send_error(404, "NoSuchBucket", bucket)
+        path = self._object_path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as object_file:
+            object_file.write(body)
+        os.replace(tmp_path, path)
+        self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def do_POST(self) -> None:
+        bucket, key, query = self._split_path()
+        body = self._read_body()
+        if "uploads" in query:
+            return self._create_multipart_upload(bucket, key)
+        if "uploadId" in query:
+            return self._complete_multipart_upload(bucket, key, query, body)
+        self._send_error(400, "InvalidRequest", key)
+
+    def _upload_dir(self, query: dict) -> str:
+        upload_id = query["uploadId"][0]
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            raise PermissionError(upload_id)
+        return os.path.join(self.server.root_dir, ".uploads", upload_id)
+
+    def _create_multipart_upload(self, bucket: str, key: str) -> None:
+        if not os.path.isdir(os.path.join(self.server.root_dir, bucket)):
+            return self._send_error(404, "NoSuchBucket", bucket)
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.server.root_dir, ".uploads", upload_id))
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult>'
+            f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+            f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+        ).encode()
+        self._send(200, body, {"Content-Type": "application/xml"})
+
+    def _upload_part(self, query: dict, body: bytes) -> None:
+        upload_dir = self._upload_dir(query)
+        if not os.path.isdir(upload_dir):
+            return self._send_error(404, "NoSuchUpload", query["uploadId"][0])
+        part_number = int(query["partNumber"][0])
+        with open(os.path.join(upload_dir, f"{part_number:05d}"), "wb") as part_file:
+            part_file.write(body)
+        self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def _complete_multipart_upload(self, bucket: str, key: str, query: dict, body: bytes) -> None:
+        upload_dir = self._upload_dir(query)
+        if not os.path.isdir(upload_dir):
+            return self._send_error(404, "NoSuchUpload", query["uploadId"][0])
+        part_numbers = [int(number) for number in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+
+        path = self._object_path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as object_file:
+            for part_number in sorted(part_numbers):
+                with open(os.path.join(upload_dir, f"{part_number:05d}"), "rb") as part_file:
+                    shutil.copyfileobj(part_file, object_file)
+        os.replace(tmp_path, path)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+        etag = f'"{self.server.etag(path, os.stat(path))}"'
+        result = (
+            '<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult>'
+            f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+            f"<ETag>{escape(etag)}</ETag></CompleteMultipartUploadResult>"
+        ).encode()
+        self._send(200, result, {"Content-Type": "application/xml"})
+
+    def do_DELETE(self) -> None:
+        bucket, key, query = self._split_path()
+        if "uploadId" in query:
+            shutil.rmtree(self._upload_dir(query), ignore_errors=True)
+            return self._send(204)
+        path = self._object_path(bucket, key)
+        if os.path.isfile(path):
+            os.remove(path)
+        self._send(204)
+
+    def _list_objects(self, bucket: str, query: dict) -> None:
+        bucket_dir = os.path.join(self.server.root_dir, bucket)
+        if not os.path.isdir(bucket_dir):
+            return self._send_error(404, "NoSuchBucket", bucket)
+
+        prefix = query.get("prefix", [""])[0]
+        max_keys = int(query.get("max-keys", ["1000"])[0])
+        keys = []
+        for directory, _, file_names in os.walk(bucket_dir):
+            for file_name in file_names:
+                if file_name.endswith(".tmp"):
+                    continue
+                key = os.path.relpath(os.path.join(directory, file_name), bucket_dir)
+                key = key.replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        keys.sort()
+        truncated = len(keys) > max_keys
+        keys = keys[:max_keys]
+
+        contents = []
+        for key in keys:
+            path = os.path.join(bucket_dir, key)
+            stat = os.stat(path)
+            modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+            contents.append(
+                f"<Contents><Key>{escape(key)}</Key>"
+                f"<LastModified>{modified.strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified>"
+                f'<ETag>"{self.server.etag(path, stat)}"</ETag>'
+                f"<Size>{stat.st_size}</Size><StorageClass>STANDARD</StorageClass></Contents>"
+            )
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>"
+            f"<KeyCount>{len(keys)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+            + "".join(contents)
+            + "</ListBucketResult>"
+        ).encode()
+        self._send(200, body, {"Content-Type": "application/xml"})
+
+
+class LocalS3Server(ThreadingHTTPServer):
+    """
+    Local stand-in for the s3 bucket of the app, serving the files below root_dir over the S3 REST api.
+    Point boto3 at it with the AWS_S3_ENDPOINT_URL environment variable
+    """
+
+    daemon_threads = True
+
+    def __init__(self, root_dir: str, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        :param root_dir: Directory holding one sub directory per bucket
+        :param port: Port to listen on, 0 picks a free one
+        """
+        os.makedirs(root_dir, exist_ok=True)
+        self.root_dir = root_dir
+        self._etags = {}
+        self._thread: Optional[threading.Thread] = None
+        super().__init__((host, port), LocalS3RequestHandler)
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def etag(self, path: str, stat: os.stat_result) -> str:
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        etag = self._etags.get(key)
+        if etag is None:
+            digest = hashlib.md5()
+            with open(path, "rb") as object_file:
+                for chunk in iter(lambda: object_file.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            etag = self._etags[key] = digest.hexdigest()
+        return etag
+
+    def put_file(self, bucket_name: str, key: str, file_path: str) -> None:
+        """
+        Preload a local file into the bucket
+        """
+        object_path = os.path.join(self.root_dir, bucket_name, key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        with open(file_path, "rb") as source, open(object_path, "wb") as target:
+            for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                target.write(chunk)
+
+    def start(self) -> "LocalS3Server":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "LocalS3Server":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
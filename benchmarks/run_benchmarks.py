@@ -0,0 +1,266 @@
+"""
+Micro benchmarks of the prediction path, run from the repository root:
+
+    python -m benchmarks.run_benchmarks --output benchmarks/results/latest.json
+
+A small model is trained offline from Notebook/Visadataset.csv with the training components,
+no mongo collection and no s3 bucket is used. Every case reports throughput, latency percentiles
+and the traced allocations of one call, and the results are written as json next to the
+versions of the libraries and the commit they were measured on.
+"""
+import os
+
+# never reload the model by age and score every request, so repeated records measure the model
+os.environ.setdefault("MODEL_CACHE_TTL_SECONDS", "0")
+os.environ.setdefault("PREDICTION_CACHE_ENABLED", "false")
+
+import json
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.fixtures import BenchmarkModel, train_benchmark_model
+from benchmarks.harness import (
+    BenchmarkConfig,
+    BenchmarkResult,
+    format_results,
+    run_benchmark,
+)
+from us_visa.constants import CURRENT_YEAR
+from us_visa.entity.config_entity import USvisaPredictorConfig
+from us_visa.entity.model_bundle import load_model_bundle
+from us_visa.pipeline.prediction_pipeline import USvisaBatchData, USvisaData
+from us_visa.utils.feature_store import read_dataframe
+from us_visa.utils.main_utils import load_object
+
+
+BATCH_SIZES = [1, 10, 100, 10000]
+E2E_BATCH_SIZE = 100
+E2E_CASE_NAMES = ["e2e.post_form", f"e2e.post_predict_batch_{E2E_BATCH_SIZE}"]
+
+
+def load_records(test_file_path: str) -> List[dict]:
+    """
+    Applications of the test split in the layout the api receives them
+    """
+    test_df = read_dataframe(test_file_path)
+    test_df["company_age"] = CURRENT_YEAR - test_df["yr_of_estab"]
+    return test_df[USvisaBatchData.columns].to_dict("records")
+
+
+def is_selected(name: str, selected: List[str]) -> bool:
+    return not selected or any(pattern in name for pattern in selected)
+
+
+def cycle(items: list) -> Callable[[], object]:
+    position = [0]
+
+    def next_item():
+        item = items[position[0] % len(items)]
+        position[0] += 1
+        return item
+
+    return next_item
+
+
+def make_batch(records: List[dict], batch_size: int) -> pd.DataFrame:
+    rows = [records[i % len(records)] for i in range(batch_size)]
+    return pd.DataFrame(rows, columns=USvisaBatchData.columns)
+
+
+def dataframe_build_cases(records: List[dict]) -> Dict[str, tuple]:
+    next_record = cycle(records)
+    return {
+        "usvisa_data.get_usvisa_input_data_frame": (
+            lambda: USvisaData(**next_record()).get_usvisa_input_data_frame(),
+            1,
+        )
+    }
+
+
+def predict_cases(name: str, model, records: List[dict]) -> Dict[str, tuple]:
+    cases = {}
+    for batch_size in BATCH_SIZES:
+        batch = make_batch(records, batch_size)
+        cases[f"{name}.predict.batch_{batch_size}"] = (
+            lambda batch=batch: model.predict(batch),
+            batch_size,
+        )
+    return cases
+
+
+def load_cases(benchmark_model: BenchmarkModel) -> Dict[str, tuple]:
+    cases = {
+        "load.pickle": (lambda: load_object(benchmark_model.model_file_path), 1),
+    }
+    if os.path.exists(benchmark_model.bundle_file_path):
+        cases["load.bundle"] = (
+            lambda: load_model_bundle(benchmark_model.bundle_file_path),
+            1,
+        )
+    return cases
+
+
+def e2e_cases(client, records: List[dict]) -> Dict[str, tuple]:
+    forms = [{key: str(value) for key, value in record.items()} for record in records]
+    next_form = cycle(forms)
+    batches = [
+        {"applications": records[start : start + E2E_BATCH_SIZE]}
+        for start in range(0, len(records) - E2E_BATCH_SIZE + 1, E2E_BATCH_SIZE)
+    ]
+    next_batch = cycle(batches)
+
+    def post_form():
+        response = client.post("/", data=next_form())
+        if response.status_code != 200 or "Visa" not in response.text:
+            raise Exception(f"POST / failed: {response.status_code} {response.text[:200]}")
+
+    def post_batch():
+        response = client.post("/predict/batch", json=next_batch())
+        if not response.json()["status"]:
+            raise Exception(f"POST /predict/batch failed: {response.text[:200]}")
+
+    return dict(zip(E2E_CASE_NAMES, [(post_form, 1), (post_batch, E2E_BATCH_SIZE)]))
+
+
+def run_e2e(model, records, benchmark_config, selected) -> List[BenchmarkResult]:
+    """
+    Run the api cases through the in-process test client, with the benchmark model in the model cache
+    """
+    from fastapi.testclient import TestClient
+    from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaModelCache
+    import app as usvisa_app
+
+    predictor_config = USvisaPredictorConfig()
+    USvisaModelCache(
+        bucket_name=predictor_config.model_bucket_name,
+        model_path=predictor_config.model_file_path,
+        ttl_seconds=predictor_config.model_cache_ttl_seconds,
+    ).put(model)
+
+    with TestClient(usvisa_app.app) as client:
+        return run_cases(e2e_cases(client, records), benchmark_config, selected)
+
+
+def run_cases(cases: Dict[str, tuple], benchmark_config, selected) -> List[BenchmarkResult]:
+    results = []
+    for name, (fn, rows_per_call) in cases.items():
+        if not is_selected(name, selected):
+            continue
+        result = run_benchmark(name, fn, rows_per_call, benchmark_config)
+        print(
+            f"{name}: {result.rows_per_second:.1f} rows/s, p50 {result.p50_ms:.3f} ms, p99 {result.p99_ms:.3f} ms",
+            flush=True,
+        )
+        results.append(result)
+    return results
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def get_environment() -> dict:
+    return {
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy_version": np.__version__,
+        "pandas_version": pd.__version__,
+        "sklearn_version": sklearn.__version__,
+        "git_commit": get_git_commit(),
+    }
+
+
+def main(argv=None) -> None:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description="Benchmark the us visa prediction path")
+    parser.add_argument(
+        "--output",
+        default=os.path.join(
+            "benchmarks",
+            "results",
+            f"benchmark_{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.json",
+        ),
+        help="json file to write the results to",
+    )
+    parser.add_argument(
+        "--work-dir",
+        default=os.path.join("benchmarks", ".work"),
+        help="Directory of the benchmark model, reused between runs",
+    )
+    parser.add_argument("--retrain", action="store_true", help="Train the benchmark model again")
+    parser.add_argument(
+        "--case",
+        action="append",
+        default=[],
+        help="Only run the cases whose name contains this text, can be given more than once",
+    )
+    parser.add_argument("--min-seconds", type=float, default=defaults.min_seconds)
+    parser.add_argument("--max-iterations", type=int, default=defaults.max_iterations)
+    parser.add_argument(
+        "--compile-preprocessor",
+        action="store_true",
+        help="Compile the preprocessor of the loaded model, like PREDICTION_COMPILED_PREPROCESSOR_ENABLED",
+    )
+    args = parser.parse_args(argv)
+
+    benchmark_config = BenchmarkConfig(
+        min_seconds=args.min_seconds, max_iterations=args.max_iterations
+    )
+
+    benchmark_model = train_benchmark_model(args.work_dir, retrain=args.retrain)
+    records = load_records(benchmark_model.test_file_path)
+
+    model = load_object(benchmark_model.model_file_path)
+    models = {"model": model}
+    if os.path.exists(benchmark_model.bundle_file_path):
+        models["bundle"] = load_model_bundle(benchmark_model.bundle_file_path)
+    if args.compile_preprocessor:
+        for loaded_model in models.values():
+            loaded_model.compile_preprocessor()
+
+    results = run_cases(dataframe_build_cases(records), benchmark_config, args.case)
+    for name, loaded_model in models.items():
+        results += run_cases(
+            predict_cases(name, loaded_model, records), benchmark_config, args.case
+        )
+    results += run_cases(load_cases(benchmark_model), benchmark_config, args.case)
+    if any(is_selected(name, args.case) for name in E2E_CASE_NAMES):
+        results += run_e2e(model, records, benchmark_config, args.case)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "environment": get_environment(),
+        "model": {
+            "estimator": type(getattr(model, "trained_model_object", model)).__name__,
+            "model_file_path": benchmark_model.model_file_path,
+        },
+        "config": {
+            "min_seconds": benchmark_config.min_seconds,
+            "max_iterations": benchmark_config.max_iterations,
+            "compile_preprocessor": args.compile_preprocessor,
+        },
+        "results": [result.to_dict() for result in results],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    print(format_results(results))
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
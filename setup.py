@@ -5,5 +5,10 @@ setup(
     version="0.0.0",
     author="Farhan Shaikh",
     author_email="thinkingdatascience@gmail.com",
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "tests.*"]),
+    entry_points={
+        "console_scripts": [
+            "usvisa-batch-predict=us_visa.pipeline.batch_prediction:main",
+        ],
+    },
 )
@@ -0,0 +1,345 @@
+"""
+Shared fixtures of the test suite. The models are trained on a slice of Notebook/Visadataset.csv,
+storage goes to the in-memory backend and no mongo collection or s3 bucket is needed
+"""
+import os
+
+# read when us_visa.constants is imported, so they are set before any us_visa import
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("S3_CACHE_ENABLED", "false")
+os.environ.setdefault("PREDICTION_CACHE_ENABLED", "false")
+os.environ.setdefault("TRAINING_PROFILE_ENABLED", "false")
+
+import pickle
+import random
+from typing import Iterable, List
+
+import pandas as pd
+import pytest
+from bson import ObjectId
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, PowerTransformer, StandardScaler
+
+from benchmarks.local_s3 import LocalS3Server
+from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaModelCache
+from us_visa.aws_cloud_storage.local_storage import InMemoryStorageService
+from us_visa.MongoDB.mongodb_connection import MongoDBClient
+from us_visa.constants import COLLECTION_NAME, CURRENT_YEAR, DATABASE_NAME, SCHEMA_CONFIG_FILE_PATH, TARGET_COLUMN
+from us_visa.entity.config_entity import USvisaPredictorConfig
+from us_visa.entity.estimator import TargetValueMapping, USVisaModel
+from us_visa.entity.model_bundle import get_bundle_path, save_model_bundle
+from us_visa.pipeline.prediction_pipeline import USvisaBatchData
+from us_visa.utils.main_utils import read_yaml_files, save_object
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_FILE_PATH = os.path.join(REPO_DIR, "Notebook", "Visadataset.csv")
+DATASET_ROWS = 1000
+TEST_BUCKET_NAME = "usvisa-test"
+
+
+@pytest.fixture(scope="session")
+def schema_config() -> dict:
+    return read_yaml_files(file_path=os.path.join(REPO_DIR, SCHEMA_CONFIG_FILE_PATH))
+
+
+@pytest.fixture(scope="session")
+def visa_dataframe() -> pd.DataFrame:
+    """
+    First rows of the dataset, with the columns of the mongo collection
+    """
+    return pd.read_csv(DATASET_FILE_PATH, nrows=DATASET_ROWS)
+
+
+@pytest.fixture(scope="session")
+def visa_records(visa_dataframe) -> List[dict]:
+    """
+    Applications of the dataset in the layout the api receives them
+    """
+    features = visa_dataframe.assign(company_age=CURRENT_YEAR - visa_dataframe["yr_of_estab"])
+    return features[USvisaBatchData.columns].to_dict("records")
+
+
+def _fit_model(schema_config: dict, visa_dataframe: pd.DataFrame, estimator) -> USVisaModel:
+    preprocessor = ColumnTransformer(
+        [
+            ("OneHotEncoder", OneHotEncoder(), schema_config["oh_columns"]),
+            ("OrdinalEncoder", OrdinalEncoder(), schema_config["or_columns"]),
+            (
+                "Transformer",
+                Pipeline(steps=[("transformer", PowerTransformer(method="yeo-johnson"))]),
+                schema_config["transform_columns"],
+            ),
+            ("StandardScaler", StandardScaler(), schema_config["num_features"]),
+        ]
+    )
+    features = visa_dataframe.assign(company_age=CURRENT_YEAR - visa_dataframe["yr_of_estab"])
+    features = features[USvisaBatchData.columns]
+    target = visa_dataframe[TARGET_COLUMN].replace(TargetValueMapping()._asdict()).astype(int)
+
+    estimator.fit(preprocessor.fit_transform(features), target)
+    return USVisaModel(preprocessing_object=preprocessor, trained_model_object=estimator)
+
+
+@pytest.fixture(scope="session")
+def forest_model(schema_config, visa_dataframe) -> USVisaModel:
+    return _fit_model(
+        schema_config,
+        visa_dataframe,
+        RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0),
+    )
+
+
+@pytest.fixture(scope="session")
+def knn_model(schema_config, visa_dataframe) -> USVisaModel:
+    return _fit_model(
+        schema_config,
+        visa_dataframe,
+        KNeighborsClassifier(n_neighbors=3, weights="distance", algorithm="kd_tree"),
+    )
+
+
+@pytest.fixture
+def model_file(tmp_path, forest_model) -> str:
+    """
+    The forest model pickled to a local model.pkl, with its model.bundle next to it
+    """
+    model_file_path = str(tmp_path / "model" / "model.pkl")
+    save_object(model_file_path, forest_model)
+    save_model_bundle(get_bundle_path(model_file_path), forest_model)
+    return model_file_path
+
+
+@pytest.fixture
+def local_s3(tmp_path):
+    """
+    Local s3 server with an empty test bucket, and a boto3 client of it
+    """
+    import boto3
+
+    with LocalS3Server(str(tmp_path / "s3")) as server:
+        s3_client = boto3.client(
+            "s3",
+            aws_access_key_id="test",
+            aws_secret_access_key="test",
+            region_name="us-east-1",
+            endpoint_url=server.endpoint_url,
+        )
+        s3_client.create_bucket(Bucket=TEST_BUCKET_NAME)
+        yield server, s3_client
+
+
+@pytest.fixture
+def s3_storage(tmp_path, local_s3, monkeypatch):
+    """
+    s3 storage backend of the local s3 server, without the s3 cache, sharing its bundles through tmp_path/bundles
+    """
+    import boto3
+
+    from us_visa.aws_cloud_storage.aws_connection import s3Client
+    from us_visa.aws_cloud_storage.aws_storage import SimpleStorageService
+    from us_visa.entity.config_entity import S3CacheConfig
+
+    server, s3_client = local_s3
+    s3_resource = boto3.resource(
+        "s3",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        region_name="us-east-1",
+        endpoint_url=server.endpoint_url,
+    )
+    monkeypatch.setattr(s3Client, "s3_client", s3_client)
+    monkeypatch.setattr(s3Client, "s3_resource", s3_resource)
+    return SimpleStorageService(S3CacheConfig(enabled=False), bundle_dir=str(tmp_path / "bundles"))
+
+
+@pytest.fixture
+def memory_storage() -> InMemoryStorageService:
+    InMemoryStorageService.clear()
+    yield InMemoryStorageService()
+    InMemoryStorageService.clear()
+
+
+@pytest.fixture(autouse=True)
+def empty_model_cache():
+    """
+    Every test starts without models in the process wide model cache
+    """
+    with USvisaModelCache._lock:
+        USvisaModelCache._entries.clear()
+    yield
+    with USvisaModelCache._lock:
+        USvisaModelCache._entries.clear()
+
+
+@pytest.fixture
+def stored_model(memory_storage, forest_model) -> USVisaModel:
+    """
+    The forest model pickled to the model path the prediction pipeline reads
+    """
+    predictor_config = USvisaPredictorConfig()
+    memory_storage.put_object(
+        predictor_config.model_bucket_name,
+        predictor_config.model_file_path,
+        pickle.dumps(forest_model),
+    )
+    return forest_model
+
+
+@pytest.fixture
+def app_client(stored_model):
+    """
+    Test client of the api, started with the stored model and stopped after the test
+    """
+    from fastapi.testclient import TestClient
+
+    import app as usvisa_app
+
+    with TestClient(usvisa_app.app) as client:
+        yield client
+
+
+_MISSING = object()
+
+
+def _compare(value, operator: str, operand) -> bool:
+    if value is _MISSING:
+        return operator == "$exists" and not operand
+    if operator == "$exists":
+        return bool(operand)
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+    except TypeError:
+        # values of different types never match a range, like in mongo
+        return False
+    raise NotImplementedError(operator)
+
+
+def _matches_condition(value, condition) -> bool:
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return value is not _MISSING and value == condition
+    for operator, operand in condition.items():
+        if operator == "$not":
+            if _matches_condition(value, operand):
+                return False
+        elif not _compare(value, operator, operand):
+            return False
+    return True
+
+
+def matches(document: dict, query: dict) -> bool:
+    """
+    Whether the document matches a find filter, with the operators the export queries use
+    """
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif not _matches_condition(document.get(key, _MISSING), condition):
+            return False
+    return True
+
+
+def _project(document: dict, projection: dict) -> dict:
+    if not projection:
+        return dict(document)
+    included = [name for name, value in projection.items() if value and name != "_id"]
+    projected = {name: document[name] for name in included if name in document}
+    if projection.get("_id", 1) and "_id" in document:
+        projected["_id"] = document["_id"]
+    return projected
+
+
+class FakeCursor:
+    def __init__(self, documents: List[dict]) -> None:
+        self._documents = documents
+        self.closed = False
+
+    def sort(self, field: str, direction: int) -> "FakeCursor":
+        self._documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        self._documents = self._documents[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self._documents)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for a pymongo collection: find with projection, sort and limit,
+    and aggregate with $match, $sample and $project stages
+    """
+
+    def __init__(self) -> None:
+        self.documents: List[dict] = []
+        self.queries: List[dict] = []
+
+    def insert_many(self, documents: Iterable[dict]) -> None:
+        for document in documents:
+            document = dict(document)
+            document.setdefault("_id", ObjectId())
+            self.documents.append(document)
+
+    def find(self, query: dict = None, projection: dict = None, batch_size: int = None) -> FakeCursor:
+        self.queries.append(query or {})
+        return FakeCursor(
+            [_project(document, projection) for document in self.documents if matches(document, query or {})]
+        )
+
+    def aggregate(self, pipeline: List[dict]) -> Iterable[dict]:
+        documents = list(self.documents)
+        for stage in pipeline:
+            (name, argument), = stage.items()
+            if name == "$match":
+                documents = [document for document in documents if matches(document, argument)]
+            elif name == "$sample":
+                documents = random.Random(0).sample(documents, min(argument["size"], len(documents)))
+            elif name == "$project":
+                documents = [_project(document, argument) for document in documents]
+            else:
+                raise NotImplementedError(name)
+        return iter(documents)
+
+
+class FakeMongoClient:
+    def __init__(self) -> None:
+        self._databases = {}
+
+    def __getitem__(self, database_name: str) -> dict:
+        return self._databases.setdefault(database_name, _FakeDatabase())
+
+
+class _FakeDatabase(dict):
+    def __missing__(self, collection_name: str) -> FakeCollection:
+        collection = self[collection_name] = FakeCollection()
+        return collection
+
+
+@pytest.fixture
+def mongo_collection(monkeypatch, visa_dataframe) -> FakeCollection:
+    """
+    The visa collection in a fake mongo client, loaded with the rows of the dataset
+    """
+    client = FakeMongoClient()
+    monkeypatch.setattr(MongoDBClient, "client", client)
+    collection = client[DATABASE_NAME][COLLECTION_NAME]
+    collection.insert_many(visa_dataframe.to_dict("records"))
+    return collection
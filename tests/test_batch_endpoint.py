@@ -0,0 +1,50 @@
+import app as usvisa_app
+
+from us_visa.entity.estimator import TargetValueMapping
+
+
+def test_batch_predictions_match_the_model(app_client, stored_model, visa_records):
+    records = visa_records[:20]
+
+    response = app_client.post("/predict/batch", json={"applications": records})
+
+    reverse_mapping = TargetValueMapping().reverse_mapping()
+    expected = [reverse_mapping[int(value)] for value in stored_model.predict_records(records)]
+    assert response.json() == {"status": True, "predictions": expected}
+
+
+def test_batch_larger_than_the_limit_is_rejected(app_client, monkeypatch, visa_records):
+    monkeypatch.setattr(usvisa_app, "PREDICTION_BATCH_MAX_ROWS", 2)
+
+    response = app_client.post("/predict/batch", json={"applications": visa_records[:3]})
+
+    assert response.json()["status"] is False
+    assert "larger than 2" in response.json()["error"]
+
+
+def test_application_with_a_missing_field_is_rejected(app_client, visa_records):
+    application = dict(visa_records[0])
+    del application["continent"]
+
+    response = app_client.post("/predict/batch", json={"applications": [application]})
+
+    assert response.status_code == 422
+
+
+def test_form_with_a_bad_number_is_rejected_before_scoring(app_client, visa_records):
+    form = {name: str(value) for name, value in visa_records[0].items()}
+    form["prevailing_wage"] = "a lot"
+
+    response = app_client.post("/", data=form)
+
+    assert response.json()["status"] is False
+    assert "prevailing_wage is not a number" in response.json()["error"]
+
+
+def test_form_prediction_is_rendered(app_client, visa_records):
+    form = {name: str(value) for name, value in visa_records[0].items()}
+
+    response = app_client.post("/", data=form)
+
+    assert response.status_code == 200
+    assert "Visa" in response.text
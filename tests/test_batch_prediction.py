@@ -0,0 +1,87 @@
+import os
+
+import pandas as pd
+import pytest
+
+from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaEstimator
+from us_visa.aws_cloud_storage.local_storage import InMemoryStorageService
+from us_visa.constants import CURRENT_YEAR
+from us_visa.entity.config_entity import BatchPredictionConfig, USvisaPredictorConfig
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.entity.model_bundle import get_bundle_path
+from us_visa.pipeline.batch_prediction import USvisaBatchPredictor, main
+
+
+@pytest.fixture
+def input_file(tmp_path, visa_dataframe) -> str:
+    input_file_path = str(tmp_path / "applications.csv")
+    visa_dataframe.head(250).to_csv(input_file_path, index=False)
+    return input_file_path
+
+
+def expected_labels(model, visa_dataframe) -> list:
+    features = visa_dataframe.head(250).assign(company_age=CURRENT_YEAR - visa_dataframe["yr_of_estab"])
+    reverse_mapping = TargetValueMapping().reverse_mapping()
+    return [reverse_mapping[int(value)] for value in model.predict(features)]
+
+
+def test_workers_score_the_file_in_input_order(tmp_path, input_file, model_file, forest_model, visa_dataframe):
+    output_file = str(tmp_path / "out" / "predictions.csv")
+    config = BatchPredictionConfig(chunk_size=40, n_workers=2, max_pending_chunks=3, local_model_path=model_file)
+
+    n_rows = USvisaBatchPredictor(config).predict_file(input_file, output_file)
+
+    predictions = pd.read_csv(output_file)
+    assert n_rows == 250
+    assert predictions["case_id"].tolist() == visa_dataframe["case_id"].head(250).tolist()
+    assert predictions["predicted_case_status"].tolist() == expected_labels(forest_model, visa_dataframe)
+
+
+@pytest.mark.parametrize("with_bundle", [True, False])
+def test_bucket_model_is_downloaded_once_for_all_workers(
+    tmp_path, monkeypatch, input_file, model_file, memory_storage, forest_model, visa_dataframe, with_bundle
+):
+    predictor_config = USvisaPredictorConfig()
+    memory_storage.upload_file(
+        model_file, predictor_config.model_file_path, predictor_config.model_bucket_name, remove=False
+    )
+    if with_bundle:
+        memory_storage.upload_file(
+            get_bundle_path(model_file),
+            get_bundle_path(predictor_config.model_file_path),
+            predictor_config.model_bucket_name,
+            remove=False,
+        )
+
+    downloaded = []
+    download_model = USvisaEstimator.download_model
+
+    def recording_download_model(self, dir_path):
+        downloaded.append(download_model(self, dir_path))
+        return downloaded[-1]
+
+    def no_bucket_load(*args, **kwargs):
+        raise AssertionError("The workers must not load the model from the bucket")
+
+    # the pool forks its workers, so they inherit the patched storage backend too
+    monkeypatch.setattr(USvisaEstimator, "download_model", recording_download_model)
+    monkeypatch.setattr(InMemoryStorageService, "load_model", no_bucket_load)
+    monkeypatch.setattr(InMemoryStorageService, "load_model_bundle", no_bucket_load)
+    output_file = str(tmp_path / "predictions.csv")
+
+    USvisaBatchPredictor(
+        BatchPredictionConfig(chunk_size=100, n_workers=2, use_model_bundle=with_bundle)
+    ).predict_file(input_file, output_file)
+
+    assert pd.read_csv(output_file)["predicted_case_status"].tolist() == expected_labels(forest_model, visa_dataframe)
+    assert len(downloaded) == 1
+    assert downloaded[0].endswith(".bundle" if with_bundle else ".pkl")
+    assert not os.path.exists(downloaded[0])
+
+
+def test_main_scores_a_local_model(tmp_path, input_file, model_file, forest_model, visa_dataframe):
+    output_file = str(tmp_path / "predictions.csv")
+
+    main([input_file, output_file, "--workers", "1", "--chunk-size", "100", "--model-path", model_file])
+
+    assert pd.read_csv(output_file)["predicted_case_status"].tolist() == expected_labels(forest_model, visa_dataframe)
@@ -0,0 +1,38 @@
+import pytest
+
+from benchmarks.harness import BenchmarkConfig, format_results, measure_allocations, run_benchmark
+
+QUICK_CONFIG = BenchmarkConfig(warmup_calls=1, min_iterations=5, max_iterations=20, min_seconds=0, alloc_iterations=2)
+
+
+def test_run_benchmark_times_every_call():
+    calls = []
+    result = run_benchmark("append", lambda: calls.append(1), rows_per_call=4, benchmark_config=QUICK_CONFIG)
+
+    assert result.iterations == 5
+    # warmup, timed and allocation calls
+    assert len(calls) == 1 + 5 + 2
+    assert result.min_ms <= result.p50_ms <= result.p99_ms <= result.max_ms
+    assert result.rows_per_second == pytest.approx(result.calls_per_second * 4, rel=1e-3)
+
+
+def test_iterations_stop_at_the_limit():
+    config = BenchmarkConfig(warmup_calls=0, min_iterations=1, max_iterations=7, min_seconds=60, alloc_iterations=1)
+
+    assert run_benchmark("noop", lambda: None, benchmark_config=config).iterations == 7
+
+
+def test_measure_allocations_sees_the_peak_of_a_call():
+    peak_kib, retained_kib = measure_allocations(lambda: bytearray(4 * 1024 * 1024), iterations=2)
+
+    assert peak_kib >= 4000
+    assert retained_kib < 100
+
+
+def test_format_results_has_a_line_per_case():
+    results = [run_benchmark(name, lambda: None, benchmark_config=QUICK_CONFIG) for name in ("first", "second")]
+
+    lines = format_results(results).splitlines()
+
+    assert len(lines) == 4
+    assert lines[2].startswith("first") and lines[3].startswith("second")
@@ -0,0 +1,52 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.exception import USvisaException
+
+
+@pytest.fixture(scope="module")
+def compiled_preprocessor(forest_model) -> CompiledPreprocessor:
+    return CompiledPreprocessor.compile(forest_model.preprocessing_object)
+
+
+def test_features_match_sklearn(compiled_preprocessor, forest_model, visa_records):
+    expected = forest_model.preprocessing_object.transform(pd.DataFrame(visa_records))
+
+    np.testing.assert_allclose(compiled_preprocessor.transform_records(visa_records), expected, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(
+        compiled_preprocessor.transform_frame(pd.DataFrame(visa_records)), expected, rtol=1e-5, atol=1e-5
+    )
+
+
+def test_verify_rejects_a_preprocessor_with_other_parameters(compiled_preprocessor, forest_model):
+    compiled_preprocessor.verify(forest_model.preprocessing_object)
+
+    tampered = copy.deepcopy(compiled_preprocessor)
+    numeric_block = next(block for block in tampered.blocks if block["kind"] == "numeric")
+    kind, means, scales = numeric_block["steps"][-1]
+    numeric_block["steps"][-1] = (kind, [mean + 1 for mean in means], scales)
+
+    with pytest.raises(USvisaException, match="differs from sklearn"):
+        tampered.verify(forest_model.preprocessing_object)
+
+
+def test_compiled_predictions_match_the_pickled_model(forest_model, visa_records):
+    compiled_model = copy.deepcopy(forest_model)
+    compiled_model.compile_preprocessor()
+
+    assert compiled_model.compiled_preprocessor is not None
+    mismatches = np.sum(compiled_model.predict_records(visa_records) != forest_model.predict_records(visa_records))
+    assert mismatches == 0
+
+
+def test_unknown_category_is_rejected(compiled_preprocessor, visa_records):
+    record = dict(visa_records[0], continent="Atlantis")
+
+    with pytest.raises(USvisaException, match="Atlantis"):
+        compiled_preprocessor.transform_records([record])
+    with pytest.raises(USvisaException, match="Atlantis"):
+        compiled_preprocessor.transform_frame(pd.DataFrame([record]))
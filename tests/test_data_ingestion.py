@@ -0,0 +1,124 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from us_visa.components.data_ingestion import DataIngestion
+from us_visa.constants import FILE_NAME
+from us_visa.entity.config_entity import DataIngestionConfig
+from us_visa.utils.feature_store import read_dataframe
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def ingestion_config(tmp_path) -> DataIngestionConfig:
+    return DataIngestionConfig(
+        feature_store_file_path=str(tmp_path / "feature_store" / FILE_NAME),
+        incremental=True,
+        incremental_feature_store_file_path=str(tmp_path / "incremental" / FILE_NAME),
+        watermark_file_path=str(tmp_path / "incremental" / "watermark.json"),
+        export_partitions=2,
+    )
+
+
+def _ingest(config: DataIngestionConfig):
+    return DataIngestion(config).export_data_to_feature_store()
+
+
+def _set_updated_at(collection) -> None:
+    for number, document in enumerate(collection.documents):
+        document["updated_at"] = START + timedelta(seconds=number)
+
+
+def test_first_run_exports_the_collection_and_writes_the_watermark(mongo_collection, ingestion_config):
+    dataframe = _ingest(ingestion_config)
+
+    assert len(dataframe) == len(mongo_collection.documents)
+    watermark = DataIngestion(ingestion_config).read_watermark()
+    assert watermark["value"] == max(document["_id"] for document in mongo_collection.documents)
+    assert len(read_dataframe(ingestion_config.feature_store_file_path)) == len(dataframe)
+
+
+def test_next_run_merges_new_and_updated_documents(mongo_collection, ingestion_config):
+    first = _ingest(ingestion_config)
+    updated_case_id = first.loc[0, "case_id"]
+    mongo_collection.insert_many(
+        [
+            {**mongo_collection.documents[0], "_id": ObjectId(), "prevailing_wage": 1.0},
+            {**mongo_collection.documents[1], "_id": ObjectId(), "case_id": "NEW-CASE"},
+        ]
+    )
+
+    dataframe = _ingest(ingestion_config)
+
+    assert len(dataframe) == len(first) + 1
+    assert dataframe["case_id"].is_unique
+    assert dataframe.loc[dataframe["case_id"] == updated_case_id, "prevailing_wage"].tolist() == [1.0]
+    assert "NEW-CASE" in set(dataframe["case_id"])
+
+
+def test_lookback_window_fetches_late_object_ids(mongo_collection, ingestion_config):
+    ingestion_config.watermark_lookback_seconds = 300
+    _ingest(ingestion_config)
+    now = datetime.now()
+    mongo_collection.insert_many(
+        [
+            {"_id": ObjectId.from_datetime(now - timedelta(seconds=60)), "case_id": "LATE"},
+            # a writer whose clock is late by more than the window is out of reach of an _id watermark
+            {"_id": ObjectId.from_datetime(now - timedelta(hours=1)), "case_id": "TOO-LATE"},
+        ]
+    )
+
+    case_ids = set(_ingest(ingestion_config)["case_id"])
+
+    assert "LATE" in case_ids
+    assert "TOO-LATE" not in case_ids
+
+
+def test_documents_without_the_watermark_field_are_ingested(mongo_collection, ingestion_config):
+    ingestion_config.watermark_field = "updated_at"
+    _set_updated_at(mongo_collection)
+    del mongo_collection.documents[0]["updated_at"]
+
+    first = _ingest(ingestion_config)
+    mongo_collection.insert_many([{"case_id": "NO-UPDATED-AT"}])
+    dataframe = _ingest(ingestion_config)
+
+    assert len(first) == len(mongo_collection.documents) - 1
+    assert len(dataframe) == len(mongo_collection.documents)
+    assert {mongo_collection.documents[0]["case_id"], "NO-UPDATED-AT"} <= set(dataframe["case_id"])
+
+
+def test_without_merge_key_only_new_documents_are_appended(mongo_collection, ingestion_config):
+    ingestion_config.watermark_field = "updated_at"
+    ingestion_config.merge_key = None
+    _set_updated_at(mongo_collection)
+    mongo_collection.insert_many([{"case_id": "NO-UPDATED-AT"}])
+
+    first = _ingest(ingestion_config)
+    mongo_collection.insert_many([{"case_id": "NEW-CASE", "updated_at": START + timedelta(days=1)}])
+    dataframe = _ingest(ingestion_config)
+
+    assert len(first) == len(mongo_collection.documents) - 1
+    assert len(dataframe) == len(mongo_collection.documents)
+    assert dataframe["case_id"].is_unique
+
+
+def test_nothing_to_ingest_keeps_the_store_and_the_watermark(mongo_collection, ingestion_config):
+    ingestion_config.watermark_field = "updated_at"
+    _set_updated_at(mongo_collection)
+    first = _ingest(ingestion_config)
+    watermark = DataIngestion(ingestion_config).read_watermark()
+
+    for document in mongo_collection.documents:
+        del document["updated_at"]
+    mongo_collection.queries.clear()
+    dataframe = _ingest(ingestion_config)
+
+    # only the look up of the high water mark, the collection is not exported again
+    assert len(mongo_collection.queries) == 1
+    assert len(dataframe) == len(first)
+    assert DataIngestion(ingestion_config).read_watermark()["value"] == watermark["value"]
+    assert os.path.exists(ingestion_config.feature_store_file_path)
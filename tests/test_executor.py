@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+
+from us_visa.entity.config_entity import USvisaExecutorConfig
+from us_visa.pipeline.executor import USvisaExecutor
+
+
+@pytest.fixture
+def executor():
+    USvisaExecutor.shutdown()
+    yield USvisaExecutor(executor_config=USvisaExecutorConfig(predict_workers=1, io_workers=2))
+    USvisaExecutor.shutdown()
+
+
+def current_thread_name(*args, **kwargs):
+    return threading.current_thread().name, args, kwargs
+
+
+def test_work_runs_on_its_own_pool(executor):
+    async def run():
+        return (
+            await executor.run_predict(current_thread_name, 1, key="predict"),
+            await executor.run_io(current_thread_name, 2, key="io"),
+        )
+
+    (predict_thread, predict_args, predict_kwargs), (io_thread, io_args, io_kwargs) = asyncio.run(run())
+
+    assert predict_thread.startswith("usvisa-predict")
+    assert (predict_args, predict_kwargs) == ((1,), {"key": "predict"})
+    assert io_thread.startswith("usvisa-io")
+    assert (io_args, io_kwargs) == ((2,), {"key": "io"})
+
+
+def test_blocked_io_pool_leaves_predictions_running(executor):
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.ensure_future(executor.run_io(release.wait)) for _ in range(2)]
+        thread_name, _, _ = await asyncio.wait_for(executor.run_predict(current_thread_name), 5)
+        release.set()
+        await asyncio.gather(*blocked)
+        return thread_name
+
+    assert asyncio.run(run()).startswith("usvisa-predict")
+
+
+def test_work_after_shutdown_gets_new_pools(executor):
+    USvisaExecutor.shutdown()
+
+    async def run():
+        return (
+            await executor.run_predict(current_thread_name),
+            await executor.run_io(current_thread_name),
+        )
+
+    (predict_thread, _, _), (io_thread, _, _) = asyncio.run(run())
+
+    assert predict_thread.startswith("usvisa-predict")
+    assert io_thread.startswith("usvisa-io")
+    assert USvisaExecutor.predict_pool._max_workers == 1
+    assert USvisaExecutor.io_pool._max_workers == 2
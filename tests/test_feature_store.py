@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from us_visa.utils.feature_store import (
+    FeatureStoreWriter,
+    get_arrow_schema,
+    get_file_format,
+    read_dataframe,
+    write_dataframe,
+)
+
+
+def _read_arrow_schema(file_path: str, file_format: str) -> pa.Schema:
+    if file_format == "parquet":
+        return pq.read_schema(file_path)
+    return feather.read_table(file_path).schema
+
+
+def test_arrow_schema_has_the_types_of_the_schema(schema_config, visa_dataframe):
+    arrow_schema = get_arrow_schema(schema_config, visa_dataframe.assign(extra=1.5))
+
+    assert arrow_schema.field("case_id").type == pa.string()
+    assert arrow_schema.field("no_of_employees").type == pa.int64()
+    assert arrow_schema.field("prevailing_wage").type == pa.float64()
+    assert arrow_schema.field("extra").type == pa.float64()
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet", "feather"])
+def test_round_trip_keeps_values_and_types(tmp_path, schema_config, visa_dataframe, file_format):
+    file_path = str(tmp_path / "store" / f"usvisa.{file_format}")
+
+    write_dataframe(file_path, visa_dataframe, schema_config)
+    dataframe = read_dataframe(file_path)
+
+    pd.testing.assert_frame_equal(dataframe, visa_dataframe)
+    assert dataframe["no_of_employees"].dtype == np.int64
+    assert dataframe["prevailing_wage"].dtype == np.float64
+    if file_format != "csv":
+        assert _read_arrow_schema(file_path, file_format) == get_arrow_schema(schema_config, visa_dataframe)
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "feather"])
+def test_missing_values_stay_missing(tmp_path, schema_config, visa_dataframe, file_format):
+    file_path = str(tmp_path / f"usvisa.{file_format}")
+    dataframe = visa_dataframe.head(3).copy()
+    dataframe.loc[0, "continent"] = np.nan
+    dataframe.loc[1, "prevailing_wage"] = np.nan
+
+    write_dataframe(file_path, dataframe, schema_config)
+    stored = read_dataframe(file_path)
+
+    assert pd.isna(stored.loc[0, "continent"])
+    assert np.isnan(stored.loc[1, "prevailing_wage"])
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet", "feather"])
+def test_only_the_requested_columns_are_read(tmp_path, schema_config, visa_dataframe, file_format):
+    file_path = str(tmp_path / f"usvisa.{file_format}")
+    write_dataframe(file_path, visa_dataframe, schema_config)
+
+    dataframe = read_dataframe(file_path, columns=["case_id", "prevailing_wage"])
+
+    assert list(dataframe.columns) == ["case_id", "prevailing_wage"]
+    pd.testing.assert_frame_equal(dataframe, visa_dataframe[["case_id", "prevailing_wage"]])
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet", "feather"])
+def test_writer_appends_shard_files_in_order(tmp_path, schema_config, visa_dataframe, file_format):
+    arrow_schema = get_arrow_schema(schema_config)
+    file_path = str(tmp_path / f"usvisa.{file_format}")
+    shards = [visa_dataframe.iloc[:400], visa_dataframe.iloc[400:400], visa_dataframe.iloc[400:]]
+
+    for number, shard in enumerate(shards):
+        with FeatureStoreWriter(
+            f"{file_path}.part-{number:05d}", arrow_schema, file_format=file_format, header=False
+        ) as shard_writer:
+            for start in range(0, len(shard), 128):
+                shard_writer.write(shard.iloc[start : start + 128])
+        assert shard_writer.rows == len(shard)
+
+    with FeatureStoreWriter(file_path, arrow_schema) as writer:
+        for number in range(len(shards)):
+            writer.append_file(f"{file_path}.part-{number:05d}")
+
+    pd.testing.assert_frame_equal(read_dataframe(file_path), visa_dataframe[arrow_schema.names])
+
+
+@pytest.mark.parametrize("compression", ["zstd", "lz4", "uncompressed"])
+def test_compression_codecs(tmp_path, schema_config, visa_dataframe, compression):
+    file_path = str(tmp_path / "usvisa.feather")
+
+    with FeatureStoreWriter(file_path, get_arrow_schema(schema_config), compression=compression) as writer:
+        writer.write(visa_dataframe)
+
+    pd.testing.assert_frame_equal(read_dataframe(file_path), visa_dataframe)
+
+
+def test_file_format_comes_from_the_extension():
+    assert get_file_format("artifact/usvisa.PARQUET") == "parquet"
+    assert get_file_format("usvisa.feather") == "feather"
+    with pytest.raises(Exception, match="Unknown feature store file format"):
+        get_file_format("usvisa.json")
+    with pytest.raises(Exception):
+        read_dataframe("usvisa.xlsx")
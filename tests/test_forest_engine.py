@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from us_visa.entity.forest_engine import FlatForest
+from us_visa.entity.model_bundle import read_bundle, write_bundle
+
+
+@pytest.fixture(scope="module")
+def transformed_features(forest_model, visa_records) -> np.ndarray:
+    return forest_model.preprocessing_object.transform(pd.DataFrame(visa_records))
+
+
+def test_predictions_match_sklearn(forest_model, transformed_features):
+    forest = forest_model.trained_model_object
+    flat_forest = FlatForest.from_sklearn(forest)
+
+    np.testing.assert_array_equal(flat_forest.predict_proba(transformed_features), forest.predict_proba(transformed_features))
+    assert int((flat_forest.predict(transformed_features) != forest.predict(transformed_features)).sum()) == 0
+
+
+def test_unbounded_trees_with_ties_match_sklearn(transformed_features, forest_model):
+    target = forest_model.trained_model_object.predict(transformed_features)
+    # an even number of fully grown trees on noisy labels gives exact probability ties
+    rng = np.random.default_rng(0)
+    noisy_target = np.where(rng.random(len(target)) < 0.2, 1 - target, target)
+    forest = RandomForestClassifier(n_estimators=4, random_state=0).fit(transformed_features, noisy_target)
+    flat_forest = FlatForest.from_sklearn(forest)
+
+    probe = np.vstack([transformed_features, rng.normal(size=(500, transformed_features.shape[1]))])
+    assert (forest.predict_proba(probe)[:, 0] == 0.5).any()
+    np.testing.assert_array_equal(flat_forest.predict_proba(probe), forest.predict_proba(probe))
+    np.testing.assert_array_equal(flat_forest.predict(probe), forest.predict(probe))
+
+
+def test_single_row_and_empty_batch(forest_model, transformed_features):
+    forest = forest_model.trained_model_object
+    flat_forest = FlatForest.from_sklearn(forest)
+
+    np.testing.assert_array_equal(flat_forest.predict(transformed_features[:1]), forest.predict(transformed_features[:1]))
+    assert flat_forest.predict(transformed_features[:0]).shape == (0,)
+
+
+def test_bundled_forest_matches_sklearn(tmp_path, forest_model, transformed_features):
+    flat_forest = FlatForest.from_sklearn(forest_model.trained_model_object)
+    header, arrays = flat_forest.to_bundle()
+    write_bundle(str(tmp_path / "forest.bundle"), header, arrays)
+
+    mapped_header, mapped_arrays = read_bundle(str(tmp_path / "forest.bundle"))
+    mapped_forest = FlatForest.from_bundle(mapped_header, mapped_arrays)
+
+    np.testing.assert_array_equal(
+        mapped_forest.predict(transformed_features),
+        forest_model.trained_model_object.predict(transformed_features),
+    )
+
+
+def test_model_uses_the_engine_for_small_batches(forest_model):
+    assert isinstance(forest_model.get_estimator(n_rows=1), FlatForest)
+    assert forest_model.get_estimator(n_rows=10**9) is forest_model.trained_model_object
@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.neighbors import KNeighborsClassifier
+
+from us_visa.components.model_trainer import ModelTrainer
+from us_visa.entity.config_entity import ModelTrainerConfig
+from us_visa.entity.model_bundle import BundledKNeighborsClassifier
+from us_visa.entity.neighbor_index import NEIGHBOR_INDEX_CLASSES, index_from_bundle, index_to_bundle
+
+
+@pytest.fixture(scope="module")
+def transformed_features(knn_model, visa_records) -> np.ndarray:
+    return knn_model.preprocessing_object.transform(pd.DataFrame(visa_records))
+
+
+@pytest.fixture(scope="module")
+def target(knn_model, transformed_features) -> np.ndarray:
+    return knn_model.trained_model_object.predict(transformed_features)
+
+
+@pytest.mark.parametrize("index_type", list(NEIGHBOR_INDEX_CLASSES))
+def test_bundled_index_answers_like_sklearn(index_type, transformed_features):
+    index = NEIGHBOR_INDEX_CLASSES[index_type](transformed_features, leaf_size=20)
+    header, arrays = index_to_bundle(index, transformed_features, leaf_size=20)
+
+    # the training matrix is not stored twice
+    assert any("fit_X" in entry for entry in header["state"])
+    rebuilt = index_from_bundle(header, arrays, transformed_features)
+
+    expected_distances, expected_indices = index.query(transformed_features[:50], k=5)
+    distances, indices = rebuilt.query(transformed_features[:50], k=5)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_array_equal(distances, expected_distances)
+
+
+def test_index_of_another_sklearn_version_is_rebuilt(transformed_features):
+    index = NEIGHBOR_INDEX_CLASSES["kd_tree"](transformed_features)
+    header, arrays = index_to_bundle(index, transformed_features, leaf_size=30)
+    header["sklearn_version"] = "0.0.0"
+
+    rebuilt = index_from_bundle(header, {}, transformed_features)
+
+    np.testing.assert_array_equal(
+        rebuilt.query(transformed_features[:20], k=3)[1], index.query(transformed_features[:20], k=3)[1]
+    )
+
+
+@pytest.mark.parametrize("algorithm", ["kd_tree", "ball_tree", "brute"])
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+def test_bundled_classifier_predicts_like_sklearn(algorithm, weights, transformed_features, target):
+    estimator = KNeighborsClassifier(n_neighbors=5, weights=weights, algorithm=algorithm)
+    estimator.fit(transformed_features[:800], target[:800])
+    bundled = BundledKNeighborsClassifier.from_sklearn(estimator)
+    restored = BundledKNeighborsClassifier.from_bundle(*bundled.to_bundle())
+
+    expected = estimator.predict(transformed_features[800:])
+    assert (restored.index is None) == (algorithm == "brute")
+    assert int((restored.predict(transformed_features[800:]) != expected).sum()) == 0
+
+
+def test_non_euclidean_metric_is_not_bundled(transformed_features, target):
+    estimator = KNeighborsClassifier(metric="manhattan").fit(transformed_features, target)
+
+    with pytest.raises(Exception, match="can not be bundled"):
+        BundledKNeighborsClassifier.from_sklearn(estimator)
+
+
+@pytest.mark.parametrize("max_accuracy_drop, accepted", [(1.0, True), (-1.0, False)])
+def test_knn_model_is_refitted_with_an_index(tmp_path, transformed_features, target, max_accuracy_drop, accepted):
+    rng = np.random.default_rng(0)
+    noisy_target = np.where(rng.random(len(target)) < 0.1, 1 - target, target)
+    data = np.column_stack([transformed_features, noisy_target])
+    train, test = data[:800], data[800:]
+    model = KNeighborsClassifier(n_neighbors=3, algorithm="brute").fit(train[:, :-1], train[:, -1])
+    model_trainer = ModelTrainer(
+        ModelTrainerConfig(
+            knn_index_type="ball_tree",
+            knn_prototype_reduction="enn",
+            knn_max_accuracy_drop=max_accuracy_drop,
+            knn_report_file_path=str(tmp_path / "knn_report.yaml"),
+        ),
+        data_transformation_artifact=None,
+    )
+    metric_artifact = model_trainer.get_classification_metrics(model, test[:, :-1], test[:, -1])
+
+    optimized_model, _, artifact = model_trainer.optimize_knn_model(model, train, test, metric_artifact)
+
+    assert optimized_model.get_params()["algorithm"] == "ball_tree"
+    assert bool(artifact.is_reduction_accepted) is accepted
+    assert artifact.reduced_n_samples < artifact.original_n_samples
+    assert len(optimized_model._fit_X) == (artifact.reduced_n_samples if accepted else len(train))
+    assert os.path.exists(artifact.report_file_path)
+
+
+def test_training_points_are_kept_by_default(tmp_path, transformed_features, target):
+    model_trainer = ModelTrainer(
+        ModelTrainerConfig(knn_report_file_path=str(tmp_path / "knn_report.yaml")),
+        data_transformation_artifact=None,
+    )
+
+    X, y = model_trainer.reduce_prototypes(transformed_features, target)
+
+    assert model_trainer.model_trainer_config.knn_prototype_reduction == "none"
+    assert len(X) == len(transformed_features) and len(y) == len(target)
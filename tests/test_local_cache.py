@@ -0,0 +1,146 @@
+import json
+import os
+import multiprocessing
+
+import boto3
+
+from us_visa.aws_cloud_storage.local_cache import S3LocalCache
+from us_visa.entity.config_entity import S3CacheConfig, S3TransferConfig
+
+from tests.conftest import TEST_BUCKET_NAME
+
+# small parts, so every download is split in ranged GETs
+TRANSFER_CONFIG = S3TransferConfig(part_size_bytes=1024, max_concurrency=4)
+
+
+def _cache(tmp_path, **kwargs) -> S3LocalCache:
+    return S3LocalCache(S3CacheConfig(cache_dir=str(tmp_path / "cache"), **kwargs), TRANSFER_CONFIG)
+
+
+def _read(file_path: str) -> bytes:
+    with open(file_path, "rb") as cached_file:
+        return cached_file.read()
+
+
+def _index(cache: S3LocalCache) -> dict:
+    with open(cache.index_file_path) as index_file:
+        return json.load(index_file)
+
+
+def _count_downloads(cache: S3LocalCache, monkeypatch) -> list:
+    downloads = []
+    download = cache._download
+
+    def counting_download(*args, **kwargs):
+        downloads.append(args[-1])
+        return download(*args, **kwargs)
+
+    monkeypatch.setattr(cache, "_download", counting_download)
+    return downloads
+
+
+def test_unchanged_object_is_served_from_cache(tmp_path, local_s3, monkeypatch):
+    _, s3_client = local_s3
+    data = os.urandom(5000)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.pkl", Body=data)
+    cache = _cache(tmp_path)
+    downloads = _count_downloads(cache, monkeypatch)
+
+    first_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+    second_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+
+    assert first_path == second_path
+    assert _read(second_path) == data
+    assert downloads == ["model.pkl"]
+
+
+def test_changed_object_replaces_the_cached_version(tmp_path, local_s3):
+    _, s3_client = local_s3
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.pkl", Body=b"first")
+    cache = _cache(tmp_path, eviction_grace_seconds=3600)
+    first_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.pkl", Body=b"second")
+    second_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+
+    assert _read(second_path) == b"second"
+    # the replaced version was resolved moments ago, it stays for the process that may be opening it
+    assert _read(first_path) == b"first"
+    assert _index(cache)[os.path.basename(first_path)]["stale"] is True
+
+    cache.s3_cache_config.eviction_grace_seconds = 0
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.pkl", Body=b"third")
+    third_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+
+    assert not os.path.exists(first_path) and not os.path.exists(second_path)
+    assert list(_index(cache)) == [os.path.basename(third_path)]
+
+
+def test_eviction_keeps_recently_resolved_objects(tmp_path, local_s3):
+    _, s3_client = local_s3
+    for key in ("a.csv", "b.csv"):
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=key, Body=b"x" * 3000)
+
+    cache = _cache(tmp_path, max_bytes=4000, eviction_grace_seconds=3600)
+    a_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "a.csv")
+    b_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "b.csv")
+    assert os.path.exists(a_path) and os.path.exists(b_path)
+
+    cache.s3_cache_config.eviction_grace_seconds = 0
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="c.csv", Body=b"x" * 3000)
+    c_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "c.csv")
+
+    assert not os.path.exists(a_path) and not os.path.exists(b_path)
+    assert os.path.exists(c_path)
+
+
+def test_object_evicted_after_lookup_is_downloaded_again(tmp_path, local_s3, monkeypatch):
+    _, s3_client = local_s3
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.pkl", Body=b"model")
+    cache = _cache(tmp_path)
+    cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+    downloads = _count_downloads(cache, monkeypatch)
+    # another process evicts the object between the lookup and the access
+    monkeypatch.setattr(cache, "_touch", lambda object_id: False)
+
+    file_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+
+    assert _read(file_path) == b"model"
+    assert downloads == ["model.pkl"]
+
+
+def resolve_in_process(endpoint_url: str, cache_dir: str, results) -> None:
+    s3_client = boto3.client(
+        "s3",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        region_name="us-east-1",
+        endpoint_url=endpoint_url,
+    )
+    cache = S3LocalCache(S3CacheConfig(cache_dir=cache_dir), TRANSFER_CONFIG)
+    file_path = cache.get_object_path(s3_client, TEST_BUCKET_NAME, "model.pkl")
+    results.put((file_path, _read(file_path)))
+
+
+def test_processes_share_the_cache(tmp_path, local_s3):
+    server, s3_client = local_s3
+    data = os.urandom(20000)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="model.pkl", Body=data)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=resolve_in_process, args=(server.endpoint_url, str(tmp_path / "cache"), results)
+        )
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    resolved = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert len({file_path for file_path, _ in resolved}) == 1
+    assert all(content == data for _, content in resolved)
+    assert len(_index(_cache(tmp_path))) == 1
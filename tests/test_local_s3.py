@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+
+from benchmarks.loadtest import Endpoint, LoadStepResult, saturation_summary, summarize_step
+
+from tests.conftest import TEST_BUCKET_NAME
+
+
+def test_get_honours_conditions_and_ranges(local_s3):
+    _, s3_client = local_s3
+    data = os.urandom(3000)
+    etag = s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="data/file.bin", Body=data)["ETag"]
+
+    assert s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key="data/file.bin")["ETag"] == etag
+    ranged = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="data/file.bin", Range="bytes=1000-1999")
+    assert ranged["ContentRange"] == "bytes 1000-1999/3000"
+    assert ranged["Body"].read() == data[1000:2000]
+
+    with pytest.raises(ClientError) as not_modified:
+        s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="data/file.bin", IfNoneMatch=etag)
+    assert not_modified.value.response["ResponseMetadata"]["HTTPStatusCode"] == 304
+
+    with pytest.raises(ClientError) as precondition_failed:
+        s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="data/file.bin", IfMatch='"other"')
+    assert precondition_failed.value.response["Error"]["Code"] == "PreconditionFailed"
+
+
+def test_multipart_upload_list_and_delete(local_s3):
+    _, s3_client = local_s3
+    parts = [os.urandom(5 * 1024 * 1024), os.urandom(1000)]
+    upload_id = s3_client.create_multipart_upload(Bucket=TEST_BUCKET_NAME, Key="big.bin")["UploadId"]
+    uploaded = [
+        {
+            "PartNumber": number,
+            "ETag": s3_client.upload_part(
+                Bucket=TEST_BUCKET_NAME, Key="big.bin", UploadId=upload_id, PartNumber=number, Body=part
+            )["ETag"],
+        }
+        for number, part in enumerate(parts, start=1)
+    ]
+    s3_client.complete_multipart_upload(
+        Bucket=TEST_BUCKET_NAME, Key="big.bin", UploadId=upload_id, MultipartUpload={"Parts": uploaded}
+    )
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="small/a.csv", Body=b"a")
+
+    assert s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="big.bin")["Body"].read() == b"".join(parts)
+    listed = s3_client.list_objects_v2(Bucket=TEST_BUCKET_NAME, Prefix="small/")
+    assert [item["Key"] for item in listed["Contents"]] == ["small/a.csv"]
+
+    s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key="small/a.csv")
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=TEST_BUCKET_NAME, Prefix="small/")
+
+
+def test_missing_object_and_bucket(local_s3):
+    _, s3_client = local_s3
+
+    with pytest.raises(ClientError) as missing_key:
+        s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="missing")
+    with pytest.raises(ClientError) as missing_bucket:
+        s3_client.put_object(Bucket="no-such-bucket", Key="key", Body=b"")
+
+    assert missing_key.value.response["Error"]["Code"] == "NoSuchKey"
+    assert missing_bucket.value.response["Error"]["Code"] == "NoSuchBucket"
+
+
+def _step(latencies_ms, outcomes, skipped=0, elapsed=1.0) -> dict:
+    return {
+        "latencies": np.array(latencies_ms, dtype=float),
+        "outcomes": np.array(outcomes, dtype=bool),
+        "skipped": skipped,
+        "elapsed": elapsed,
+    }
+
+
+def test_summarize_step_flags_saturation():
+    endpoint = Endpoint(name="batch", rows_per_request=10, send=None)
+
+    within = summarize_step(1, endpoint, 10, _step([5] * 10, [True] * 10), slo_p99_ms=50, max_error_rate=0.01)
+    slow = summarize_step(1, endpoint, 10, _step([100] * 10, [True] * 10), slo_p99_ms=50, max_error_rate=0.01)
+    skipping = summarize_step(1, endpoint, 10, _step([5] * 8, [True] * 8, skipped=2), slo_p99_ms=50, max_error_rate=0.01)
+
+    assert not within.saturated and within.rows_per_second == 100
+    assert slow.saturated
+    assert skipping.saturated and skipping.error_rate == 0.2
+
+
+def test_saturation_summary_takes_the_best_step_within_limits():
+    def result(target_rps, achieved_rps, saturated) -> LoadStepResult:
+        return LoadStepResult(
+            workers=2, endpoint="form", target_rps=target_rps, duration_seconds=1, sent=1, succeeded=1,
+            failed=0, skipped=0, error_rate=0, achieved_rps=achieved_rps, rows_per_second=achieved_rps,
+            p50_ms=1, p90_ms=1, p99_ms=1, max_ms=1, saturated=saturated,
+        )
+
+    summary = saturation_summary([result(10, 10, False), result(20, 19, False), result(40, 25, True)])
+
+    assert summary == [
+        {
+            "workers": 2,
+            "endpoint": "form",
+            "saturation_rps": 19,
+            "saturation_rows_per_second": 19,
+            "p99_ms_at_saturation": 1,
+            "max_achieved_rps": 25,
+        }
+    ]
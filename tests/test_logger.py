@@ -0,0 +1,75 @@
+import logging
+import os
+import queue
+import sys
+
+import pytest
+
+from us_visa.logger import LOG_FORMAT, NonBlockingQueueHandler, SamplingFilter
+
+
+def _record(msg="Entered the predict method", args=None, level=logging.INFO, exc_info=None, lineno=10):
+    return logging.LogRecord("us_visa.test", level, __file__, lineno, msg, args, exc_info)
+
+
+def test_prepared_record_is_formatted_like_the_stdlib():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    rows = ["first"]
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        record = _record("Scored %s rows: %s", (1, rows), level=logging.ERROR, exc_info=sys.exc_info())
+
+    prepared = handler.prepare(record)
+    rows.append("changed later")
+
+    assert prepared is not record
+    assert (prepared.msg, prepared.message, prepared.args) == ("Scored 1 rows: ['first']", "Scored 1 rows: ['first']", None)
+    assert prepared.exc_info is None
+    assert "ValueError: bad row" in prepared.exc_text
+    written = logging.Formatter(LOG_FORMAT).format(prepared)
+    assert "Scored 1 rows: ['first']" in written and "Traceback" in written and "ValueError: bad row" in written
+
+
+def test_full_queue_drops_records_and_reports_them():
+    log_queue = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(log_queue)
+
+    handler.handle(_record("first"))
+    handler.handle(_record("second"))
+    handler.handle(_record("third"))
+    assert handler.dropped == 2
+
+    log_queue.get_nowait()
+    handler.handle(_record("fourth"))
+
+    warning = log_queue.get_nowait()
+    assert warning.levelno == logging.WARNING and "Dropped 2 log records" in warning.getMessage()
+    # the queue was full again after the warning
+    assert handler.dropped == 3
+
+
+def test_sampling_keeps_one_record_per_rate_and_call_site():
+    sampling_filter = SamplingFilter(pattern=r"^Entered ", rate=10, logger_rates={})
+
+    kept = [sampling_filter.filter(_record()) for _ in range(25)]
+    other_site = sampling_filter.filter(_record(lineno=20))
+
+    assert kept.count(True) == 3 and kept[0]
+    assert other_site
+    assert all(sampling_filter.filter(_record("Scored the batch")) for _ in range(5))
+    assert all(sampling_filter.filter(_record(level=logging.WARNING)) for _ in range(5))
+
+
+def test_logger_rates_apply_to_child_loggers():
+    rates = SamplingFilter.parse_logger_rates("botocore=5, pymongo.pool=2")
+    sampling_filter = SamplingFilter(pattern="", rate=1, logger_rates=rates)
+    record = logging.LogRecord("botocore.hooks", logging.DEBUG, __file__, 1, "event", None, None)
+
+    assert rates == {"botocore": 5, "pymongo.pool": 2}
+    assert [sampling_filter.filter(record) for _ in range(10)].count(True) == 2
+
+
+@pytest.mark.skipif("LOG_LEVEL" in os.environ, reason="LOG_LEVEL is set in the environment")
+def test_debug_records_are_logged_by_default():
+    assert logging.getLogger().isEnabledFor(logging.DEBUG)
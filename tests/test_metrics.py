@@ -0,0 +1,79 @@
+import re
+
+import pytest
+
+from us_visa.monitoring.metrics import REGISTRY, Counter, Gauge, Histogram, MetricsRegistry
+
+
+def _sample(exposition: str, sample: str) -> float:
+    match = re.search(rf"^{re.escape(sample)} (\S+)$", exposition, re.MULTILINE)
+    assert match, f"{sample} not in exposition"
+    return float(match.group(1))
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=(0.1, 1), registry=registry)
+    child = histogram.labels(stage="predict")
+    for value in (0.05, 0.1, 0.5, 2):
+        child.observe(value)
+
+    exposition = registry.exposition()
+
+    assert "# TYPE latency_seconds histogram" in exposition
+    assert _sample(exposition, 'latency_seconds_bucket{stage="predict",le="0.1"}') == 2
+    assert _sample(exposition, 'latency_seconds_bucket{stage="predict",le="1"}') == 3
+    assert _sample(exposition, 'latency_seconds_bucket{stage="predict",le="+Inf"}') == 4
+    assert _sample(exposition, 'latency_seconds_count{stage="predict"}') == 4
+    assert _sample(exposition, 'latency_seconds_sum{stage="predict"}') == pytest.approx(2.65)
+
+
+def test_counter_and_gauge_samples():
+    registry = MetricsRegistry()
+    counter = Counter("requests_total", "Requests", ["route"], registry=registry)
+    gauge = Gauge("in_flight", "In flight", registry=registry)
+    counter.labels('/a"b').inc()
+    counter.labels(route='/a"b').inc(2)
+    with gauge.track_inprogress():
+        assert _sample(registry.exposition(), "in_flight") == 1
+
+    exposition = registry.exposition()
+
+    assert _sample(exposition, 'requests_total{route="/a\\"b"}') == 3
+    assert _sample(exposition, "in_flight") == 0
+
+
+def test_metric_names_are_unique_and_labels_checked():
+    registry = MetricsRegistry()
+    counter = Counter("requests_total", "Requests", ["route"], registry=registry)
+
+    with pytest.raises(ValueError):
+        Counter("requests_total", "Requests", registry=registry)
+    with pytest.raises(ValueError):
+        counter.labels("/", "extra")
+
+
+def test_metrics_endpoint_reports_requests_and_stages(app_client, visa_records):
+    def stage_count(stage: str) -> float:
+        return REGISTRY.get("usvisa_prediction_stage_seconds").labels(stage=stage).count
+
+    transforms = stage_count("transform")
+    app_client.post("/predict/batch", json={"applications": visa_records[:5]})
+
+    response = app_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert _sample(response.text, 'usvisa_http_requests_total{method="POST",route="/predict/batch",status="200"}') >= 1
+    assert 'usvisa_http_request_duration_seconds_bucket{method="POST",route="/predict/batch",le="+Inf"}' in response.text
+    assert stage_count("transform") > transforms
+
+
+def test_unknown_routes_share_one_series(app_client):
+    app_client.get("/no-such-page-1")
+    app_client.get("/no-such-page-2")
+
+    response = app_client.get("/metrics")
+
+    assert "no-such-page" not in response.text
+    assert _sample(response.text, 'usvisa_http_requests_total{method="GET",route="other",status="404"}') >= 2
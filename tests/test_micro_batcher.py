@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from us_visa.entity.config_entity import PredictionMicroBatcherConfig
+from us_visa.monitoring.metrics import MICRO_BATCH_QUEUE_WAIT_SECONDS, MICRO_BATCH_SIZE
+from us_visa.pipeline.micro_batcher import PredictionMicroBatcher
+
+
+def make_batcher(predict_fn, window_ms: float = 20, max_batch_size: int = 64) -> PredictionMicroBatcher:
+    return PredictionMicroBatcher(
+        predict_fn=predict_fn,
+        micro_batcher_config=PredictionMicroBatcherConfig(
+            enabled=True, window_ms=window_ms, max_batch_size=max_batch_size
+        ),
+    )
+
+
+def test_concurrent_predictions_share_one_batch():
+    batches = []
+
+    async def predict_fn(records):
+        batches.append(len(records))
+        return [record["value"] * 2 for record in records]
+
+    async def run():
+        batcher = make_batcher(predict_fn)
+        return batcher, await asyncio.gather(*(batcher.predict({"value": value}) for value in range(10)))
+
+    batcher, results = asyncio.run(run())
+
+    assert results == [value * 2 for value in range(10)]
+    assert batches == [10]
+    assert batcher.stats()["max_achieved_batch_size"] == 10
+
+
+def test_batches_are_capped_at_max_batch_size():
+    batches = []
+
+    async def predict_fn(records):
+        batches.append(len(records))
+        return [0] * len(records)
+
+    async def run():
+        batcher = make_batcher(predict_fn, max_batch_size=4)
+        await asyncio.gather(*(batcher.predict({}) for _ in range(10)))
+
+    asyncio.run(run())
+
+    assert batches == [4, 4, 2]
+
+
+def test_failed_record_only_fails_its_caller():
+    calls = []
+
+    async def predict_fn(records):
+        calls.append(len(records))
+        if any(record["value"] == "bad" for record in records):
+            raise ValueError("unknown category")
+        return [record["value"] * 2 for record in records]
+
+    async def run():
+        batcher = make_batcher(predict_fn)
+        values = [0, 1, 2, "bad", 4, 5, 6, 7]
+        return await asyncio.gather(*(batcher.predict({"value": value}) for value in values), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert isinstance(results[3], ValueError)
+    assert results[:3] + results[4:] == [0, 2, 4, 8, 10, 12, 14]
+    # halves of the failed batch instead of one call per record
+    assert len(calls) < 8
+
+
+def test_wrong_number_of_predictions_fails_every_caller():
+    async def predict_fn(records):
+        return [0] * (len(records) - 1)
+
+    async def run():
+        batcher = make_batcher(predict_fn)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.predict({}) for _ in range(3)), return_exceptions=True), 5
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_queued_predictions_move_to_a_restarted_worker():
+    release = None
+
+    async def predict_fn(records):
+        await release.wait()
+        return [record["value"] for record in records]
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        batcher = make_batcher(predict_fn, window_ms=0, max_batch_size=1)
+
+        in_flight = asyncio.ensure_future(batcher.predict({"value": 1}))
+        queued = [asyncio.ensure_future(batcher.predict({"value": value})) for value in (2, 3)]
+        await asyncio.sleep(0.05)
+
+        batcher._worker.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        after_restart = await asyncio.wait_for(batcher.predict({"value": 4}), 5)
+
+        with pytest.raises(RuntimeError):
+            await in_flight
+        return await asyncio.wait_for(asyncio.gather(*queued), 5), after_restart
+
+    queued_results, after_restart = asyncio.run(run())
+
+    assert queued_results == [2, 3]
+    assert after_restart == 4
+
+
+def test_batch_size_and_queue_wait_are_observed():
+    async def predict_fn(records):
+        return [0] * len(records)
+
+    batch_count = MICRO_BATCH_SIZE._default.count
+    wait_count = MICRO_BATCH_QUEUE_WAIT_SECONDS._default.count
+
+    async def run():
+        batcher = make_batcher(predict_fn)
+        await asyncio.gather(*(batcher.predict({}) for _ in range(5)))
+
+    asyncio.run(run())
+
+    assert MICRO_BATCH_SIZE._default.count == batch_count + 1
+    assert MICRO_BATCH_QUEUE_WAIT_SECONDS._default.count == wait_count + 5
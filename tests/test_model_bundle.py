@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaEstimator
+from us_visa.aws_cloud_storage.aws_storage import SimpleStorageService
+from us_visa.entity.model_bundle import BundledUSVisaModel, get_bundle_path, load_model_bundle, save_model_bundle
+from us_visa.utils.main_utils import save_object
+
+from tests.conftest import TEST_BUCKET_NAME
+
+
+@pytest.mark.parametrize("model_name", ["forest_model", "knn_model"])
+def test_bundle_predicts_like_the_pickled_model(request, tmp_path, model_name, visa_records):
+    model = request.getfixturevalue(model_name)
+    bundle_file = str(tmp_path / "model.bundle")
+    save_model_bundle(bundle_file, model)
+
+    bundled_model = load_model_bundle(bundle_file)
+    expected = np.asarray(model.predict(pd.DataFrame(visa_records)))
+
+    assert isinstance(bundled_model, BundledUSVisaModel)
+    assert int((bundled_model.predict(pd.DataFrame(visa_records)) != expected).sum()) == 0
+    assert int((bundled_model.predict_records(visa_records) != expected).sum()) == 0
+
+
+def test_bundle_loads_from_a_buffer(model_file, forest_model, visa_records):
+    with open(get_bundle_path(model_file), "rb") as bundle_file:
+        bundled_model = load_model_bundle(bundle_file.read())
+
+    expected = np.asarray(forest_model.predict(pd.DataFrame(visa_records)))
+    np.testing.assert_array_equal(bundled_model.predict_records(visa_records), expected)
+
+
+def _record_writes(storage, monkeypatch) -> list:
+    writes = []
+    upload_file, delete_file = storage.upload_file, storage.delete_file
+
+    def recording_upload_file(from_filename, to_filename, bucket_name, remove=True):
+        writes.append(("upload", to_filename))
+        return upload_file(from_filename, to_filename, bucket_name, remove=remove)
+
+    def recording_delete_file(filename, bucket_name):
+        writes.append(("delete", filename))
+        return delete_file(filename, bucket_name)
+
+    monkeypatch.setattr(storage, "upload_file", recording_upload_file)
+    monkeypatch.setattr(storage, "delete_file", recording_delete_file)
+    return writes
+
+
+def test_save_model_replaces_the_bundle_before_the_model(memory_storage, model_file, monkeypatch):
+    estimator = USvisaEstimator("bucket", "model/model.pkl", use_bundle=True, storage=memory_storage)
+    writes = _record_writes(memory_storage, monkeypatch)
+
+    estimator.save_model(model_file)
+
+    assert writes == [("upload", "model/model.bundle"), ("upload", "model/model.pkl")]
+    assert isinstance(estimator.load_model(), BundledUSVisaModel)
+
+
+def test_bundle_is_only_loaded_when_enabled(memory_storage, model_file):
+    USvisaEstimator("bucket", "model/model.pkl", use_bundle=True, storage=memory_storage).save_model(model_file)
+
+    estimator = USvisaEstimator("bucket", "model/model.pkl", storage=memory_storage)
+
+    assert not estimator.use_bundle
+    assert not isinstance(estimator.load_model(), BundledUSVisaModel)
+
+
+def test_save_model_without_bundle_deletes_the_previous_one_first(memory_storage, model_file, tmp_path, monkeypatch):
+    estimator = USvisaEstimator("bucket", "model/model.pkl", use_bundle=True, storage=memory_storage)
+    estimator.save_model(model_file)
+
+    pickle_only_file = str(tmp_path / "pickle_only" / "model.pkl")
+    os.makedirs(os.path.dirname(pickle_only_file))
+    os.replace(model_file, pickle_only_file)
+    writes = _record_writes(memory_storage, monkeypatch)
+
+    estimator.save_model(pickle_only_file)
+
+    assert writes == [("delete", "model/model.bundle"), ("upload", "model/model.pkl")]
+    assert not isinstance(estimator.load_model(), BundledUSVisaModel)
+
+
+def _bundle_files(storage: SimpleStorageService) -> list:
+    return sorted(file_name for file_name in os.listdir(storage.bundle_dir) if file_name.endswith(".bundle"))
+
+
+def test_uncached_bundle_is_mapped_from_one_shared_file(s3_storage, model_file, knn_model, tmp_path, visa_records):
+    estimator = USvisaEstimator(TEST_BUCKET_NAME, "model/model.pkl", use_bundle=True, storage=s3_storage)
+    estimator.save_model(model_file)
+
+    first_model = estimator.load_model()
+    second_model = estimator.load_model()
+
+    assert isinstance(first_model, BundledUSVisaModel)
+    first_files = _bundle_files(s3_storage)
+    assert len(first_files) == 1
+    np.testing.assert_array_equal(first_model.predict_records(visa_records), second_model.predict_records(visa_records))
+
+    knn_file = str(tmp_path / "knn" / "model.pkl")
+    save_object(knn_file, knn_model)
+    save_model_bundle(get_bundle_path(knn_file), knn_model)
+    estimator.save_model(knn_file)
+
+    new_model = estimator.load_model()
+
+    assert new_model.trained_model_object.kind == "k_neighbors"
+    # the previous version is removed, the model mapped from it keeps working
+    new_files = _bundle_files(s3_storage)
+    assert len(new_files) == 1 and new_files != first_files
+    assert len(first_model.predict_records(visa_records[:5])) == 5
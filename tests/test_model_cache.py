@@ -0,0 +1,96 @@
+import pickle
+import threading
+import time
+
+import pytest
+
+from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaModelCache
+from us_visa.aws_cloud_storage.local_storage import InMemoryStorageService
+from us_visa.exception import USvisaException
+
+BUCKET_NAME = "test-model-bucket"
+MODEL_PATH = "model.pkl"
+
+
+@pytest.fixture
+def counted_loads(monkeypatch, memory_storage, forest_model):
+    """
+    Store the forest model and count the pickle loads, each one slow enough for the callers to overlap
+    """
+    memory_storage.put_object(BUCKET_NAME, MODEL_PATH, pickle.dumps(forest_model))
+    loads = []
+    load_model = InMemoryStorageService.load_model
+
+    def slow_load_model(self, model_name, bucket_name, model_dir=None):
+        loads.append(model_name)
+        time.sleep(0.2)
+        return load_model(self, model_name, bucket_name, model_dir)
+
+    monkeypatch.setattr(InMemoryStorageService, "load_model", slow_load_model)
+    return loads
+
+
+def test_concurrent_callers_share_one_load(counted_loads):
+    models = []
+    barrier = threading.Barrier(8)
+
+    def get_model():
+        barrier.wait()
+        models.append(USvisaModelCache(BUCKET_NAME, MODEL_PATH).get_model())
+
+    threads = [threading.Thread(target=get_model) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counted_loads == [MODEL_PATH]
+    assert len(models) == 8
+    assert all(model is models[0] for model in models)
+
+
+def test_fresh_model_is_not_reloaded(counted_loads):
+    model_cache = USvisaModelCache(BUCKET_NAME, MODEL_PATH, ttl_seconds=0)
+
+    first = model_cache.get_model()
+
+    assert model_cache.get_model() is first
+    assert counted_loads == [MODEL_PATH]
+
+
+def test_invalidated_model_is_kept_while_its_version_is_unchanged(counted_loads):
+    model_cache = USvisaModelCache(BUCKET_NAME, MODEL_PATH, ttl_seconds=0)
+    first = model_cache.get_model()
+
+    model_cache.invalidate()
+
+    assert model_cache.get_model() is first
+    assert counted_loads == [MODEL_PATH]
+
+
+def test_invalidated_model_is_reloaded_when_its_version_changed(counted_loads, memory_storage, knn_model):
+    model_cache = USvisaModelCache(BUCKET_NAME, MODEL_PATH, ttl_seconds=0)
+    first, first_version = model_cache.get_model_and_version()
+
+    memory_storage.put_object(BUCKET_NAME, MODEL_PATH, pickle.dumps(knn_model))
+    model_cache.invalidate()
+    second, second_version = model_cache.get_model_and_version()
+
+    assert second is not first
+    assert second_version != first_version
+    assert second_version == memory_storage.get_object_version(BUCKET_NAME, MODEL_PATH)
+    assert counted_loads == [MODEL_PATH, MODEL_PATH]
+
+
+def test_failed_reload_keeps_serving_the_stale_model(counted_loads, memory_storage):
+    model_cache = USvisaModelCache(BUCKET_NAME, MODEL_PATH, ttl_seconds=0)
+    stale_model = model_cache.get_model()
+
+    memory_storage.delete_file(MODEL_PATH, bucket_name=BUCKET_NAME)
+
+    assert model_cache.reload() is stale_model
+
+
+def test_failed_first_load_raises(memory_storage):
+    with pytest.raises(USvisaException):
+        USvisaModelCache(BUCKET_NAME, "missing.pkl").get_model()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from us_visa.constants import COLLECTION_NAME
+from us_visa.data_access.usvisa_data import USvisaData
+
+
+def test_chunks_hold_at_most_batch_size_schema_rows(mongo_collection, visa_dataframe):
+    usvisa_data = USvisaData(batch_size=300, partitions=1)
+
+    chunks = list(usvisa_data.iter_collection_chunks(COLLECTION_NAME))
+
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    assert all(list(chunk.columns) == list(usvisa_data.get_schema_columns()) for chunk in chunks)
+    assert mongo_collection.queries == [{}]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), visa_dataframe[list(chunks[0].columns)])
+
+
+def test_projection_leaves_out_id_and_extra_fields(mongo_collection):
+    mongo_collection.insert_many([{"case_id": "EXTRA", "internal_note": "not exported"}])
+    usvisa_data = USvisaData(batch_size=5000, partitions=1)
+
+    (chunk,) = usvisa_data.iter_collection_chunks(COLLECTION_NAME, query={"case_id": "EXTRA"})
+
+    assert "_id" not in chunk.columns and "internal_note" not in chunk.columns
+    assert chunk["case_id"].tolist() == ["EXTRA"]
+    assert chunk["continent"].isna().all()
+
+
+def test_nan_strings_become_missing_values(mongo_collection):
+    mongo_collection.insert_many([{"case_id": "NAN", "continent": "nan", "prevailing_wage": 10.5}])
+    usvisa_data = USvisaData(batch_size=5000, partitions=1)
+
+    (chunk,) = usvisa_data.iter_collection_chunks(COLLECTION_NAME, query={"case_id": "NAN"})
+
+    assert np.isnan(chunk.loc[0, "continent"])
+    assert chunk.loc[0, "prevailing_wage"] == 10.5
+
+
+def test_empty_collection_gives_one_empty_chunk(mongo_collection):
+    usvisa_data = USvisaData(batch_size=100, partitions=1)
+
+    chunks = list(usvisa_data.iter_collection_chunks(COLLECTION_NAME, query={"case_id": "none"}))
+
+    assert len(chunks) == 1 and len(chunks[0]) == 0
+    assert list(chunks[0].columns) == list(usvisa_data.get_schema_columns())
+
+
+def test_export_as_dataframe_matches_the_collection(mongo_collection, visa_dataframe):
+    usvisa_data = USvisaData(batch_size=128, partitions=1)
+
+    dataframe = usvisa_data.export_collection_as_dataframe(COLLECTION_NAME)
+
+    pd.testing.assert_frame_equal(dataframe, visa_dataframe[list(dataframe.columns)])
+
+
+def test_max_value_reads_the_largest_value(mongo_collection):
+    usvisa_data = USvisaData(partitions=1)
+
+    assert usvisa_data.get_max_value(COLLECTION_NAME, "_id") == mongo_collection.documents[-1]["_id"]
+    assert usvisa_data.get_max_value(COLLECTION_NAME, "no_such_field") is None
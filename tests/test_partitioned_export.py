@@ -0,0 +1,97 @@
+import os
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from us_visa.constants import COLLECTION_NAME, FILE_NAME
+from us_visa.data_access.usvisa_data import USvisaData
+from us_visa.utils.feature_store import read_dataframe
+from tests.conftest import matches
+
+
+def _partition_counts(collection, queries):
+    counts = Counter()
+    for query in queries:
+        for document in collection.documents:
+            if matches(document, query):
+                counts[document["case_id"]] += 1
+    return counts
+
+
+@pytest.mark.parametrize("partitions", [2, 4, 7])
+def test_partitions_cover_every_document_once(mongo_collection, partitions):
+    mongo_collection.insert_many([{"_id": "string-id", "case_id": "STRING"}, {"_id": 42, "case_id": "INT"}])
+    usvisa_data = USvisaData(partitions=partitions)
+
+    bounds = usvisa_data.get_partition_bounds(COLLECTION_NAME)
+    queries = usvisa_data.get_partition_queries(bounds)
+
+    assert len(queries) == partitions
+    counts = _partition_counts(mongo_collection, queries)
+    assert set(counts) == {document["case_id"] for document in mongo_collection.documents}
+    assert set(counts.values()) == {1}
+
+
+def test_partition_queries_keep_the_filter(mongo_collection):
+    query = {"continent": "Asia"}
+    usvisa_data = USvisaData(partitions=4)
+
+    queries = usvisa_data.get_partition_queries(usvisa_data.get_partition_bounds(COLLECTION_NAME, query=query), query)
+
+    counts = _partition_counts(mongo_collection, queries)
+    assert sum(counts.values()) == sum(document["continent"] == "Asia" for document in mongo_collection.documents)
+
+
+def test_too_few_documents_are_read_as_one_range(mongo_collection):
+    del mongo_collection.documents[3:]
+
+    assert USvisaData(partitions=4).get_partition_bounds(COLLECTION_NAME) == []
+    assert USvisaData.get_partition_queries([], {"case_id": "X"}) == [{"case_id": "X"}]
+
+
+def _sorted(dataframe: pd.DataFrame) -> pd.DataFrame:
+    return dataframe.sort_values("case_id", ignore_index=True)
+
+
+def test_partitioned_dataframe_export_matches_one_partition(mongo_collection):
+    single = USvisaData(batch_size=128, partitions=1).export_collection_as_dataframe(COLLECTION_NAME)
+    partitioned = USvisaData(batch_size=128, partitions=4).export_collection_as_dataframe(COLLECTION_NAME)
+
+    pd.testing.assert_frame_equal(_sorted(partitioned), _sorted(single))
+
+
+def test_partitioned_file_export_matches_one_partition(tmp_path, mongo_collection):
+    single_file_path = str(tmp_path / "single" / FILE_NAME)
+    partitioned_file_path = str(tmp_path / "partitioned" / FILE_NAME)
+    os.makedirs(os.path.dirname(single_file_path))
+    os.makedirs(os.path.dirname(partitioned_file_path))
+
+    single_rows = USvisaData(batch_size=128, partitions=1).export_collection_to_file(COLLECTION_NAME, single_file_path)
+    partitioned_rows = USvisaData(batch_size=128, partitions=4).export_collection_to_file(
+        COLLECTION_NAME, partitioned_file_path
+    )
+
+    assert single_rows == partitioned_rows == len(mongo_collection.documents)
+    pd.testing.assert_frame_equal(
+        _sorted(read_dataframe(partitioned_file_path)), _sorted(read_dataframe(single_file_path))
+    )
+    assert os.listdir(os.path.dirname(partitioned_file_path)) == [FILE_NAME]
+
+
+def test_failed_partition_leaves_no_shard_files(tmp_path, mongo_collection, monkeypatch):
+    file_path = str(tmp_path / FILE_NAME)
+    usvisa_data = USvisaData(batch_size=128, partitions=4)
+    iter_collection_chunks = usvisa_data.iter_collection_chunks
+
+    def failing_chunks(collection_name, database_name=None, query=None):
+        if "$not" in str(query):
+            raise ValueError("cursor lost")
+        return iter_collection_chunks(collection_name, database_name, query)
+
+    monkeypatch.setattr(usvisa_data, "iter_collection_chunks", failing_chunks)
+
+    with pytest.raises(Exception):
+        usvisa_data.export_collection_to_file(COLLECTION_NAME, file_path)
+
+    assert not [file_name for file_name in os.listdir(tmp_path) if ".part-" in file_name]
@@ -0,0 +1,114 @@
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from us_visa.entity.config_entity import PredictionCacheConfig, USvisaPredictorConfig
+from us_visa.pipeline.prediction_cache import PredictionCache
+from us_visa.pipeline.prediction_pipeline import USvisaClassifier
+
+
+def make_prediction_cache(**kwargs) -> PredictionCache:
+    config = dict(enabled=True, max_entries=1000, max_bytes=10 * 1024 * 1024, ttl_seconds=3600)
+    config.update(kwargs)
+    return PredictionCache(prediction_cache_config=PredictionCacheConfig(**config))
+
+
+@pytest.fixture
+def prediction_cache():
+    USvisaClassifier.prediction_cache = make_prediction_cache()
+    yield USvisaClassifier.prediction_cache
+    USvisaClassifier.prediction_cache = None
+
+
+@pytest.fixture
+def classifier(stored_model, prediction_cache) -> USvisaClassifier:
+    # a short model ttl, so every test sees the version check of a refresh
+    return USvisaClassifier(
+        prediction_pipeline_config=USvisaPredictorConfig(model_cache_ttl_seconds=0.05)
+    )
+
+
+def test_keys_ignore_number_and_whitespace_formatting(visa_records):
+    record = visa_records[0]
+    reformatted = dict(
+        record,
+        continent=f" {record['continent']} ",
+        no_of_employees=str(record["no_of_employees"]),
+        company_age=float(record["company_age"]),
+    )
+
+    assert PredictionCache.make_key(reformatted) == PredictionCache.make_key(record)
+
+
+def test_least_recently_used_entries_are_evicted(visa_records):
+    prediction_cache = make_prediction_cache(max_entries=2)
+    keys = [PredictionCache.make_key(record) for record in visa_records[:3]]
+
+    prediction_cache.put_many(keys[:2], [0, 1], model_version="v1")
+    prediction_cache.get_many(keys[:1], model_version="v1")
+    prediction_cache.put_many(keys[2:], [1], model_version="v1")
+
+    assert prediction_cache.get_many(keys, model_version="v1") == [(0,), None, (1,)]
+    assert prediction_cache.stats()["evictions"] == 1
+
+
+def test_new_model_version_drops_every_entry(visa_records):
+    prediction_cache = make_prediction_cache()
+    keys = [PredictionCache.make_key(record) for record in visa_records[:2]]
+    prediction_cache.put_many(keys, [0, 1], model_version="v1")
+
+    assert prediction_cache.get_many(keys, model_version="v2") == [None, None]
+    assert prediction_cache.stats()["invalidations"] == 1
+
+
+def test_repeated_records_are_served_from_the_cache(classifier, prediction_cache, stored_model, visa_records):
+    records = visa_records[:50]
+
+    first = classifier.predict_records(records)
+    second = classifier.predict_records(records)
+
+    np.testing.assert_array_equal(first, stored_model.predict_records(records))
+    np.testing.assert_array_equal(second, first)
+    assert prediction_cache.stats()["hits"] == 50
+
+
+def test_dataframe_predictions_go_through_the_cache(classifier, prediction_cache, stored_model, visa_records):
+    dataframe = pd.DataFrame(visa_records[:20])
+
+    np.testing.assert_array_equal(classifier.predict(dataframe), stored_model.predict(dataframe))
+    classifier.predict(dataframe)
+
+    assert prediction_cache.stats()["hits"] == 20
+
+
+def test_refresh_of_an_unchanged_model_keeps_the_cache(classifier, prediction_cache, visa_records):
+    classifier.predict_records(visa_records[:10])
+    model = classifier.load_model()
+
+    time.sleep(0.1)
+    classifier.predict_records(visa_records[:10])
+
+    assert classifier.load_model() is model
+    assert prediction_cache.stats()["hits"] == 10
+    assert prediction_cache.stats()["invalidations"] == 0
+
+
+def test_refresh_of_a_changed_model_drops_the_cache(classifier, prediction_cache, memory_storage, knn_model, visa_records):
+    classifier.predict_records(visa_records[:10])
+
+    predictor_config = USvisaPredictorConfig()
+    memory_storage.put_object(
+        predictor_config.model_bucket_name, predictor_config.model_file_path, pickle.dumps(knn_model)
+    )
+    time.sleep(0.1)
+    predictions = classifier.predict_records(visa_records[:10])
+
+    np.testing.assert_array_equal(predictions, knn_model.predict_records(visa_records[:10]))
+    assert prediction_cache.stats()["hits"] == 0
+    assert prediction_cache.stats()["invalidations"] == 1
+    assert prediction_cache.stats()["model_version"] == memory_storage.get_object_version(
+        predictor_config.model_bucket_name, predictor_config.model_file_path
+    )
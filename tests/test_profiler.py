@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+from us_visa.entity.config_entity import TrainingProfileConfig
+from us_visa.monitoring.profiler import TrainingProfiler, profile_block, profiled
+
+BLOCK_BYTES = 16 * 1024 * 1024
+
+
+@pytest.fixture
+def profile_config(tmp_path) -> TrainingProfileConfig:
+    return TrainingProfileConfig(enabled=True, trace_memory=True, profile_file_path=str(tmp_path / "profile.json"))
+
+
+def _records(profiler: TrainingProfiler) -> dict:
+    return {record["name"]: record for record in profiler.records}
+
+
+def test_parent_keeps_the_peak_reached_before_its_child(profile_config):
+    with TrainingProfiler(profile_config) as profiler:
+        with profile_block("parent"):
+            buffer = bytearray(BLOCK_BYTES)
+            del buffer
+            with profile_block("child"):
+                small = bytearray(1024)
+                del small
+
+    records = _records(profiler)
+    assert records["parent"]["tracemalloc_peak_mb"] >= 15
+    assert records["child"]["tracemalloc_peak_mb"] < 1
+
+
+def test_parent_gets_the_peak_of_its_children(profile_config):
+    with TrainingProfiler(profile_config) as profiler:
+        with profile_block("parent"):
+            with profile_block("first"):
+                buffer = bytearray(BLOCK_BYTES)
+                del buffer
+            with profile_block("second"):
+                pass
+
+    records = _records(profiler)
+    assert records["first"]["tracemalloc_peak_mb"] >= 15
+    assert records["second"]["tracemalloc_peak_mb"] < 1
+    assert records["parent"]["tracemalloc_peak_mb"] >= 15
+    assert (records["parent"]["depth"], records["first"]["parent"]) == (0, "parent")
+
+
+def test_profiled_function_records_rows_and_writes_the_profile(profile_config):
+    @profiled("halve")
+    def halve(array):
+        return array[: len(array) // 2]
+
+    assert len(halve(np.zeros(10))) == 5  # no active profiler, plain call
+
+    with TrainingProfiler(profile_config):
+        halve(np.zeros((10, 2)))
+
+    with open(profile_config.profile_file_path) as profile_file:
+        profile = json.load(profile_file)
+    assert profile["status"] == "completed"
+    assert [(record["name"], record["rows_in"], record["rows_out"]) for record in profile["records"]] == [("halve", 10, 5)]
+
+
+def test_failed_block_is_recorded(profile_config):
+    with pytest.raises(ValueError):
+        with TrainingProfiler(profile_config) as profiler:
+            with profile_block("failing"):
+                raise ValueError("boom")
+
+    assert _records(profiler)["failing"]["status"] == "failed"
+    assert TrainingProfiler.active is None
+
+
+def test_stage_memory_is_recorded_apart_from_the_process_peak(profile_config):
+    with TrainingProfiler(profile_config) as profiler:
+        with profile_block("stage"):
+            pass
+
+    record = _records(profiler)["stage"]
+    assert "max_rss_mb" not in record
+    if record["rss_start_mb"] is not None:
+        assert record["rss_delta_mb"] == record["rss_end_mb"] - record["rss_start_mb"]
+    assert "process_max_rss_mb" in record
@@ -0,0 +1,98 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from us_visa.aws_cloud_storage.s3_transfer import S3StreamingTransfer
+from us_visa.entity.config_entity import S3TransferConfig
+from us_visa.exception import USvisaException
+
+from tests.conftest import TEST_BUCKET_NAME
+
+PART_SIZE = 1024
+
+
+def _record_calls(s3_client, operation: str) -> list:
+    calls = []
+    s3_client.meta.events.register(
+        f"before-call.s3.{operation}", lambda params, **kwargs: calls.append(params)
+    )
+    return calls
+
+
+@pytest.fixture
+def transfer(local_s3) -> S3StreamingTransfer:
+    _, s3_client = local_s3
+    return S3StreamingTransfer(
+        s3_client,
+        S3TransferConfig(part_size_bytes=PART_SIZE, max_concurrency=2, multipart_threshold_bytes=5 * 1024 * 1024, csv_chunk_rows=100),
+    )
+
+
+@pytest.mark.parametrize("size", [0, 1, PART_SIZE, 5 * PART_SIZE + 17])
+def test_download_file_in_ranged_parts(transfer, local_s3, tmp_path, size):
+    _, s3_client = local_s3
+    data = os.urandom(size)
+    etag = s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="object.bin", Body=data)["ETag"]
+    gets = _record_calls(s3_client, "GetObject")
+
+    downloaded_etag, downloaded_size = transfer.download_file(TEST_BUCKET_NAME, "object.bin", str(tmp_path / "object.bin"))
+
+    with open(tmp_path / "object.bin", "rb") as downloaded:
+        assert downloaded.read() == data
+    assert (downloaded_etag, downloaded_size) == (etag, size)
+    # one GET per part, an empty object may need a second GET without a range
+    assert len(gets) == -(-size // PART_SIZE) if size else len(gets) in (1, 2)
+    # every part after the first is pinned to the version of the first one
+    assert all(get["IfMatch"] == etag for get in gets[1:] if "Range" in get and not get["Range"].startswith("bytes=0-"))
+
+
+def test_open_object_streams_the_parts(transfer, local_s3):
+    _, s3_client = local_s3
+    data = os.urandom(7 * PART_SIZE + 3)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="object.bin", Body=data)
+
+    with transfer.open_object(TEST_BUCKET_NAME, "object.bin") as stream:
+        chunks = iter(lambda: stream.read(300), b"")
+        assert b"".join(chunks) == data
+
+
+def test_object_changed_during_the_read_fails(local_s3):
+    _, s3_client = local_s3
+    transfer = S3StreamingTransfer(s3_client, S3TransferConfig(part_size_bytes=PART_SIZE, max_concurrency=1))
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="object.bin", Body=os.urandom(6 * PART_SIZE))
+
+    with transfer.open_object(TEST_BUCKET_NAME, "object.bin") as stream:
+        stream.read(PART_SIZE)
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="object.bin", Body=os.urandom(6 * PART_SIZE))
+        with pytest.raises(Exception, match="PreconditionFailed|412"):
+            stream.read()
+
+
+def test_large_upload_is_multipart(transfer, local_s3, tmp_path):
+    _, s3_client = local_s3
+    data = os.urandom(6 * 1024 * 1024)
+    with open(tmp_path / "large.bin", "wb") as local_file:
+        local_file.write(data)
+    parts = _record_calls(s3_client, "UploadPart")
+
+    transfer.upload_file(str(tmp_path / "large.bin"), TEST_BUCKET_NAME, "large.bin")
+
+    assert len(parts) == 2
+    assert s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="large.bin")["Body"].read() == data
+
+
+def test_dataframe_is_uploaded_as_csv_without_a_local_file(transfer, local_s3):
+    _, s3_client = local_s3
+    data_frame = pd.DataFrame({"case_id": [f"EZYV{number}" for number in range(1000)], "wage": range(1000)})
+
+    transfer.upload_dataframe_as_csv(data_frame, TEST_BUCKET_NAME, "frame.csv")
+
+    body = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="frame.csv")["Body"].read()
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(body)), data_frame)
+
+
+def test_missing_object_raises(transfer, tmp_path):
+    with pytest.raises(USvisaException):
+        transfer.download_file(TEST_BUCKET_NAME, "missing.bin", str(tmp_path / "missing.bin"))
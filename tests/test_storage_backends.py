@@ -0,0 +1,112 @@
+import os
+
+import pandas as pd
+import pytest
+
+from us_visa.aws_cloud_storage.local_storage import InMemoryStorageService, LocalStorageService
+from us_visa.aws_cloud_storage.storage import get_storage_service
+from us_visa.entity.config_entity import StorageConfig, TrainingProfileConfig
+from us_visa.entity.model_bundle import BundledUSVisaModel
+from us_visa.exception import USvisaException
+from us_visa.monitoring.profiler import TrainingProfiler
+
+from tests.conftest import TEST_BUCKET_NAME
+
+
+@pytest.fixture(params=["local", "memory", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorageService(root_dir=str(tmp_path / "buckets"))
+    if request.param == "memory":
+        return request.getfixturevalue("memory_storage")
+    return request.getfixturevalue("s3_storage")
+
+
+def _write(file_path: str, data: bytes) -> str:
+    with open(file_path, "wb") as local_file:
+        local_file.write(data)
+    return file_path
+
+
+def test_upload_download_and_delete(storage, tmp_path):
+    local_file = _write(str(tmp_path / "upload.bin"), b"content")
+
+    storage.upload_file(local_file, "dir/object.bin", TEST_BUCKET_NAME, remove=True)
+    storage.download_file("dir/object.bin", TEST_BUCKET_NAME, str(tmp_path / "download.bin"))
+
+    assert not os.path.exists(local_file)
+    with open(tmp_path / "download.bin", "rb") as downloaded:
+        assert downloaded.read() == b"content"
+    assert storage.key_path_available(TEST_BUCKET_NAME, "dir/object.bin")
+    assert storage.key_path_available(TEST_BUCKET_NAME, "dir/")
+    assert not storage.key_path_available(TEST_BUCKET_NAME, "other")
+
+    storage.delete_file("dir/object.bin", TEST_BUCKET_NAME)
+    storage.delete_file("dir/object.bin", TEST_BUCKET_NAME)
+
+    assert not storage.key_path_available(TEST_BUCKET_NAME, "dir/object.bin")
+
+
+def test_uploads_are_profiled_alike(storage, tmp_path):
+    local_file = _write(str(tmp_path / "upload.bin"), b"x" * 1000)
+    profile_config = TrainingProfileConfig(enabled=True, profile_file_path=str(tmp_path / "profile.json"))
+
+    with TrainingProfiler(profile_config) as profiler:
+        storage.upload_file(local_file, "dir/object.bin", TEST_BUCKET_NAME, remove=False)
+
+    (record,) = profiler.records
+    assert record["name"] == f"{type(storage).__name__}.upload_file"
+    assert record["extra"] == {"bytes": 1000, "key": "dir/object.bin"}
+
+
+def test_object_version_follows_the_content(storage, tmp_path):
+    local_file = str(tmp_path / "object.bin")
+    storage.upload_file(_write(local_file, b"first"), "object.bin", TEST_BUCKET_NAME, remove=False)
+    first_version = storage.get_object_version(TEST_BUCKET_NAME, "object.bin")
+
+    storage.upload_file(local_file, "object.bin", TEST_BUCKET_NAME, remove=False)
+    assert storage.get_object_version(TEST_BUCKET_NAME, "object.bin") == first_version
+
+    storage.upload_file(_write(local_file, b"second"), "object.bin", TEST_BUCKET_NAME, remove=False)
+    assert storage.get_object_version(TEST_BUCKET_NAME, "object.bin") != first_version
+
+
+def test_models_and_bundles_are_loaded(storage, model_file, forest_model, visa_records):
+    storage.upload_file(model_file, "model/model.pkl", TEST_BUCKET_NAME, remove=False)
+    storage.upload_file(model_file[: -len(".pkl")] + ".bundle", "model/model.bundle", TEST_BUCKET_NAME, remove=False)
+
+    model = storage.load_model("model.pkl", TEST_BUCKET_NAME, model_dir="model")
+    bundled_model = storage.load_model_bundle("model/model.bundle", TEST_BUCKET_NAME)
+
+    assert isinstance(bundled_model, BundledUSVisaModel)
+    expected = list(forest_model.predict_records(visa_records[:50]))
+    assert list(model.predict_records(visa_records[:50])) == expected
+    assert list(bundled_model.predict_records(visa_records[:50])) == expected
+
+
+def test_dataframe_round_trip_as_csv(storage, tmp_path):
+    data_frame = pd.DataFrame({"continent": ["Asia", "Europe"], "no_of_employees": [10, 20]})
+
+    storage.upload_df_as_csv(data_frame, str(tmp_path / "frame.csv"), "frames/frame.csv", TEST_BUCKET_NAME)
+
+    pd.testing.assert_frame_equal(storage.read_csv("frames/frame.csv", TEST_BUCKET_NAME), data_frame)
+
+
+def test_missing_object_raises(storage):
+    with pytest.raises(USvisaException):
+        storage.load_model("missing.pkl", TEST_BUCKET_NAME)
+
+
+def test_local_keys_stay_inside_the_bucket(tmp_path):
+    storage = LocalStorageService(root_dir=str(tmp_path / "buckets"))
+
+    with pytest.raises(Exception, match="outside of"):
+        storage.get_object_path(TEST_BUCKET_NAME, "../other/model.pkl")
+
+
+def test_get_storage_service_picks_the_backend(tmp_path):
+    assert isinstance(get_storage_service(StorageConfig(backend="memory")), InMemoryStorageService)
+    local_storage = get_storage_service(StorageConfig(backend="local", local_dir=str(tmp_path)))
+    assert isinstance(local_storage, LocalStorageService) and local_storage.root_dir == str(tmp_path)
+    with pytest.raises(USvisaException, match="Unknown storage backend"):
+        get_storage_service(StorageConfig(backend="ftp"))
@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import json
+
+from us_visa.entity.config_entity import PredictionStreamConfig
+from us_visa.pipeline.prediction_pipeline import USvisaBatchData
+from us_visa.pipeline.stream_prediction import NDJSONStreamPredictor
+
+
+def _body(data: bytes, chunk_bytes: int = 64):
+    async def body():
+        for start in range(0, len(data), chunk_bytes):
+            yield data[start : start + chunk_bytes]
+
+    return body()
+
+
+def _run_stream(predictor: NDJSONStreamPredictor, data: bytes, gzipped: bool = False) -> list:
+    async def collect():
+        return [chunk async for chunk in predictor.predict_stream(_body(data), gzipped=gzipped)]
+
+    out = b"".join(asyncio.run(collect()))
+    return [json.loads(line) for line in out.splitlines()]
+
+
+def _predictor(model, calls: list, chunk_rows: int = 8) -> NDJSONStreamPredictor:
+    async def predict_fn(records):
+        calls.append(len(records))
+        return model.predict_records(records)
+
+    return NDJSONStreamPredictor(predict_fn, PredictionStreamConfig(chunk_rows=chunk_rows))
+
+
+def _ndjson(records) -> bytes:
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+def test_stream_scores_every_row(forest_model, visa_records):
+    calls = []
+    results = _run_stream(_predictor(forest_model, calls), _ndjson(visa_records[:20]))
+
+    expected = forest_model.predict_records(visa_records[:20])
+    assert [result["line"] for result in results] == list(range(1, 21))
+    assert all("error" not in result for result in results)
+    assert calls == [8, 8, 4]
+    labels = {"Certified": 0, "Denied": 1}
+    assert [labels[result["case_status"]] for result in results] == list(expected)
+
+
+def test_gzipped_stream(forest_model, visa_records):
+    calls = []
+    results = _run_stream(
+        _predictor(forest_model, calls), gzip.compress(_ndjson(visa_records[:10])), gzipped=True
+    )
+
+    assert len(results) == 10
+    assert all("case_status" in result for result in results)
+
+
+def test_oversized_complete_line_stops_the_stream(forest_model, visa_records):
+    oversized = dict(visa_records[1], note="x" * 4096)
+    data = gzip.compress(_ndjson([visa_records[0], oversized, visa_records[2]]))
+    predictor = NDJSONStreamPredictor(
+        lambda records: forest_model.predict_records(records),
+        PredictionStreamConfig(chunk_rows=8, max_line_bytes=1024),
+    )
+
+    # the whole body decompresses as one block, the oversized line is complete inside it
+    results = _run_stream(predictor, data, gzipped=True)
+
+    assert results == [{"line": 1, "error": "Line longer than 1024 bytes in stream"}]
+
+
+def test_invalid_rows_fail_alone(forest_model, visa_records):
+    records = [dict(record) for record in visa_records[:8]]
+    del records[1]["education_of_employee"]
+    records[3]["prevailing_wage"] = "a lot"
+    records[5]["prevailing_wage"] = "1234.5"
+    data = _ndjson(records[:6]) + b"not json\n" + _ndjson(records[6:])
+
+    calls = []
+    results = _run_stream(_predictor(forest_model, calls, chunk_rows=16), data)
+
+    errors = {result["line"]: result["error"] for result in results if "error" in result}
+    assert sorted(errors) == [2, 4, 7]
+    assert "education_of_employee" in errors[2]
+    assert "prevailing_wage" in errors[4]
+    # the valid rows, the string number included, are scored in one call
+    assert calls == [6]
+
+
+def test_failed_chunk_is_bisected(forest_model, visa_records):
+    records = [dict(record) for record in visa_records[:8]]
+    records[5]["continent"] = "Atlantis"
+
+    calls = []
+    results = _run_stream(_predictor(forest_model, calls), _ndjson(records))
+
+    errors = [result["line"] for result in results if "error" in result]
+    assert errors == [6]
+    assert sum(1 for result in results if "case_status" in result) == 7
+    # far fewer calls than scoring the chunk row by row after its failure
+    assert len(calls) < 1 + len(records)
+
+
+def test_validate_application_coerces_numbers(visa_records):
+    application = dict(visa_records[0], no_of_employees="12", extra="ignored")
+
+    validated = USvisaBatchData.validate_application(application)
+
+    assert list(validated) == USvisaBatchData.columns
+    assert validated["no_of_employees"] == 12.0
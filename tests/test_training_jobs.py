@@ -0,0 +1,107 @@
+import os
+import time
+import multiprocessing
+
+import pytest
+
+from us_visa.entity.config_entity import TrainingJobConfig
+from us_visa.pipeline.training_jobs import TrainingJob, TrainingJobManager, TrainingJobStore
+
+
+def run_until_released(job_id: str, job_dir: str) -> None:
+    """
+    Training process stand-in: reports whether it is daemonic and completes once the release file exists
+    """
+    job_store = TrainingJobStore(job_dir)
+    job_store.update(job_id, lambda job: setattr(job, "status", "running"))
+    with open(os.path.join(job_dir, "daemon"), "w") as daemon_file:
+        daemon_file.write(str(multiprocessing.current_process().daemon))
+
+    while not os.path.exists(os.path.join(job_dir, "release")):
+        time.sleep(0.05)
+
+    def complete(job: TrainingJob) -> None:
+        job.stages["model_trainer"] = "completed"
+        job.status = "completed"
+
+    job_store.update(job_id, complete)
+
+
+def wait_for(condition, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condition not met in time")
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    managers = []
+
+    def make_manager(**kwargs) -> TrainingJobManager:
+        manager = TrainingJobManager(
+            training_job_config=TrainingJobConfig(job_dir=str(tmp_path), shutdown_timeout_seconds=5),
+            run_job=run_until_released,
+            **kwargs,
+        )
+        managers.append(manager)
+        return manager
+
+    yield make_manager
+    (tmp_path / "release").touch()
+    for manager in managers:
+        manager.shutdown()
+
+
+def test_workers_share_the_active_job(make_manager, tmp_path):
+    completed = []
+    first_worker = make_manager(on_completed=lambda: completed.append(True))
+    second_worker = make_manager()
+
+    job = first_worker.submit()
+
+    assert second_worker.submit().job_id == job.job_id
+    assert second_worker.get_job(job.job_id).is_active
+
+    (tmp_path / "release").touch()
+    wait_for(lambda: second_worker.get_job(job.job_id).status == "completed")
+    wait_for(lambda: completed == [True])
+    assert second_worker.get_job(job.job_id).stages["model_trainer"] == "completed"
+    assert second_worker.submit().job_id != job.job_id
+
+
+def test_training_process_is_not_daemonic(make_manager, tmp_path):
+    make_manager().submit()
+
+    wait_for(lambda: (tmp_path / "daemon").exists() and (tmp_path / "daemon").read_text())
+    assert (tmp_path / "daemon").read_text() == "False"
+
+
+def test_job_of_a_dead_process_is_replaced(make_manager, tmp_path):
+    dead_process = multiprocessing.get_context("spawn").Process(target=time.sleep, args=(0,))
+    dead_process.start()
+    dead_process.join()
+    job_store = TrainingJobStore(str(tmp_path))
+    stale_job = TrainingJob(job_id="0" * 32, status="running", pid=dead_process.pid)
+    job_store.write(stale_job)
+    job_store.write_active_job_id(stale_job.job_id)
+
+    manager = make_manager()
+    job = manager.submit()
+
+    assert job.job_id != stale_job.job_id
+    assert manager.get_job(stale_job.job_id).status == "failed"
+
+
+def test_shutdown_stops_the_running_job(make_manager):
+    manager = make_manager()
+    job = manager.submit()
+
+    manager.shutdown()
+
+    assert manager.get_job(job.job_id).status == "failed"
+
+
+def test_job_ids_outside_of_the_job_dir_are_not_found(make_manager):
+    assert make_manager().get_job("../../etc/passwd") is None
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from us_visa.entity.config_entity import ModelWarmupConfig
+from us_visa.exception import USvisaException
+from us_visa.pipeline.warmup import USvisaModelWarmer
+
+
+def test_warm_up_loads_the_model_and_marks_ready(stored_model):
+    model_warmer = USvisaModelWarmer(model_warmup_config=ModelWarmupConfig(rounds=1))
+
+    model_warmer.warm_up()
+
+    assert model_warmer.is_ready
+    assert model_warmer.model_predictor.model_cache.is_fresh()
+    assert model_warmer.status()["error"] is None
+
+
+def test_synthetic_records_cover_every_category(forest_model):
+    model_warmer = USvisaModelWarmer(model_warmup_config=ModelWarmupConfig(n_records=1))
+    records = model_warmer.get_synthetic_records(forest_model)
+
+    for encoder_name in ("OneHotEncoder", "OrdinalEncoder"):
+        encoder = forest_model.preprocessing_object.named_transformers_[encoder_name]
+        for column, categories in zip(encoder.feature_names_in_, encoder.categories_):
+            assert {record[column] for record in records} == set(categories)
+    forest_model.predict_records(records)
+
+
+def test_failed_warm_up_is_not_ready(memory_storage):
+    model_warmer = USvisaModelWarmer()
+
+    with pytest.raises(USvisaException):
+        model_warmer.warm_up()
+
+    assert not model_warmer.is_ready
+    assert model_warmer.status()["error"]
+
+
+def test_ready_endpoint_reports_the_warm_up(app_client):
+    assert app_client.get("/health").json() == {"status": True}
+
+    deadline = time.monotonic() + 30
+    response = app_client.get("/ready")
+    while response.status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = app_client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
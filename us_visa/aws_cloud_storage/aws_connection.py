@@ -1,9 +1,12 @@
 import boto3
+from botocore.config import Config
 import os
 from us_visa.constants import (
     AWS_ACCESS_KEY_ID_ENV_KEY,
     AWS_SECRET_ACCESS_KEY_ENV_KEY,
+    AWS_S3_ENDPOINT_URL_ENV_KEY,
     REGION_NAME,
+    S3_TRANSFER_MAX_CONCURRENCY,
 )
 
 
@@ -15,6 +18,7 @@ class s3Client:
         if s3Client.s3_client == None or s3Client.s3_resource == None:
             _access_key_id = os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY)
             _secret_access_key = os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY)
+            _endpoint_url = os.getenv(AWS_S3_ENDPOINT_URL_ENV_KEY) or None
 
             if _access_key_id is None:
                 raise Exception(
@@ -25,11 +29,16 @@ class s3Client:
                     f"Environment Variable: {AWS_SECRET_ACCESS_KEY_ENV_KEY} is not set"
                 )
 
+            # one pooled connection per concurrent part of a transfer
+            _config = Config(max_pool_connections=max(10, S3_TRANSFER_MAX_CONCURRENCY))
+
             s3Client.s3_resource = boto3.resource(
                 "s3",
                 aws_access_key_id=_access_key_id,
                 aws_secret_access_key=_secret_access_key,
                 region_name=region_name,
+                endpoint_url=_endpoint_url,
+                config=_config,
             )
 
             s3Client.s3_client = boto3.client(
@@ -37,6 +46,8 @@ class s3Client:
                 aws_access_key_id=_access_key_id,
                 aws_secret_access_key=_secret_access_key,
                 region_name=region_name,
+                endpoint_url=_endpoint_url,
+                config=_config,
             )
 
         self.s3_client = s3Client.s3_client
@@ -1,57 +1,129 @@
-from us_visa.aws_cloud_storage.aws_storage import SimpleStorageService
+from us_visa.aws_cloud_storage.storage import get_storage_service
+from us_visa.aws_cloud_storage.storage_backend import StorageBackend
 from us_visa.exception import USvisaException
 from us_visa.entity.estimator import USVisaModel
+from us_visa.entity.model_bundle import BundledUSVisaModel, get_bundle_path
+from us_visa.monitoring.metrics import MODEL_LOAD_SECONDS, MODEL_LOADS
+from us_visa.constants import MODEL_BUNDLE_ENABLED, MODEL_CACHE_TTL_SECONDS
+from us_visa.logger import logging
+import os
 import sys
+import time
+import uuid
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
 from pandas import DataFrame
 
 
 class USvisaEstimator:
     """
-    This class is used to save and retrieve us_visas model from s3 bucket and do the prediction
+    This class is used to save and retrieve us_visas model from the storage backend (s3 bucket by default) and do the prediction
     """
 
     def __init__(
         self,
         bucket_name,
         model_path,
+        use_bundle: bool = MODEL_BUNDLE_ENABLED,
+        storage: Optional[StorageBackend] = None,
     ):
         """
         :param bucket_name: Name of your model bucket
         :param model_path: Location of your model in bucket
+        :param use_bundle: Load the memory mapped model bundle stored next to the model when there is one
+        :param storage: Storage backend of the bucket, the one selected by StorageConfig by default
         """
         self.bucket_name = bucket_name
-        self.s3 = SimpleStorageService()
+        self.storage = storage if storage is not None else get_storage_service()
         self.model_path = model_path
+        self.bundle_path = get_bundle_path(model_path)
+        self.use_bundle = use_bundle
         self.loaded_model: USVisaModel = None
 
     def is_model_present(self, model_path):
         try:
-            return self.s3.s3_key_path_available(
-                bucket_name=self.bucket_name, s3_key=model_path
+            return self.storage.key_path_available(
+                bucket_name=self.bucket_name, key=model_path
             )
         except USvisaException as e:
             print(e)
             return False
 
+    def get_model_version(self) -> str:
+        """
+        Version of the stored model, the ETag of the pickled model in s3 or a hash of its content
+        """
+        return self.storage.get_object_version(
+            bucket_name=self.bucket_name, key=self.model_path
+        )
+
     def load_model(
         self,
     ) -> USVisaModel:
         """
-        Load the model from the model_path
+        Load the model from the model_path, preferring its model bundle
         :return:
         """
+        if self.use_bundle:
+            try:
+                return self.storage.load_model_bundle(
+                    self.bundle_path, bucket_name=self.bucket_name
+                )
+            except Exception as e:
+                logging.info(
+                    f"Model bundle {self.bundle_path} not loaded, loading {self.model_path}: {e}"
+                )
 
-        return self.s3.load_model(self.model_path, bucket_name=self.bucket_name)
+        return self.storage.load_model(self.model_path, bucket_name=self.bucket_name)
+
+    def download_model(self, dir_path: str) -> str:
+        """
+        Download the model into dir_path, preferring its model bundle like load_model
+        :param dir_path: Local directory of the downloaded file
+        :return: Local path of the model bundle or the pickled model
+        """
+        if self.use_bundle:
+            bundle_file = os.path.join(dir_path, os.path.basename(self.bundle_path))
+            try:
+                self.storage.download_file(
+                    self.bundle_path, bucket_name=self.bucket_name, to_filename=bundle_file
+                )
+                return bundle_file
+            except Exception as e:
+                logging.info(
+                    f"Model bundle {self.bundle_path} not downloaded, downloading {self.model_path}: {e}"
+                )
+
+        model_file = os.path.join(dir_path, os.path.basename(self.model_path))
+        self.storage.download_file(
+            self.model_path, bucket_name=self.bucket_name, to_filename=model_file
+        )
+        return model_file
 
     def save_model(self, from_file, remove: bool = False) -> None:
         """
-        Save the model to the model_path
+        Save the model to the model_path, with the model bundle written next to from_file when there is one.
+        The bundle is replaced before the pickled model: readers take the version from the pickled model,
+        so once they see the new version the bundle next to it is already the new one
         :param from_file: Your local system model path
         :param remove: By default it is false that mean you will have your model locally available in your system folder
         :return:
         """
         try:
-            self.s3.upload_file(
+            bundle_file = get_bundle_path(from_file)
+            if os.path.exists(bundle_file):
+                self.storage.upload_file(
+                    bundle_file,
+                    to_filename=self.bundle_path,
+                    bucket_name=self.bucket_name,
+                    remove=remove,
+                )
+            else:
+                # never leave the bundle of the previous model next to the new one
+                self.storage.delete_file(self.bundle_path, bucket_name=self.bucket_name)
+
+            self.storage.upload_file(
                 from_file,
                 to_filename=self.model_path,
                 bucket_name=self.bucket_name,
@@ -71,3 +143,191 @@ class USvisaEstimator:
             return self.loaded_model.predict(dataframe=dataframe)
         except Exception as e:
             raise USvisaException(e, sys)
+
+
+@dataclass
+class CachedModelEntry:
+    model: Optional[USVisaModel] = None
+    loaded_at: Optional[float] = None
+    version: Optional[str] = None
+    loading: Optional[threading.Event] = None
+    error: Optional[Exception] = None
+
+
+class USvisaModelCache:
+    """
+    This class keeps one loaded us_visa model per bucket and model path for the whole process.
+    Concurrent callers share a single load: one of them downloads the model, the rest wait for it.
+    Every model is cached with the version of the stored model, when ttl_seconds pass the version is checked
+    and the model is only downloaded again if it changed
+    """
+
+    _lock = threading.Lock()
+    _entries: Dict[Tuple[str, str], CachedModelEntry] = {}
+
+    def __init__(
+        self,
+        bucket_name,
+        model_path,
+        ttl_seconds: float = MODEL_CACHE_TTL_SECONDS,
+        compile_preprocessor: bool = False,
+    ):
+        """
+        :param bucket_name: Name of your model bucket
+        :param model_path: Location of your model in bucket
+        :param ttl_seconds: Age after which the version of the stored model is checked, 0 means never check by age
+        :param compile_preprocessor: Compile the preprocessor of every loaded model for fast single row predictions
+        """
+        self.bucket_name = bucket_name
+        self.model_path = model_path
+        self.ttl_seconds = ttl_seconds
+        self.compile_preprocessor = compile_preprocessor
+        self._key = (bucket_name, model_path)
+
+    def _entry(self) -> CachedModelEntry:
+        return USvisaModelCache._entries.setdefault(self._key, CachedModelEntry())
+
+    def _is_fresh(self, entry: CachedModelEntry) -> bool:
+        if entry.model is None or entry.loaded_at is None:
+            return False
+        if not self.ttl_seconds or self.ttl_seconds <= 0:
+            return True
+        return time.monotonic() - entry.loaded_at < self.ttl_seconds
+
+    def is_fresh(self) -> bool:
+        """
+        True when get_model returns the cached model without touching the storage backend
+        """
+        with USvisaModelCache._lock:
+            return self._is_fresh(self._entry())
+
+    @property
+    def model_version(self) -> Optional[str]:
+        """
+        Version of the cached model, see USvisaEstimator.get_model_version
+        """
+        with USvisaModelCache._lock:
+            return self._entry().version
+
+    def get_model(self) -> USVisaModel:
+        """
+        Return the cached model, loading it if it is missing or older than ttl_seconds.
+        While a stale model is being refreshed the other callers keep using the stale one.
+        :return: USVisaModel
+        """
+        return self.get_model_and_version()[0]
+
+    def get_model_and_version(self) -> Tuple[USVisaModel, str]:
+        """
+        Same as get_model, with the version of the returned model read together with it
+        :return: USVisaModel and its version
+        """
+        try:
+            with USvisaModelCache._lock:
+                entry = self._entry()
+                if self._is_fresh(entry):
+                    return entry.model, entry.version
+
+                if entry.loading is not None:
+                    if entry.model is not None:
+                        return entry.model, entry.version
+                    is_leader = False
+                    loading = entry.loading
+                else:
+                    is_leader = True
+                    loading = entry.loading = threading.Event()
+
+            if not is_leader:
+                loading.wait()
+                with USvisaModelCache._lock:
+                    if entry.model is None:
+                        raise Exception(f"Model loading failed: {entry.error}")
+                    return entry.model, entry.version
+
+            return self._load(entry, loading)
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def _load(self, entry: CachedModelEntry, loading: threading.Event) -> Tuple[USVisaModel, str]:
+        try:
+            estimator = USvisaEstimator(
+                bucket_name=self.bucket_name, model_path=self.model_path
+            )
+            # read before the model, a model replaced in between is cached with the older version
+            # and reloaded by the next check instead of keeping the version of a model it is not
+            version = estimator.get_model_version()
+
+            with USvisaModelCache._lock:
+                if entry.model is not None and entry.version == version:
+                    entry.loaded_at = time.monotonic()
+                    entry.error = None
+                    entry.loading = None
+                    loading.set()
+                    MODEL_LOADS.labels(source="version_check", result="unchanged").inc()
+                    return entry.model, entry.version
+
+            logging.info(
+                f"Loading model {self.model_path} version {version} from {self.bucket_name} bucket into model cache"
+            )
+            start = time.perf_counter()
+            model = estimator.load_model()
+            if self.compile_preprocessor:
+                model.compile_preprocessor()
+            duration = time.perf_counter() - start
+
+            source = "bundle" if isinstance(model, BundledUSVisaModel) else "pickle"
+            MODEL_LOADS.labels(source=source, result="success").inc()
+            MODEL_LOAD_SECONDS.labels(source=source).observe(duration)
+
+        except Exception as e:
+            MODEL_LOADS.labels(source="any", result="error").inc()
+            with USvisaModelCache._lock:
+                entry.error = e
+                entry.loading = None
+                stale_model, stale_version = entry.model, entry.version
+            loading.set()
+
+            if stale_model is None:
+                raise e
+            logging.info(f"Model reload failed, serving the cached model: {e}")
+            return stale_model, stale_version
+
+        with USvisaModelCache._lock:
+            entry.model = model
+            entry.loaded_at = time.monotonic()
+            entry.version = version
+            entry.error = None
+            entry.loading = None
+        loading.set()
+
+        logging.info(f"Loaded model into model cache in {duration:.3f} seconds")
+        return model, version
+
+    def put(self, model: USVisaModel, version: Optional[str] = None) -> None:
+        """
+        Put an already loaded model in the cache, e.g. one trained or loaded from a local file
+        :param version: Version of the model, a new unique one by default
+        """
+        with USvisaModelCache._lock:
+            entry = self._entry()
+            entry.model = model
+            entry.loaded_at = time.monotonic()
+            entry.version = version if version is not None else uuid.uuid4().hex
+            entry.error = None
+        logging.info(f"Put model {self.model_path} of {self.bucket_name} bucket into model cache")
+
+    def invalidate(self) -> None:
+        """
+        Mark the cached model as expired, the next get_model call reloads it if its version changed
+        """
+        with USvisaModelCache._lock:
+            self._entry().loaded_at = None
+
+    def reload(self) -> USVisaModel:
+        """
+        Check the stored model now instead of waiting for ttl_seconds to pass, it is reloaded if its version changed
+        :return: USVisaModel
+        """
+        self.invalidate()
+        return self.get_model()
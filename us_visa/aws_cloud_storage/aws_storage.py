@@ -1,25 +1,61 @@
 import boto3
 from us_visa.aws_cloud_storage.aws_connection import s3Client
-from io import StringIO
+from us_visa.aws_cloud_storage.local_cache import S3LocalCache
+from us_visa.aws_cloud_storage.s3_transfer import S3StreamingTransfer
+from us_visa.aws_cloud_storage.storage_backend import StorageBackend
+from us_visa.constants import MODEL_BUNDLE_FILE_EXTENSION, MODEL_BUNDLE_SHARED_DIR
+from us_visa.entity.config_entity import S3CacheConfig, S3TransferConfig
+from us_visa.entity.model_bundle import BundledUSVisaModel, load_model_bundle
+from io import TextIOWrapper
 from typing import Union, List
 import os, sys
 from us_visa.logger import logging
+from us_visa.monitoring.metrics import S3_LOAD_SECONDS
+from us_visa.monitoring.profiler import profile_block
+from us_visa.utils.main_utils import file_lock
 from mypy_boto3_s3.service_resource import Bucket
 from us_visa.exception import USvisaException
 from botocore.exceptions import ClientError
 from pandas import DataFrame, read_csv
 import pickle
+import hashlib
+import tempfile
 
 
-class SimpleStorageService:
+class SimpleStorageService(StorageBackend):
 
-    def __init__(self):
+    def __init__(
+        self,
+        s3_cache_config: S3CacheConfig = S3CacheConfig(),
+        s3_transfer_config: S3TransferConfig = S3TransferConfig(),
+        bundle_dir: str = MODEL_BUNDLE_SHARED_DIR,
+    ):
+        """
+        :param s3_cache_config: Local cache of the downloaded objects
+        :param s3_transfer_config: Part size and concurrency of the transfers
+        :param bundle_dir: Directory of the model bundles mapped by the workers of the host when the cache is disabled
+        """
         s3_client = s3Client()
         self.s3_resource = s3_client.s3_resource
         self.s3_client = s3_client.s3_client
+        self.transfer = S3StreamingTransfer(self.s3_client, s3_transfer_config)
+        self.local_cache = (
+            S3LocalCache(s3_cache_config, s3_transfer_config)
+            if s3_cache_config.enabled
+            else None
+        )
+        self.bundle_dir = bundle_dir
 
     def s3_key_path_available(self, bucket_name, s3_key) -> bool:
         try:
+            try:
+                self.s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+                return True
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                    raise e
+
+            # no object with this exact key, it may still be a prefix of other keys
             bucket = self.get_bucket(bucket_name)
             file_objects = [
                 file_object for file_object in bucket.objects.filter(Prefix=s3_key)
@@ -31,13 +67,31 @@ class SimpleStorageService:
         except Exception as e:
             raise USvisaException(e, sys)
 
+    def key_path_available(self, bucket_name: str, key: str) -> bool:
+        return self.s3_key_path_available(bucket_name=bucket_name, s3_key=key)
+
+    def get_object_version(self, bucket_name: str, key: str) -> str:
+        """
+        Method Name :   get_object_version
+        Description :   This method reads the ETag of the key object of bucket_name bucket,
+                        s3 gives a new object a new ETag unless its content is the same
+
+        Output      :   ETag of the object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return self.s3_client.head_object(Bucket=bucket_name, Key=key)["ETag"]
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
     @staticmethod
     def read_object(
         object_name: str, decode: bool = True, make_readable: bool = False
-    ) -> Union[StringIO, str]:
+    ) -> Union[TextIOWrapper, str, bytes]:
         """
         Method Name :   read_object
-        Description :   This method reads the object_name object with kwargs
+        Description :   This method reads the object_name object with kwargs, make_readable returns a text stream
+                        over the response body instead of a copy of the object
 
         Output      :   The column name is renamed
         On Failure  :   Write an exception log and then raise an exception
@@ -48,14 +102,14 @@ class SimpleStorageService:
         logging.info("Entered the read_object method of S3Operations class")
 
         try:
-            func = lambda: (
-                object_name.get()["Body"].read().decode()
-                if decode is True
-                else object_name.get()["Body"].read()
-            )
-            conv_func = lambda: StringIO(func()) if make_readable is True else func()
+            body = object_name.get()["Body"]
+            if make_readable is True:
+                logging.info("Exited the read_object method of S3Operations class")
+                return TextIOWrapper(body)
+
+            content = body.read().decode() if decode is True else body.read()
             logging.info("Exited the read_object method of S3Operations class")
-            return conv_func()
+            return content
 
         except Exception as e:
             raise USvisaException(e, sys) from e
@@ -132,15 +186,123 @@ class SimpleStorageService:
                 model_name if model_dir is None else model_dir + "/" + model_name
             )
             model_file = func()
-            file_object = self.get_file_object(model_file, bucket_name)
-            model_obj = self.read_object(file_object, decode=False)
-            model = pickle.loads(model_obj)
+            with S3_LOAD_SECONDS.time():
+                if self.local_cache is not None:
+                    cached_file_path = self.local_cache.get_object_path(
+                        self.s3_client, bucket_name, model_file
+                    )
+                    with open(cached_file_path, "rb") as cached_file:
+                        model = pickle.load(cached_file)
+                else:
+                    with self.transfer.open_object(bucket_name, model_file) as model_stream:
+                        model = pickle.load(model_stream)
+
             logging.info("Exited the load_model method of S3Operations class")
             return model
 
         except Exception as e:
             raise USvisaException(e, sys) from e
 
+    def load_model_bundle(self, model_name: str, bucket_name: str) -> BundledUSVisaModel:
+        """
+        Method Name :   load_model_bundle
+        Description :   This method maps the model_name model bundle of bucket_name bucket from a local file.
+                        The file is the s3 cache copy when the cache is enabled, otherwise a download into
+                        bundle_dir shared by the workers of the host, so they all map the same pages
+
+        Output      :   BundledUSVisaModel backed by the mapped file
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the load_model_bundle method of S3Operations class")
+
+        try:
+            with S3_LOAD_SECONDS.time():
+                if self.local_cache is not None:
+                    cached_file_path = self.local_cache.get_object_path(
+                        self.s3_client, bucket_name, model_name
+                    )
+                    model = load_model_bundle(cached_file_path)
+                else:
+                    model = self._load_shared_model_bundle(model_name, bucket_name)
+
+            logging.info("Exited the load_model_bundle method of S3Operations class")
+            return model
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def _load_shared_model_bundle(self, model_name: str, bucket_name: str) -> BundledUSVisaModel:
+        """
+        Map the bundle from bundle_dir, where every version is stored once under a name made of bucket, key and ETag.
+        The version is resolved, downloaded when missing and mapped under a flock of the key, the previous versions
+        are then removed: a worker that mapped one keeps its mapping, and no worker is between resolving and mapping it
+        """
+        key_id = hashlib.sha256(f"{bucket_name}/{model_name}".encode()).hexdigest()
+
+        def get_bundle_path(etag: str) -> str:
+            version_id = hashlib.sha256(etag.encode()).hexdigest()[:16]
+            return os.path.join(self.bundle_dir, f"{key_id}-{version_id}{MODEL_BUNDLE_FILE_EXTENSION}")
+
+        os.makedirs(self.bundle_dir, exist_ok=True)
+        with file_lock(os.path.join(self.bundle_dir, f"{key_id}.lock")):
+            bundle_path = get_bundle_path(self.get_object_version(bucket_name, model_name))
+            if not os.path.exists(bundle_path):
+                fd, tmp_path = tempfile.mkstemp(dir=self.bundle_dir, prefix=".download-")
+                os.close(fd)
+                try:
+                    etag, _ = self.transfer.download_file(bucket_name, model_name, tmp_path)
+                    # the object may have changed since its version was read
+                    bundle_path = get_bundle_path(etag)
+                    os.replace(tmp_path, bundle_path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+
+            model = load_model_bundle(bundle_path)
+
+            for file_name in os.listdir(self.bundle_dir):
+                file_path = os.path.join(self.bundle_dir, file_name)
+                if file_name.startswith(f"{key_id}-") and file_path != bundle_path:
+                    os.remove(file_path)
+
+        return model
+
+    def download_file(self, filename: str, bucket_name: str, to_filename: str) -> None:
+        """
+        Method Name :   download_file
+        Description :   This method downloads the filename file of bucket_name bucket to the local to_filename file,
+                        in ranged parts fetched in parallel
+
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the download_file method of S3Operations class")
+
+        try:
+            self.transfer.download_file(bucket_name, filename, to_filename)
+
+            logging.info("Exited the download_file method of S3Operations class")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def delete_file(self, filename: str, bucket_name: str) -> None:
+        """
+        Method Name :   delete_file
+        Description :   This method deletes the filename file of bucket_name bucket, missing files are ignored
+
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the delete_file method of S3Operations class")
+
+        try:
+            self.s3_client.delete_object(Bucket=bucket_name, Key=filename)
+
+            logging.info(f"Deleted {filename} file from {bucket_name} bucket")
+            logging.info("Exited the delete_file method of S3Operations class")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
         """
         Method Name :   create_folder
@@ -189,9 +351,10 @@ class SimpleStorageService:
                 f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket"
             )
 
-            self.s3_resource.meta.client.upload_file(
-                from_filename, bucket_name, to_filename
-            )
+            with profile_block("SimpleStorageService.upload_file") as block:
+                block.extra["bytes"] = os.path.getsize(from_filename)
+                block.extra["key"] = to_filename
+                self.transfer.upload_file(from_filename, bucket_name, to_filename)
 
             logging.info(
                 f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket"
@@ -219,7 +382,8 @@ class SimpleStorageService:
     ) -> None:
         """
         Method Name :   upload_df_as_csv
-        Description :   This method uploads the dataframe to bucket_filename csv file in bucket_name bucket
+        Description :   This method uploads the dataframe to bucket_filename csv file in bucket_name bucket.
+                        The csv is encoded straight into the multipart upload, local_filename is not written
 
         Output      :   Folder is created in s3 bucket
         On Failure  :   Write an exception log and then raise an exception
@@ -230,9 +394,13 @@ class SimpleStorageService:
         logging.info("Entered the upload_df_as_csv method of S3Operations class")
 
         try:
-            data_frame.to_csv(local_filename, index=None, header=True)
-
-            self.upload_file(local_filename, bucket_filename, bucket_name)
+            with profile_block(
+                "SimpleStorageService.upload_df_as_csv", rows_in=len(data_frame)
+            ) as block:
+                block.extra["key"] = bucket_filename
+                self.transfer.upload_dataframe_as_csv(
+                    data_frame, bucket_name, bucket_filename
+                )
 
             logging.info("Exited the upload_df_as_csv method of S3Operations class")
 
@@ -253,8 +421,8 @@ class SimpleStorageService:
         logging.info("Entered the get_df_from_object method of S3Operations class")
 
         try:
-            content = self.read_object(object_, make_readable=True)
-            df = read_csv(content, na_values="na")
+            with self.transfer.open_object(object_.bucket_name, object_.key) as content:
+                df = read_csv(content, na_values="na")
             logging.info("Exited the get_df_from_object method of S3Operations class")
             return df
         except Exception as e:
@@ -274,8 +442,16 @@ class SimpleStorageService:
         logging.info("Entered the read_csv method of S3Operations class")
 
         try:
-            csv_obj = self.get_file_object(filename, bucket_name)
-            df = self.get_df_from_object(csv_obj)
+            if self.local_cache is not None:
+                cached_file_path = self.local_cache.get_object_path(
+                    self.s3_client, bucket_name, filename
+                )
+                df = read_csv(cached_file_path, na_values="na")
+                logging.info("Exited the read_csv method of S3Operations class")
+                return df
+
+            with self.transfer.open_object(bucket_name, filename) as content:
+                df = read_csv(content, na_values="na")
             logging.info("Exited the read_csv method of S3Operations class")
             return df
         except Exception as e:
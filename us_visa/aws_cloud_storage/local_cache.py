@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from us_visa.aws_cloud_storage.s3_transfer import S3StreamingTransfer
+from us_visa.entity.config_entity import S3CacheConfig, S3TransferConfig
+from us_visa.utils.main_utils import file_lock
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class S3LocalCache:
+    """
+    This class keeps downloaded s3 objects in a local directory, content addressed by bucket, key and ETag.
+    A cached object is revalidated with a conditional GET (If-None-Match) of its first part and served from disk
+    when unchanged, changed objects are downloaded in parallel ranged parts,
+    and the least recently used objects are evicted when the directory grows over max_bytes.
+    The directory is shared by the api workers and the batch workers of the host: index.json is only read,
+    updated and written under the flock of index.lock, downloads go to a temporary file moved into place
+    without holding it. An object resolved less than eviction_grace_seconds ago is never evicted,
+    so a path handed out to a process stays on disk while that process opens it
+    """
+
+    def __init__(
+        self,
+        s3_cache_config: S3CacheConfig = S3CacheConfig(),
+        s3_transfer_config: S3TransferConfig = S3TransferConfig(),
+    ) -> None:
+        try:
+            self.s3_cache_config = s3_cache_config
+            self.s3_transfer_config = s3_transfer_config
+            self.cache_dir = s3_cache_config.cache_dir
+            self.objects_dir = os.path.join(self.cache_dir, "objects")
+            self.index_file_path = os.path.join(self.cache_dir, "index.json")
+            self.lock_file_path = os.path.join(self.cache_dir, "index.lock")
+            os.makedirs(self.objects_dir, exist_ok=True)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    @staticmethod
+    def object_id(bucket_name: str, key: str, etag: str) -> str:
+        return hashlib.sha256(f"{bucket_name}/{key}/{etag}".encode()).hexdigest()
+
+    def get_file_path(self, object_id: str) -> str:
+        return os.path.join(self.objects_dir, object_id)
+
+    def _read_index(self) -> Dict[str, dict]:
+        if not os.path.exists(self.index_file_path):
+            return {}
+        try:
+            with open(self.index_file_path) as index_file:
+                return json.load(index_file)
+        except ValueError:
+            logging.info(f"Ignoring unreadable s3 cache index {self.index_file_path}")
+            return {}
+
+    def _write_index(self, index: Dict[str, dict]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".json")
+        with os.fdopen(fd, "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(tmp_path, self.index_file_path)
+
+    def _find(self, index: Dict[str, dict], bucket_name: str, key: str) -> Optional[str]:
+        for object_id, entry in index.items():
+            if entry["bucket"] == bucket_name and entry["key"] == key and not entry.get("stale"):
+                if os.path.exists(self.get_file_path(object_id)):
+                    return object_id
+        return None
+
+    def _remove(self, index: Dict[str, dict], object_id: str) -> None:
+        index.pop(object_id, None)
+        try:
+            os.remove(self.get_file_path(object_id))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, index: Dict[str, dict], keep: str, now: float) -> None:
+        """
+        Remove the replaced versions, then the least recently used objects while the cache is over max_bytes.
+        Objects resolved within the grace period are kept, another process may be about to open them
+        """
+        grace_seconds = self.s3_cache_config.eviction_grace_seconds
+        total = sum(entry["size"] for entry in index.values())
+        # replaced versions first, oldest access first
+        entries = sorted(index.items(), key=lambda item: (not item[1].get("stale"), item[1]["last_access"]))
+        for object_id, entry in entries:
+            if not entry.get("stale") and total <= self.s3_cache_config.max_bytes:
+                break
+            if object_id == keep or now - entry["last_access"] < grace_seconds:
+                continue
+            logging.info(f"Evicting {entry['key']} from s3 cache")
+            total -= entry["size"]
+            self._remove(index, object_id)
+
+    def _lookup(self, bucket_name: str, key: str) -> Optional[Tuple[str, str]]:
+        """
+        :return: Id and ETag of the cached version of the object, None when it is not cached
+        """
+        with file_lock(self.lock_file_path):
+            index = self._read_index()
+        object_id = self._find(index, bucket_name, key)
+        if object_id is None:
+            return None
+        return object_id, index[object_id]["etag"]
+
+    def _touch(self, object_id: str) -> bool:
+        """
+        Record an access of a cached object
+        :return: False when the object was evicted since it was looked up
+        """
+        with file_lock(self.lock_file_path):
+            index = self._read_index()
+            if object_id not in index or not os.path.exists(self.get_file_path(object_id)):
+                return False
+            index[object_id]["last_access"] = time.time()
+            self._write_index(index)
+        return True
+
+    def _add(self, object_id: str, bucket_name: str, key: str, etag: str, size: int) -> None:
+        """
+        Record a downloaded object, mark the other versions of its key as replaced and evict
+        """
+        with file_lock(self.lock_file_path):
+            index = self._read_index()
+            for other_id, entry in index.items():
+                if other_id != object_id and entry["bucket"] == bucket_name and entry["key"] == key:
+                    entry["stale"] = True
+
+            now = time.time()
+            index[object_id] = {
+                "bucket": bucket_name,
+                "key": key,
+                "etag": etag,
+                "size": size,
+                "last_access": now,
+            }
+            self._evict(index, keep=object_id, now=now)
+            self._write_index(index)
+
+    def _download(
+        self, transfer: S3StreamingTransfer, response: dict, bucket_name: str, key: str
+    ) -> tuple:
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix=".download-")
+        os.close(fd)
+        try:
+            etag, size = transfer.download_file(bucket_name, key, tmp_path, response=response)
+            object_id = self.object_id(bucket_name, key, etag)
+            # a process downloading the same version at the same time writes the same bytes,
+            # a reader of the replaced file keeps its open copy
+            os.replace(tmp_path, self.get_file_path(object_id))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return object_id, etag, size
+
+    def get_object_path(self, s3_client, bucket_name: str, key: str) -> str:
+        """
+        Return a local file holding the current version of the object, downloading it only when it changed
+        :param s3_client: boto3 s3 client
+        :param bucket_name: Name of the bucket
+        :param key: Key of the object in the bucket
+        :return: Path of the cached file
+        """
+        logging.info("Entered the get_object_path method of S3LocalCache class")
+        try:
+            transfer = S3StreamingTransfer(s3_client, self.s3_transfer_config)
+            cached = self._lookup(bucket_name, key)
+
+            response = None
+            if cached is not None:
+                object_id, etag = cached
+                try:
+                    response = transfer.get_object(bucket_name, key, IfNoneMatch=etag)
+                except ClientError as e:
+                    status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+                    if status != 304:
+                        raise e
+                    if self._touch(object_id):
+                        logging.info(f"{key} in {bucket_name} bucket is unchanged, serving it from s3 cache")
+                        logging.info("Exited the get_object_path method of S3LocalCache class")
+                        return self.get_file_path(object_id)
+                    logging.info(f"{key} in {bucket_name} bucket was evicted from s3 cache, downloading it")
+
+            if response is None:
+                response = transfer.get_object(bucket_name, key)
+
+            object_id, etag, size = self._download(transfer, response, bucket_name, key)
+            self._add(object_id, bucket_name, key, etag, size)
+            logging.info(f"Downloaded {size} bytes of {key} from {bucket_name} bucket into s3 cache")
+
+            logging.info("Exited the get_object_path method of S3LocalCache class")
+            return self.get_file_path(object_id)
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
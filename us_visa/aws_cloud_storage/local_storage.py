@@ -0,0 +1,258 @@
+import io
+import os
+import sys
+import hashlib
+import pickle
+import shutil
+import tempfile
+import threading
+from typing import Dict, Tuple
+
+from pandas import DataFrame, read_csv
+
+from us_visa.aws_cloud_storage.storage_backend import StorageBackend
+from us_visa.entity.model_bundle import BundledUSVisaModel, load_model_bundle
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.monitoring.profiler import profile_block
+
+
+def _join_key(model_name: str, model_dir: str = None) -> str:
+    return model_name if model_dir is None else model_dir + "/" + model_name
+
+
+HASH_CHUNK_BYTES: int = 1024 * 1024
+
+
+class LocalStorageService(StorageBackend):
+    """
+    This class keeps the objects of every bucket as files below root_dir/<bucket_name>/<key>.
+    Models are read straight from disk and model bundles are mapped from their file without a copy
+    """
+
+    def __init__(self, root_dir: str) -> None:
+        """
+        :param root_dir: Directory holding one sub directory per bucket
+        """
+        try:
+            self.root_dir = os.path.abspath(root_dir)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def get_object_path(self, bucket_name: str, key: str) -> str:
+        """
+        Local file of the key in the bucket, keys may not point outside of the bucket directory
+        """
+        bucket_dir = os.path.join(self.root_dir, bucket_name)
+        object_path = os.path.normpath(os.path.join(bucket_dir, key))
+        if not object_path.startswith(os.path.normpath(bucket_dir) + os.sep):
+            raise Exception(f"Key {key} is outside of {bucket_name} bucket")
+        return object_path
+
+    def key_path_available(self, bucket_name: str, key: str) -> bool:
+        try:
+            object_path = self.get_object_path(bucket_name, key)
+            if os.path.isfile(object_path):
+                return True
+
+            # no object with this exact key, it may still be a prefix of other keys
+            bucket_dir = os.path.join(self.root_dir, bucket_name)
+            for directory, _, file_names in os.walk(bucket_dir):
+                for file_name in file_names:
+                    if os.path.join(directory, file_name).startswith(object_path):
+                        return True
+            return False
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def get_object_version(self, bucket_name: str, key: str) -> str:
+        """
+        :return: sha256 of the content of the object file
+        """
+        try:
+            content_hash = hashlib.sha256()
+            with open(self.get_object_path(bucket_name, key), "rb") as object_file:
+                for data in iter(lambda: object_file.read(HASH_CHUNK_BYTES), b""):
+                    content_hash.update(data)
+            return content_hash.hexdigest()
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
+        logging.info("Entered the load_model method of LocalStorageService class")
+
+        try:
+            with open(self.get_object_path(bucket_name, _join_key(model_name, model_dir)), "rb") as model_file:
+                model = pickle.load(model_file)
+
+            logging.info("Exited the load_model method of LocalStorageService class")
+            return model
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def load_model_bundle(self, model_name: str, bucket_name: str) -> BundledUSVisaModel:
+        logging.info("Entered the load_model_bundle method of LocalStorageService class")
+
+        try:
+            model = load_model_bundle(self.get_object_path(bucket_name, model_name))
+
+            logging.info("Exited the load_model_bundle method of LocalStorageService class")
+            return model
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def upload_file(
+        self,
+        from_filename: str,
+        to_filename: str,
+        bucket_name: str,
+        remove: bool = True,
+    ) -> None:
+        logging.info("Entered the upload_file method of LocalStorageService class")
+
+        try:
+            object_path = self.get_object_path(bucket_name, to_filename)
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+            # copy next to the target and rename, so readers never see a partly written object
+            # and models already mapped from the old file keep their pages
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(object_path), suffix=".tmp")
+            os.close(fd)
+            try:
+                with profile_block("LocalStorageService.upload_file") as block:
+                    block.extra["bytes"] = os.path.getsize(from_filename)
+                    block.extra["key"] = to_filename
+                    shutil.copyfile(from_filename, tmp_path)
+                    os.replace(tmp_path, object_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            logging.info(f"Stored {from_filename} file as {to_filename} in {bucket_name} bucket directory")
+
+            if remove is True:
+                os.remove(from_filename)
+
+            logging.info("Exited the upload_file method of LocalStorageService class")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def download_file(self, filename: str, bucket_name: str, to_filename: str) -> None:
+        try:
+            shutil.copyfile(self.get_object_path(bucket_name, filename), to_filename)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def delete_file(self, filename: str, bucket_name: str) -> None:
+        try:
+            object_path = self.get_object_path(bucket_name, filename)
+            if os.path.isfile(object_path):
+                os.remove(object_path)
+                logging.info(f"Deleted {filename} file from {bucket_name} bucket directory")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def read_csv(self, filename: str, bucket_name: str) -> DataFrame:
+        try:
+            return read_csv(self.get_object_path(bucket_name, filename), na_values="na")
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+class InMemoryStorageService(StorageBackend):
+    """
+    This class keeps the objects of every bucket in the memory of the process, shared by all instances.
+    Meant for tests and benchmark runs: nothing survives the process and nothing is shared between processes
+    """
+
+    _lock = threading.Lock()
+    _objects: Dict[Tuple[str, str], bytes] = {}
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._objects.clear()
+
+    def put_object(self, bucket_name: str, key: str, data: bytes) -> None:
+        with InMemoryStorageService._lock:
+            InMemoryStorageService._objects[(bucket_name, key)] = bytes(data)
+
+    def get_object(self, bucket_name: str, key: str) -> bytes:
+        with InMemoryStorageService._lock:
+            data = InMemoryStorageService._objects.get((bucket_name, key))
+        if data is None:
+            raise Exception(f"No object {key} in {bucket_name} bucket")
+        return data
+
+    def key_path_available(self, bucket_name: str, key: str) -> bool:
+        with InMemoryStorageService._lock:
+            return any(
+                object_bucket == bucket_name and object_key.startswith(key)
+                for object_bucket, object_key in InMemoryStorageService._objects
+            )
+
+    def get_object_version(self, bucket_name: str, key: str) -> str:
+        """
+        :return: sha256 of the stored bytes
+        """
+        try:
+            return hashlib.sha256(self.get_object(bucket_name, key)).hexdigest()
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
+        try:
+            return pickle.loads(self.get_object(bucket_name, _join_key(model_name, model_dir)))
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def load_model_bundle(self, model_name: str, bucket_name: str) -> BundledUSVisaModel:
+        try:
+            # the arrays of the model are views on the stored bytes
+            return load_model_bundle(self.get_object(bucket_name, model_name))
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def upload_file(
+        self,
+        from_filename: str,
+        to_filename: str,
+        bucket_name: str,
+        remove: bool = True,
+    ) -> None:
+        try:
+            with profile_block("InMemoryStorageService.upload_file") as block:
+                block.extra["bytes"] = os.path.getsize(from_filename)
+                block.extra["key"] = to_filename
+                with open(from_filename, "rb") as local_file:
+                    self.put_object(bucket_name, to_filename, local_file.read())
+
+            logging.info(f"Stored {from_filename} file as {to_filename} in {bucket_name} memory bucket")
+
+            if remove is True:
+                os.remove(from_filename)
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def download_file(self, filename: str, bucket_name: str, to_filename: str) -> None:
+        try:
+            with open(to_filename, "wb") as local_file:
+                local_file.write(self.get_object(bucket_name, filename))
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def delete_file(self, filename: str, bucket_name: str) -> None:
+        with InMemoryStorageService._lock:
+            InMemoryStorageService._objects.pop((bucket_name, filename), None)
+
+    def read_csv(self, filename: str, bucket_name: str) -> DataFrame:
+        try:
+            return read_csv(io.BytesIO(self.get_object(bucket_name, filename)), na_values="na")
+        except Exception as e:
+            raise USvisaException(e, sys) from e
@@ -0,0 +1,263 @@
+import io
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from pandas import DataFrame
+
+from us_visa.entity.config_entity import S3TransferConfig
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+IO_CHUNK_BYTES: int = 1024 * 1024
+
+
+def get_object_size(response: dict) -> int:
+    """
+    Size of the whole object of a get_object response, also when only a range of it was requested
+    """
+    content_range = response.get("ContentRange")
+    if content_range:
+        return int(content_range.rsplit("/", 1)[1])
+    return response["ContentLength"]
+
+
+class S3ObjectReader(io.RawIOBase):
+    """
+    Readable stream over an s3 object. The first part is read from the response that opened the object,
+    the next parts are fetched as ranged GETs, up to max_concurrency of them ahead of the reader.
+    Only the parts in flight are held in memory, never the whole object
+    """
+
+    def __init__(self, transfer: "S3StreamingTransfer", bucket_name: str, key: str, response: dict) -> None:
+        self.transfer = transfer
+        self.bucket_name = bucket_name
+        self.key = key
+        self._etag = response["ETag"]
+        self._body = response["Body"]
+        self._buffer = memoryview(b"")
+        self._ranges = deque(transfer.get_part_ranges(response))
+        self._pending: Deque[Future] = deque()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._fetch_ahead()
+
+    def readable(self) -> bool:
+        return True
+
+    def _fetch_ahead(self) -> None:
+        max_concurrency = self.transfer.s3_transfer_config.max_concurrency
+        while self._ranges and len(self._pending) < max_concurrency:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="s3-read")
+            start, end = self._ranges.popleft()
+            self._pending.append(
+                self._executor.submit(
+                    self.transfer.read_part, self.bucket_name, self.key, self._etag, start, end
+                )
+            )
+
+    def readinto(self, b) -> int:
+        if self._body is not None:
+            size = self._body.readinto(b)
+            if size:
+                return size
+            self._body.close()
+            self._body = None
+
+        while not self._buffer:
+            self._fetch_ahead()
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self) -> None:
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+        self._buffer = memoryview(b"")
+        super().close()
+
+
+class DataFrameCsvStream(io.RawIOBase):
+    """
+    Readable stream of the csv encoding of a dataframe, encoded chunk_rows rows at a time as it is read
+    """
+
+    def __init__(self, data_frame: DataFrame, chunk_rows: int) -> None:
+        self._chunks = self._encode(data_frame, chunk_rows)
+        self._buffer = memoryview(b"")
+
+    @staticmethod
+    def _encode(data_frame: DataFrame, chunk_rows: int) -> Iterator[bytes]:
+        for start in range(0, max(len(data_frame), 1), chunk_rows):
+            yield data_frame.iloc[start : start + chunk_rows].to_csv(
+                index=None, header=start == 0
+            ).encode()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class S3StreamingTransfer:
+    """
+    This class moves s3 objects without holding a full copy of them in memory: downloads are split in
+    ranged parts fetched max_concurrency at a time, uploads go through the multipart transfer manager of boto3
+    with the same part size and concurrency
+    """
+
+    def __init__(self, s3_client, s3_transfer_config: S3TransferConfig = S3TransferConfig()) -> None:
+        """
+        :param s3_client: boto3 s3 client, shared by the transfer threads
+        :param s3_transfer_config: Part size and concurrency of the transfers
+        """
+        self.s3_client = s3_client
+        self.s3_transfer_config = s3_transfer_config
+        self.transfer_config = TransferConfig(
+            multipart_threshold=s3_transfer_config.multipart_threshold_bytes,
+            multipart_chunksize=s3_transfer_config.part_size_bytes,
+            max_concurrency=s3_transfer_config.max_concurrency,
+        )
+
+    def get_object(self, bucket_name: str, key: str, **kwargs) -> dict:
+        """
+        GET of the first part of the object, the size of the whole object is in its ContentRange
+        :param kwargs: Other get_object arguments, e.g. IfNoneMatch
+        :return: get_object response
+        """
+        try:
+            return self.s3_client.get_object(
+                Bucket=bucket_name,
+                Key=key,
+                Range=f"bytes=0-{self.s3_transfer_config.part_size_bytes - 1}",
+                **kwargs,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "InvalidRange":
+                raise e
+            # an empty object has no byte range to ask for
+            return self.s3_client.get_object(Bucket=bucket_name, Key=key, **kwargs)
+
+    def get_part_ranges(self, response: dict) -> List[Tuple[int, int]]:
+        """
+        Inclusive byte ranges of the parts of the object that follow the part of response
+        """
+        size = get_object_size(response)
+        part_size = self.s3_transfer_config.part_size_bytes
+        return [
+            (start, min(start + part_size, size) - 1)
+            for start in range(response["ContentLength"], size, part_size)
+        ]
+
+    def read_part(self, bucket_name: str, key: str, etag: str, start: int, end: int) -> bytes:
+        # IfMatch fails the transfer instead of mixing parts of two versions of the object
+        response = self.s3_client.get_object(
+            Bucket=bucket_name, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag
+        )
+        return response["Body"].read()
+
+    def _write_part(
+        self, file_path: str, bucket_name: str, key: str, etag: str, start: int, end: int
+    ) -> None:
+        response = self.s3_client.get_object(
+            Bucket=bucket_name, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag
+        )
+        self._write_body(file_path, response["Body"], start)
+
+    @staticmethod
+    def _write_body(file_path: str, body, position: int) -> None:
+        with open(file_path, "r+b") as object_file:
+            object_file.seek(position)
+            for data in body.iter_chunks(IO_CHUNK_BYTES):
+                object_file.write(data)
+
+    def open_object(self, bucket_name: str, key: str, response: Optional[dict] = None) -> io.BufferedReader:
+        """
+        Open the object as a binary stream, e.g. for read_csv or pickle.load
+        :param response: get_object response of the first part, fetched when not given
+        """
+        try:
+            if response is None:
+                response = self.get_object(bucket_name, key)
+            return io.BufferedReader(S3ObjectReader(self, bucket_name, key, response), IO_CHUNK_BYTES)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def download_file(
+        self, bucket_name: str, key: str, file_path: str, response: Optional[dict] = None
+    ) -> Tuple[str, int]:
+        """
+        Download the object into file_path, every part is written at its offset as it arrives
+        :param response: get_object response of the first part, fetched when not given
+        :return: ETag and size of the downloaded object
+        """
+        try:
+            if response is None:
+                response = self.get_object(bucket_name, key)
+            etag, size = response["ETag"], get_object_size(response)
+
+            with open(file_path, "wb") as object_file:
+                object_file.truncate(size)
+
+            part_ranges = self.get_part_ranges(response)
+            if not part_ranges:
+                self._write_body(file_path, response["Body"], 0)
+                return etag, size
+
+            with ThreadPoolExecutor(
+                self.s3_transfer_config.max_concurrency, thread_name_prefix="s3-download"
+            ) as executor:
+                futures = [
+                    executor.submit(self._write_part, file_path, bucket_name, key, etag, start, end)
+                    for start, end in part_ranges
+                ]
+                self._write_body(file_path, response["Body"], 0)
+                for future in futures:
+                    future.result()
+
+            logging.info(f"Downloaded {size} bytes of {key} from {bucket_name} bucket in {len(part_ranges) + 1} parts")
+            return etag, size
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def upload_file(self, from_filename: str, bucket_name: str, key: str) -> None:
+        try:
+            self.s3_client.upload_file(from_filename, bucket_name, key, Config=self.transfer_config)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+    def upload_dataframe_as_csv(self, data_frame: DataFrame, bucket_name: str, key: str) -> None:
+        """
+        Upload the csv encoding of the dataframe, encoded while its parts are uploaded instead of written to disk first
+        """
+        try:
+            with io.BufferedReader(
+                DataFrameCsvStream(data_frame, self.s3_transfer_config.csv_chunk_rows), IO_CHUNK_BYTES
+            ) as csv_stream:
+                self.s3_client.upload_fileobj(csv_stream, bucket_name, key, Config=self.transfer_config)
+        except Exception as e:
+            raise USvisaException(e, sys) from e
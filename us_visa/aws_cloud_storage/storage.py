@@ -0,0 +1,29 @@
+import sys
+
+from us_visa.aws_cloud_storage.aws_storage import SimpleStorageService
+from us_visa.aws_cloud_storage.local_storage import (
+    InMemoryStorageService,
+    LocalStorageService,
+)
+from us_visa.aws_cloud_storage.storage_backend import StorageBackend
+from us_visa.entity.config_entity import StorageConfig
+from us_visa.exception import USvisaException
+
+
+def get_storage_service(storage_config: StorageConfig = StorageConfig()) -> StorageBackend:
+    """
+    Storage backend selected by storage_config.backend, only the s3 backend needs aws credentials
+    :return: StorageBackend
+    """
+    try:
+        if storage_config.backend == "s3":
+            return SimpleStorageService()
+        if storage_config.backend == "local":
+            return LocalStorageService(root_dir=storage_config.local_dir)
+        if storage_config.backend == "memory":
+            return InMemoryStorageService()
+        raise Exception(
+            f"Unknown storage backend {storage_config.backend}, expected s3, local or memory"
+        )
+    except Exception as e:
+        raise USvisaException(e, sys)
@@ -0,0 +1,92 @@
+import sys
+from abc import ABC, abstractmethod
+
+from pandas import DataFrame
+
+from us_visa.entity.model_bundle import BundledUSVisaModel
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class StorageBackend(ABC):
+    """
+    Object storage of the models and files of the pipeline, addressed by bucket name and key.
+    SimpleStorageService keeps them in s3, LocalStorageService in a local directory and
+    InMemoryStorageService in the memory of the process; get_storage_service picks one from the StorageConfig
+    """
+
+    @abstractmethod
+    def key_path_available(self, bucket_name: str, key: str) -> bool:
+        """
+        :return: True when key is an object of the bucket or the prefix of one
+        """
+
+    @abstractmethod
+    def get_object_version(self, bucket_name: str, key: str) -> str:
+        """
+        :return: Version of the key object that changes whenever its content changes
+        """
+
+    @abstractmethod
+    def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
+        """
+        Unpickle the model_name object of the bucket
+        """
+
+    @abstractmethod
+    def load_model_bundle(self, model_name: str, bucket_name: str) -> BundledUSVisaModel:
+        """
+        Map the model_name model bundle of the bucket
+        """
+
+    @abstractmethod
+    def upload_file(
+        self,
+        from_filename: str,
+        to_filename: str,
+        bucket_name: str,
+        remove: bool = True,
+    ) -> None:
+        """
+        Store the local from_filename file as to_filename, deleting the local file when remove is set
+        """
+
+    @abstractmethod
+    def download_file(self, filename: str, bucket_name: str, to_filename: str) -> None:
+        """
+        Copy the filename object of the bucket to the local to_filename file
+        """
+
+    @abstractmethod
+    def delete_file(self, filename: str, bucket_name: str) -> None:
+        """
+        Delete the filename object of the bucket, missing objects are ignored
+        """
+
+    @abstractmethod
+    def read_csv(self, filename: str, bucket_name: str) -> DataFrame:
+        """
+        Read the filename csv object of the bucket
+        """
+
+    def upload_df_as_csv(
+        self,
+        data_frame: DataFrame,
+        local_filename: str,
+        bucket_filename: str,
+        bucket_name: str,
+    ) -> None:
+        """
+        Write the dataframe to local_filename and store it as bucket_filename
+        """
+        logging.info(f"Entered the upload_df_as_csv method of {type(self).__name__} class")
+
+        try:
+            data_frame.to_csv(local_filename, index=None, header=True)
+
+            self.upload_file(local_filename, bucket_filename, bucket_name)
+
+            logging.info(f"Exited the upload_df_as_csv method of {type(self).__name__} class")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
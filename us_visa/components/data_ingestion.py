@@ -1,11 +1,18 @@
 import os
-from pandas import DataFrame
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId, json_util
+from pandas import DataFrame, concat
 from sklearn.model_selection import train_test_split
 
 from us_visa.entity.config_entity import DataIngestionConfig
 from us_visa.entity.artifact_entity import DataIngestionArtifact
 from us_visa.data_access.usvisa_data import USvisaData
-from us_visa.constants import COLLECTION_NAME
+from us_visa.constants import COLLECTION_NAME, SCHEMA_CONFIG_FILE_PATH
+from us_visa.utils.feature_store import read_dataframe, write_dataframe
+from us_visa.utils.main_utils import read_yaml_files
 
 import sys
 from us_visa.logger import logging
@@ -16,20 +23,22 @@ class DataIngestion:
     def __init__(self, data_ingestion_config: DataIngestionConfig) -> None:
         try:
             self.data_ingestion_config = data_ingestion_config
+            self._schema_config = read_yaml_files(file_path=SCHEMA_CONFIG_FILE_PATH)
         except Exception as e:
             raise USvisaException(e, sys)
 
     def export_data_to_feature_store(self) -> DataFrame:
         try:
+            if self.data_ingestion_config.incremental:
+                return self.export_incremental_data_to_feature_store()
+
             logging.info(
                 "Entered export_data_to_feature_store method of DataIngestion class"
             )
-            usvisa_data = USvisaData()
-
-            dataframe = usvisa_data.export_collection_as_dataframe(
-                collection_name=COLLECTION_NAME,
+            usvisa_data = USvisaData(
+                batch_size=self.data_ingestion_config.export_batch_size,
+                partitions=self.data_ingestion_config.export_partitions,
             )
-            logging.info(f"Shape of Dataframe: {dataframe.shape}")
 
             logging.info("Creating feature store file path")
             feature_store_file_path = self.data_ingestion_config.feature_store_file_path
@@ -37,14 +46,183 @@ class DataIngestion:
             os.makedirs(dir_path, exist_ok=True)
 
             logging.info(
-                f"Saving exported data into feature store file path {feature_store_file_path}"
+                f"Exporting collection straight into feature store file path {feature_store_file_path}"
+            )
+            usvisa_data.export_collection_to_file(
+                collection_name=COLLECTION_NAME,
+                file_path=feature_store_file_path,
             )
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
+
+            dataframe = read_dataframe(feature_store_file_path)
+            logging.info(f"Shape of Dataframe: {dataframe.shape}")
 
             return dataframe
         except Exception as e:
             raise USvisaException(e, sys)
 
+    def read_watermark(self) -> Optional[dict]:
+        """
+        :return: Watermark of the last incremental ingestion, None when there is none for the configured field
+        """
+        watermark_file_path = self.data_ingestion_config.watermark_file_path
+        if not os.path.exists(watermark_file_path) or not os.path.exists(
+            self.data_ingestion_config.incremental_feature_store_file_path
+        ):
+            return None
+
+        with open(watermark_file_path) as watermark_file:
+            watermark = json_util.loads(watermark_file.read())
+
+        if watermark.get("field") != self.data_ingestion_config.watermark_field:
+            logging.info(
+                f"Watermark is on {watermark.get('field')}, not {self.data_ingestion_config.watermark_field}, exporting the whole collection"
+            )
+            return None
+        return watermark
+
+    def write_watermark(self, value, rows: int) -> None:
+        watermark = {
+            "field": self.data_ingestion_config.watermark_field,
+            "value": value,
+            "rows": rows,
+            "updated_at": datetime.now().isoformat(),
+        }
+        watermark_file_path = self.data_ingestion_config.watermark_file_path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(watermark_file_path), suffix=".json")
+        with os.fdopen(fd, "w") as watermark_file:
+            watermark_file.write(json_util.dumps(watermark))
+        os.replace(tmp_path, watermark_file_path)
+
+    def get_watermark_lower_bound(self, value):
+        """
+        Lower bound of the next incremental query, the watermark moved back by the look-back window.
+        The window is only applied when the rows are merged on merge_key, the documents fetched twice
+        would otherwise be appended twice
+        """
+        lookback = timedelta(seconds=self.data_ingestion_config.watermark_lookback_seconds)
+        if self.data_ingestion_config.merge_key is None or not lookback:
+            return value
+        if isinstance(value, ObjectId):
+            return ObjectId.from_datetime(value.generation_time - lookback)
+        if isinstance(value, datetime):
+            return value - lookback
+        return value
+
+    def get_incremental_query(self, watermark: Optional[dict], high_water_mark) -> Optional[dict]:
+        """
+        Query of the documents to fetch, from the look-back window before the watermark up to high_water_mark.
+        Documents without the watermark field are fetched too, on every run when the rows are merged on
+        merge_key, on the first run only otherwise
+        :return: None when there is nothing to ingest
+        """
+        field = self.data_ingestion_config.watermark_field
+        if high_water_mark is None:
+            # no document has the field: everything on the first run, nothing once a store exists
+            return {} if watermark is None else None
+
+        watermark_range = {"$lte": high_water_mark}
+        if watermark is not None:
+            watermark_range["$gt"] = self.get_watermark_lower_bound(watermark["value"])
+            logging.info(f"Fetching documents with {field} past {watermark_range['$gt']}")
+
+        if watermark is not None and self.data_ingestion_config.merge_key is None:
+            return {field: watermark_range}
+        return {"$or": [{field: watermark_range}, {field: {"$exists": False}}]}
+
+    def export_incremental_data_to_feature_store(self) -> DataFrame:
+        """
+        Fetch the documents past the stored watermark and merge them into the incremental feature store,
+        the first run exports the whole collection. The watermark is only moved once the store is written,
+        so an interrupted run fetches the same documents again.
+        An _id watermark only sees new documents, and ObjectIds are made by the clients: a document inserted
+        after the watermark by a writer whose clock is late by more than the look-back window is never fetched.
+        Use a server set last modified field as watermark_field when that matters
+        """
+        try:
+            logging.info(
+                "Entered export_incremental_data_to_feature_store method of DataIngestion class"
+            )
+            config = self.data_ingestion_config
+            store_file_path = config.incremental_feature_store_file_path
+            store_dir = os.path.dirname(store_file_path)
+            os.makedirs(store_dir, exist_ok=True)
+
+            usvisa_data = USvisaData(
+                batch_size=config.export_batch_size, partitions=config.export_partitions
+            )
+            watermark = self.read_watermark()
+
+            # documents written while exporting are left to the next run
+            high_water_mark = usvisa_data.get_max_value(COLLECTION_NAME, config.watermark_field)
+            query = self.get_incremental_query(watermark, high_water_mark)
+
+            if query is None:
+                logging.info(f"No document has {config.watermark_field}, keeping the feature store")
+                rows = 0
+                dataframe = read_dataframe(store_file_path)
+            else:
+                fd, delta_file_path = tempfile.mkstemp(
+                    dir=store_dir, suffix=os.path.splitext(store_file_path)[1]
+                )
+                os.close(fd)
+                try:
+                    rows = usvisa_data.export_collection_to_file(
+                        collection_name=COLLECTION_NAME,
+                        file_path=delta_file_path,
+                        query=query,
+                    )
+
+                    if watermark is None:
+                        os.replace(delta_file_path, store_file_path)
+                        dataframe = read_dataframe(store_file_path)
+                    else:
+                        dataframe = self.merge_into_feature_store(delta_file_path, rows)
+                finally:
+                    if os.path.exists(delta_file_path):
+                        os.remove(delta_file_path)
+
+                if high_water_mark is not None:
+                    self.write_watermark(high_water_mark, rows=len(dataframe))
+            logging.info(
+                f"Ingested {rows} new or updated rows, feature store has {len(dataframe)} rows"
+            )
+
+            feature_store_file_path = config.feature_store_file_path
+            os.makedirs(os.path.dirname(feature_store_file_path), exist_ok=True)
+            shutil.copyfile(store_file_path, feature_store_file_path)
+
+            logging.info(
+                "Exited export_incremental_data_to_feature_store method of DataIngestion class"
+            )
+            return dataframe
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def merge_into_feature_store(self, delta_file_path: str, rows: int) -> DataFrame:
+        """
+        Replace the rows of the feature store that have the merge_key of a delta row and append the delta rows
+        """
+        store_file_path = self.data_ingestion_config.incremental_feature_store_file_path
+        stored = read_dataframe(store_file_path)
+        if rows == 0:
+            return stored
+
+        delta = read_dataframe(delta_file_path)
+        merge_key = self.data_ingestion_config.merge_key
+        if merge_key is not None:
+            stored = stored[~stored[merge_key].isin(delta[merge_key])]
+            delta = delta.drop_duplicates(subset=[merge_key], keep="last")
+        dataframe = concat([stored, delta], ignore_index=True)
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(store_file_path), suffix=os.path.splitext(store_file_path)[1]
+        )
+        os.close(fd)
+        write_dataframe(tmp_path, dataframe, self._schema_config)
+        os.replace(tmp_path, store_file_path)
+        return dataframe
+
     def split_data_as_train_test(self, dataframe: DataFrame):
         try:
             logging.info(
@@ -67,11 +245,11 @@ class DataIngestion:
             os.makedirs(dir_path, exist_ok=True)
 
             logging.info("Exporting train and test file path")
-            train_set.to_csv(
-                self.data_ingestion_config.training_file_path, index=False, header=True
+            write_dataframe(
+                self.data_ingestion_config.training_file_path, train_set, self._schema_config
             )
-            test_set.to_csv(
-                self.data_ingestion_config.testing_file_path, index=False, header=True
+            write_dataframe(
+                self.data_ingestion_config.testing_file_path, test_set, self._schema_config
             )
 
             logging.info("Exported train and test file path")
@@ -19,15 +19,18 @@ from us_visa.entity.artifact_entity import (
     DataTransformationArtifact,
 )
 from us_visa.constants import SCHEMA_CONFIG_FILE_PATH, TARGET_COLUMN, CURRENT_YEAR
+from us_visa.utils.feature_store import read_dataframe
 from us_visa.utils.main_utils import (
     read_yaml_files,
     drop_columns,
+    get_training_columns,
     save_object,
     save_numpy_array_data,
 )
 
 from us_visa.logger import logging
 from us_visa.exception import USvisaException
+from us_visa.monitoring.profiler import profile_block
 
 
 class DataTransformation:
@@ -46,9 +49,9 @@ class DataTransformation:
             raise USvisaException(e, sys)
 
     @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_data(file_path, columns=None) -> pd.DataFrame:
 
-        return pd.read_csv(file_path)
+        return read_dataframe(file_path, columns=columns)
 
     def get_data_transformer_object(self) -> Pipeline:
         logging.info(
@@ -99,8 +102,10 @@ class DataTransformation:
                 logging.info("starting initiate data transformation")
 
                 # TRAIN
+                # only the columns the preprocessor and the target need are read
+                training_columns = get_training_columns(self._schema_config)
                 train_df = DataTransformation.read_data(
-                    self.data_ingestion_artifact.train_file_path
+                    self.data_ingestion_artifact.train_file_path, columns=training_columns
                 )
 
                 input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
@@ -113,7 +118,11 @@ class DataTransformation:
                 )
                 logging.info("Added company_age column to the Training dataset")
 
-                drop_cols = self._schema_config["drop_columns"]
+                drop_cols = [
+                    col
+                    for col in self._schema_config["drop_columns"]
+                    if col in input_feature_train_df.columns
+                ]
 
                 input_feature_train_df = drop_columns(
                     df=input_feature_train_df, columns=drop_cols
@@ -126,7 +135,7 @@ class DataTransformation:
 
                 # TEST
                 test_df = DataTransformation.read_data(
-                    self.data_ingestion_artifact.test_file_path
+                    self.data_ingestion_artifact.test_file_path, columns=training_columns
                 )
 
                 input_feature_test_df = test_df.drop(columns=[TARGET_COLUMN], axis=1)
@@ -154,9 +163,14 @@ class DataTransformation:
                 logging.info(
                     "Applying preprocessing object on training dataframe and testing dataframe"
                 )
-                input_feature_train_arr = preprocessor.fit_transform(
-                    input_feature_train_df
-                )
+                with profile_block(
+                    "preprocessor.fit_transform", rows_in=len(input_feature_train_df)
+                ) as block:
+                    input_feature_train_arr = preprocessor.fit_transform(
+                        input_feature_train_df
+                    )
+                    block.rows_out = input_feature_train_arr.shape[0]
+                    block.extra["n_features_out"] = input_feature_train_arr.shape[1]
 
                 logging.info(
                     "Used the preprocessor object to fit transform the train features"
@@ -169,15 +183,23 @@ class DataTransformation:
 
                 # APPLYING SMOOTEEN TO TRAIN DATA
                 logging.info("Applying SMOTEENN on Training dataset")
-                input_feature_train_final, target_feature_train_final = (
-                    smt.fit_resample(input_feature_train_arr, target_feature_train_df)
-                )
+                with profile_block(
+                    "SMOTEENN.fit_resample.train", rows_in=len(input_feature_train_arr)
+                ) as block:
+                    input_feature_train_final, target_feature_train_final = (
+                        smt.fit_resample(input_feature_train_arr, target_feature_train_df)
+                    )
+                    block.rows_out = len(input_feature_train_final)
 
                 # APPLYING SMOOTEEN TO TEST DATA
                 logging.info("Applying SMOTEENN on Testing dataset")
-                input_feature_test_final, target_feature_test_final = smt.fit_resample(
-                    input_feature_test_arr, target_feature_test_df
-                )
+                with profile_block(
+                    "SMOTEENN.fit_resample.test", rows_in=len(input_feature_test_arr)
+                ) as block:
+                    input_feature_test_final, target_feature_test_final = (
+                        smt.fit_resample(input_feature_test_arr, target_feature_test_df)
+                    )
+                    block.rows_out = len(input_feature_test_final)
                 logging.info("Applied SMOTEENN on training dataset")
 
                 logging.info("Applying SMOTEENN on testing dataset")
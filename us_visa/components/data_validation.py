@@ -3,6 +3,7 @@ import pandas as pd
 from us_visa.entity.config_entity import DataValidationConfig
 from us_visa.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from us_visa.utils.main_utils import read_yaml_files, write_yaml_file
+from us_visa.utils.feature_store import read_dataframe
 from us_visa.constants import SCHEMA_CONFIG_FILE_PATH
 from us_visa.logger import logging
 
@@ -27,7 +28,7 @@ class DataValidation:
     @staticmethod
     def read_data(file_path) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_dataframe(file_path)
         except Exception as e:
             raise USvisaException(e, sys)
 
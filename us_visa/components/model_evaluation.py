@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import Optional
 from sklearn.metrics import f1_score
 
-from us_visa.constants import CURRENT_YEAR, TARGET_COLUMN
+from us_visa.constants import CURRENT_YEAR, SCHEMA_CONFIG_FILE_PATH, TARGET_COLUMN
 from us_visa.entity.config_entity import ModelEvaluationConfig
 from us_visa.entity.artifact_entity import (
     ModelEvaluationArtifact,
@@ -12,6 +12,8 @@ from us_visa.entity.artifact_entity import (
 )
 from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaEstimator
 from us_visa.entity.estimator import TargetValueMapping
+from us_visa.utils.feature_store import read_dataframe
+from us_visa.utils.main_utils import get_training_columns, read_yaml_files
 
 import sys
 from us_visa.exception import USvisaException
@@ -57,7 +59,10 @@ class ModelEvaluation:
 
     def evaluate_model(self) -> EvaluateModelResponse:
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            test_df = read_dataframe(
+                self.data_ingestion_artifact.test_file_path,
+                columns=get_training_columns(read_yaml_files(SCHEMA_CONFIG_FILE_PATH)),
+            )
             test_df["company_age"] = CURRENT_YEAR - test_df["yr_of_estab"]
 
             X = test_df.drop(TARGET_COLUMN, axis=1)
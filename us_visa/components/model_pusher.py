@@ -1,6 +1,6 @@
 import sys
 
-from us_visa.aws_cloud_storage.aws_storage import SimpleStorageService
+from us_visa.aws_cloud_storage.storage import get_storage_service
 from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaEstimator
 
 from us_visa.entity.config_entity import ModelPusherConfig
@@ -20,12 +20,13 @@ class ModelPusher:
         :param model_evaluation_artifact: Output reference of data evaluation artifact stage
         :param model_pusher_config: Configuration for model pusher
         """
-        self.s3 = SimpleStorageService()
+        self.storage = get_storage_service()
         self.model_evaluation_artifact = model_evaluation_artifact
         self.model_pusher_config = model_pusher_config
         self.usvisa_estimator = USvisaEstimator(
             bucket_name=model_pusher_config.bucket_name,
             model_path=model_pusher_config.s3_model_key_path,
+            storage=self.storage,
         )
 
     def initiate_model_pusher(self) -> ModelPusherArtifact:
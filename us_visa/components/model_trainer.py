@@ -1,21 +1,32 @@
 import sys
 import numpy as np
-from typing import Tuple
+from typing import Optional, Tuple
 
+from imblearn.under_sampling import CondensedNearestNeighbour, EditedNearestNeighbours
+from sklearn.base import clone
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from sklearn.neighbors import KNeighborsClassifier
 from neuro_mf import ModelFactory
 from us_visa.entity.config_entity import ModelTrainerConfig
 from us_visa.entity.artifact_entity import (
     DataTransformationArtifact,
     ClassificationMetricsArtifact,
+    KNNOptimizationArtifact,
     ModelTrainerArtifact,
 )
 from us_visa.constants import MODEL_CONFIG_FILE_PATH
-from us_visa.utils.main_utils import load_numpy_array_data, load_object, save_object
+from us_visa.utils.main_utils import (
+    load_numpy_array_data,
+    load_object,
+    save_object,
+    write_yaml_file,
+)
 from us_visa.entity.estimator import USVisaModel
+from us_visa.entity.model_bundle import get_bundle_path, save_model_bundle
 
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
+from us_visa.monitoring.profiler import profile_block, profiled
 
 
 class ModelTrainer:
@@ -30,6 +41,131 @@ class ModelTrainer:
         except Exception as e:
             raise USvisaException(e, sys)
 
+    @staticmethod
+    def get_classification_metrics(
+        model_obj: object, X_test: np.array, y_test: np.array
+    ) -> ClassificationMetricsArtifact:
+        y_pred = model_obj.predict(X_test)
+
+        accuracy = accuracy_score(y_true=y_test, y_pred=y_pred)
+        precision = precision_score(y_true=y_test, y_pred=y_pred)
+        f1 = f1_score(y_true=y_test, y_pred=y_pred)
+        recall = recall_score(y_true=y_test, y_pred=y_pred)
+
+        return ClassificationMetricsArtifact(
+            accuracy_score=accuracy,
+            precision_score=precision,
+            f1_score=f1,
+            recall_score=recall,
+        )
+
+    @profiled()
+    def reduce_prototypes(self, X: np.array, y: np.array) -> Tuple[np.array, np.array]:
+        """
+        Select the training points kept by a k neighbors model, with the steps of knn_prototype_reduction in order:
+        enn (edited nearest neighbours) drops the points misclassified by their neighbours,
+        cnn (condensed nearest neighbour) keeps only the points needed to classify the others with 1-NN
+        """
+        for step in self.model_trainer_config.knn_prototype_reduction.split("_"):
+            if step == "none":
+                continue
+            elif step == "enn":
+                sampler = EditedNearestNeighbours(sampling_strategy="all")
+            elif step == "cnn":
+                sampler = CondensedNearestNeighbour(sampling_strategy="all", random_state=42)
+            else:
+                raise Exception(f"Unknown knn prototype reduction step {step}")
+
+            n_samples = len(X)
+            X, y = sampler.fit_resample(X, y)
+            logging.info(f"Prototype reduction step {step} kept {len(X)} of {n_samples} points")
+
+        return X, y
+
+    def optimize_knn_model(
+        self,
+        model_obj: object,
+        train: np.array,
+        test: np.array,
+        metric_artifact: ClassificationMetricsArtifact,
+    ) -> Tuple[object, ClassificationMetricsArtifact, Optional[KNNOptimizationArtifact]]:
+        """
+        When the best model is a k neighbors classifier, refit it with a persisted tree index over
+        a prototype reduced training matrix. The reduced model is kept only if its test accuracy is at most
+        knn_max_accuracy_drop below metric_artifact, otherwise the index is built over all the points.
+        Other models are returned unchanged
+        :return: model, its metrics, knn optimization artifact or None
+        """
+        logging.info("Entered optimize_knn_model method of ModelTrainer class")
+        try:
+            estimator = getattr(model_obj, "best_estimator_", model_obj)
+            if not isinstance(estimator, KNeighborsClassifier):
+                return model_obj, metric_artifact, None
+
+            config = self.model_trainer_config
+            X_train, X_test, y_train, y_test = (
+                train[:, :-1],
+                test[:, :-1],
+                train[:, -1],
+                test[:, -1],
+            )
+            index_params = dict(algorithm=config.knn_index_type, leaf_size=config.knn_leaf_size)
+
+            X_reduced, y_reduced = self.reduce_prototypes(X_train, y_train)
+            reduced_model = clone(estimator).set_params(**index_params).fit(X_reduced, y_reduced)
+            reduced_metric_artifact = self.get_classification_metrics(
+                reduced_model, X_test, y_test
+            )
+
+            accuracy_change = (
+                reduced_metric_artifact.accuracy_score - metric_artifact.accuracy_score
+            )
+            is_reduction_accepted = (
+                len(X_reduced) < len(X_train)
+                and accuracy_change >= -config.knn_max_accuracy_drop
+            )
+
+            if is_reduction_accepted:
+                optimized_model = reduced_model
+                optimized_metric_artifact = reduced_metric_artifact
+            else:
+                optimized_model = clone(estimator).set_params(**index_params).fit(X_train, y_train)
+                optimized_metric_artifact = metric_artifact
+
+            report = {
+                "index_type": config.knn_index_type,
+                "leaf_size": config.knn_leaf_size,
+                "prototype_reduction": config.knn_prototype_reduction,
+                "original_n_samples": len(X_train),
+                "reduced_n_samples": len(X_reduced),
+                "original_metrics": {k: float(v) for k, v in metric_artifact.__dict__.items()},
+                "reduced_metrics": {
+                    k: float(v) for k, v in reduced_metric_artifact.__dict__.items()
+                },
+                "accuracy_change": float(accuracy_change),
+                "max_accuracy_drop": config.knn_max_accuracy_drop,
+                "is_reduction_accepted": bool(is_reduction_accepted),
+            }
+            write_yaml_file(config.knn_report_file_path, report, replace=True)
+
+            knn_optimization_artifact = KNNOptimizationArtifact(
+                index_type=config.knn_index_type,
+                prototype_reduction=config.knn_prototype_reduction,
+                original_n_samples=len(X_train),
+                reduced_n_samples=len(X_reduced),
+                reduced_metric_artifact=reduced_metric_artifact,
+                accuracy_change=accuracy_change,
+                is_reduction_accepted=is_reduction_accepted,
+                report_file_path=config.knn_report_file_path,
+            )
+            logging.info(f"KNN optimization artifact: {knn_optimization_artifact}")
+            logging.info("Exited optimize_knn_model method of ModelTrainer class")
+
+            return optimized_model, optimized_metric_artifact, knn_optimization_artifact
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
     def get_object_model_and_report(
         self, train: np.array, test: np.array
     ) -> Tuple[object, object]:
@@ -47,27 +183,18 @@ class ModelTrainer:
                 test[:, -1],
             )
 
-            best_model_details = model_factory.get_best_model(
-                X=X_train,
-                y=y_train,
-                base_accuracy=self.model_trainer_config.expected_accuracy,
-            )
+            with profile_block("ModelFactory.get_best_model", rows_in=len(X_train)) as block:
+                best_model_details = model_factory.get_best_model(
+                    X=X_train,
+                    y=y_train,
+                    base_accuracy=self.model_trainer_config.expected_accuracy,
+                )
+                block.extra["best_model"] = type(best_model_details.best_model).__name__
+                block.extra["best_score"] = float(best_model_details.best_score)
 
             model_obj = best_model_details.best_model
 
-            y_pred = model_obj.predict(X_test)
-
-            accuracy = accuracy_score(y_true=y_test, y_pred=y_pred)
-            precision = precision_score(y_true=y_test, y_pred=y_pred)
-            f1 = f1_score(y_true=y_test, y_pred=y_pred)
-            recall = recall_score(y_true=y_test, y_pred=y_pred)
-
-            metric_artifact = ClassificationMetricsArtifact(
-                accuracy_score=accuracy,
-                precision_score=precision,
-                f1_score=f1,
-                recall_score=recall,
-            )
+            metric_artifact = self.get_classification_metrics(model_obj, X_test, y_test)
 
             return best_model_details, metric_artifact
 
@@ -97,13 +224,24 @@ class ModelTrainer:
                     "No best model found with score more than expected score"
                 )
 
+            best_model = best_model_details.best_model
+            knn_optimization_artifact = None
+            try:
+                (
+                    best_model,
+                    metric_artifact,
+                    knn_optimization_artifact,
+                ) = self.optimize_knn_model(best_model, train_arr, test_arr, metric_artifact)
+            except Exception as e:
+                logging.info(f"KNN optimization failed, keeping the grid search model: {e}")
+
             preprocessor = load_object(
                 self.data_transformation_artifact.transformed_obj_file_path
             )
 
             usvisa_model = USVisaModel(
                 preprocessing_object=preprocessor,
-                trained_model_object=best_model_details.best_model,
+                trained_model_object=best_model,
             )
 
             logging.info("Created usvisa model object with preprocessor and model")
@@ -111,9 +249,18 @@ class ModelTrainer:
             logging.info("Created best model file path.")
             save_object(self.model_trainer_config.trained_model_file_path, usvisa_model)
 
+            try:
+                save_model_bundle(
+                    get_bundle_path(self.model_trainer_config.trained_model_file_path),
+                    usvisa_model,
+                )
+            except Exception as e:
+                logging.info(f"Model bundle not saved, serving will use the pickled model: {e}")
+
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                 metric_artifact=metric_artifact,
+                knn_optimization_artifact=knn_optimization_artifact,
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
@@ -8,9 +8,14 @@ COLLECTION_NAME = "visa_data"
 ARTIFACT_DIR = "artifact"
 TIMESTAMP: str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
 
-FILE_NAME = "usvisa.csv"
-TRAIN_FILE_NAME = "train.csv"
-TEST_FILE_NAME = "test.csv"
+# file format of the feature store and of the train/test splits: parquet, feather or csv
+FEATURE_STORE_FILE_FORMAT: str = os.getenv("FEATURE_STORE_FILE_FORMAT", "parquet").lower()
+# codec of parquet and feather files, uncompressed feather files are read without any copy
+FEATURE_STORE_COMPRESSION: str = os.getenv("FEATURE_STORE_COMPRESSION", "zstd").lower()
+
+FILE_NAME = "usvisa." + FEATURE_STORE_FILE_FORMAT
+TRAIN_FILE_NAME = "train." + FEATURE_STORE_FILE_FORMAT
+TEST_FILE_NAME = "test." + FEATURE_STORE_FILE_FORMAT
 
 TRAIN_FILE_NAME_NUMPY = "train.npy"
 TEST_FILE_NAME_NUMPY = "test.npy"
@@ -25,15 +30,72 @@ MODEL_CONFIG_FILE_PATH = os.path.join("config", "model.yaml")
 
 AWS_ACCESS_KEY_ID_ENV_KEY = "AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY_ENV_KEY = "AWS_SECRET_ACCESS_KEY"
+# s3 compatible endpoint to use instead of aws, e.g. a local object store
+AWS_S3_ENDPOINT_URL_ENV_KEY = "AWS_S3_ENDPOINT_URL"
 REGION_NAME = "us-east-1"
 MODEL_FILE_NAME = "model.pkl"
 
+# LOGGING RELATED CONSTANT START WITH LOG VARIABLE NAME
+# DEBUG like the original logging setup, INFO keeps the DEBUG output of botocore and pymongo out of the log file
+LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG").upper()
+LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", 50 * 1024 * 1024))
+LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# messages matching LOG_SAMPLE_PATTERN are kept once per LOG_SAMPLE_RATE calls of the same call site,
+# LOG_SAMPLE_RATE=1 keeps them all
+LOG_SAMPLE_PATTERN: str = os.getenv(
+    "LOG_SAMPLE_PATTERN", r"^(Entered|Entering|Exited|Exiting) "
+)
+LOG_SAMPLE_RATE: int = int(os.getenv("LOG_SAMPLE_RATE", 100))
+# per logger rates, "name=rate,name=rate", e.g. "botocore=1000,pymongo=1000"
+LOG_SAMPLE_LOGGER_RATES: str = os.getenv("LOG_SAMPLE_LOGGER_RATES", "")
+
+# STORAGE RELATED CONSTANT START WITH STORAGE VARIABLE NAME
+# where models and pipeline files are stored: s3, local (a directory) or memory (this process only)
+STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "s3").lower()
+STORAGE_LOCAL_DIR: str = os.getenv("STORAGE_LOCAL_DIR", os.path.join(".storage"))
+
+# S3 CACHE RELATED CONSTANT START WITH S3_CACHE VARIABLE NAME
+S3_CACHE_ENABLED: bool = os.getenv("S3_CACHE_ENABLED", "true").lower() == "true"
+S3_CACHE_DIR: str = os.getenv("S3_CACHE_DIR", os.path.join(".cache", "s3"))
+S3_CACHE_MAX_BYTES: int = int(os.getenv("S3_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+S3_CACHE_EVICTION_GRACE_SECONDS: float = float(os.getenv("S3_CACHE_EVICTION_GRACE_SECONDS", 300))
+
+# S3 TRANSFER RELATED CONSTANT START WITH S3_TRANSFER VARIABLE NAME
+# objects are downloaded as ranged parts and uploaded as multipart parts of S3_TRANSFER_PART_SIZE_BYTES,
+# S3_TRANSFER_MAX_CONCURRENCY of them at a time
+S3_TRANSFER_PART_SIZE_BYTES: int = int(os.getenv("S3_TRANSFER_PART_SIZE_BYTES", 8 * 1024 * 1024))
+S3_TRANSFER_MAX_CONCURRENCY: int = int(os.getenv("S3_TRANSFER_MAX_CONCURRENCY", 10))
+S3_TRANSFER_MULTIPART_THRESHOLD_BYTES: int = int(
+    os.getenv("S3_TRANSFER_MULTIPART_THRESHOLD_BYTES", 8 * 1024 * 1024)
+)
+S3_TRANSFER_CSV_CHUNK_ROWS: int = int(os.getenv("S3_TRANSFER_CSV_CHUNK_ROWS", 50000))
+
 
 # DATA INGESTION RELATED CONSTANT START WITH DATA_INGESTION VARIABLE NAME
 DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.2
+DATA_INGESTION_EXPORT_BATCH_SIZE: int = int(os.getenv("DATA_INGESTION_EXPORT_BATCH_SIZE", 10000))
+# _id ranges of the collection exported concurrently, split at quantiles of a random sample of _id values
+DATA_INGESTION_EXPORT_PARTITIONS: int = int(os.getenv("DATA_INGESTION_EXPORT_PARTITIONS", 4))
+DATA_INGESTION_EXPORT_SAMPLES_PER_PARTITION: int = 20
+# incremental ingestion keeps one feature store across runs and only fetches the documents whose
+# DATA_INGESTION_WATERMARK_FIELD is past the stored watermark, rows are merged on DATA_INGESTION_MERGE_KEY
+DATA_INGESTION_INCREMENTAL: bool = os.getenv("DATA_INGESTION_INCREMENTAL", "false").lower() == "true"
+DATA_INGESTION_INCREMENTAL_DIR: str = os.getenv(
+    "DATA_INGESTION_INCREMENTAL_DIR", os.path.join(ARTIFACT_DIR, "incremental_feature_store")
+)
+# _id only sees new documents, a last modified field such as updated_at also sees updated ones
+DATA_INGESTION_WATERMARK_FIELD: str = os.getenv("DATA_INGESTION_WATERMARK_FIELD", "_id")
+# ObjectId and client set dates only roughly follow the insert order (clock skew between writers), the next run
+# fetches again the documents of this window before the watermark, they replace their rows by DATA_INGESTION_MERGE_KEY
+DATA_INGESTION_WATERMARK_LOOKBACK_SECONDS: int = int(
+    os.getenv("DATA_INGESTION_WATERMARK_LOOKBACK_SECONDS", "300")
+)
+DATA_INGESTION_WATERMARK_FILE_NAME: str = "watermark.json"
+DATA_INGESTION_MERGE_KEY: str = os.getenv("DATA_INGESTION_MERGE_KEY", "case_id")
 
 # DATA VALIDATION RELATED CONSTANT START WITH VALIDATION VARIABLE NAME
 DATA_VALIDATION_DIR_NAME: str = "data_validation"
@@ -50,10 +112,115 @@ MODEL_TRAINER_DIR_NAME: str = "model_trainer"
 MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
 TRAINED_MODEL_FILENAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
+MODEL_TRAINER_KNN_INDEX_TYPE: str = os.getenv("MODEL_TRAINER_KNN_INDEX_TYPE", "kd_tree")
+MODEL_TRAINER_KNN_LEAF_SIZE: int = int(os.getenv("MODEL_TRAINER_KNN_LEAF_SIZE", 30))
+# none, enn, cnn or enn_cnn, the training points are only reduced when it is configured
+MODEL_TRAINER_KNN_PROTOTYPE_REDUCTION: str = os.getenv(
+    "MODEL_TRAINER_KNN_PROTOTYPE_REDUCTION", "none"
+)
+MODEL_TRAINER_KNN_MAX_ACCURACY_DROP: float = float(
+    os.getenv("MODEL_TRAINER_KNN_MAX_ACCURACY_DROP", 0.01)
+)
+MODEL_TRAINER_KNN_REPORT_FILE_NAME: str = "knn_optimization_report.yaml"
 
 MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE: float = 0.6
 MODEL_BUCKET_NAME = "usvisa-model-2024a"
 # MODEL_PUSHER_S3_KEY = "model-registry"
 
+# MODEL CACHE RELATED CONSTANT START WITH MODEL_CACHE VARIABLE NAME
+MODEL_CACHE_TTL_SECONDS: float = float(os.getenv("MODEL_CACHE_TTL_SECONDS", 600))
+
+# MODEL BUNDLE RELATED CONSTANT START WITH MODEL_BUNDLE VARIABLE NAME
+MODEL_BUNDLE_FILE_EXTENSION: str = ".bundle"
+# off by default: bundled models are scored by the reimplemented estimators on float32 features,
+# like PREDICTION_COMPILED_PREPROCESSOR_ENABLED they are turned on explicitly
+MODEL_BUNDLE_ENABLED: bool = os.getenv("MODEL_BUNDLE_ENABLED", "false").lower() == "true"
+MODEL_BUNDLE_SHARED_DIR: str = os.getenv("MODEL_BUNDLE_SHARED_DIR", os.path.join(".cache", "model_bundles"))
+
+# FOREST ENGINE RELATED CONSTANT START WITH FOREST_ENGINE VARIABLE NAME
+FOREST_ENGINE_ENABLED: bool = os.getenv("FOREST_ENGINE_ENABLED", "true").lower() == "true"
+FOREST_ENGINE_MAX_BATCH_ROWS: int = int(os.getenv("FOREST_ENGINE_MAX_BATCH_ROWS", 1000))
+
+# METRICS RELATED CONSTANT START WITH METRICS VARIABLE NAME
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_LATENCY_BUCKETS: tuple = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# TRAINING PROFILE RELATED CONSTANT START WITH TRAINING_PROFILE VARIABLE NAME
+TRAINING_PROFILE_ENABLED: bool = (
+    os.getenv("TRAINING_PROFILE_ENABLED", "true").lower() == "true"
+)
+# tracemalloc slows allocation heavy stages down noticeably, so it is opt-in
+TRAINING_PROFILE_TRACE_MEMORY: bool = (
+    os.getenv("TRAINING_PROFILE_TRACE_MEMORY", "false").lower() == "true"
+)
+TRAINING_PROFILE_FILE_NAME: str = "training_profile.json"
+
+# PREDICTION RELATED CONSTANT START WITH PREDICTION VARIABLE NAME
+PREDICTION_BATCH_MAX_ROWS: int = int(os.getenv("PREDICTION_BATCH_MAX_ROWS", 50000))
+PREDICTION_COMPILED_PREPROCESSOR_ENABLED: bool = (
+    os.getenv("PREDICTION_COMPILED_PREPROCESSOR_ENABLED", "false").lower() == "true"
+)
+PREDICTION_MICRO_BATCH_ENABLED: bool = (
+    os.getenv("PREDICTION_MICRO_BATCH_ENABLED", "false").lower() == "true"
+)
+PREDICTION_MICRO_BATCH_WINDOW_MS: float = float(
+    os.getenv("PREDICTION_MICRO_BATCH_WINDOW_MS", 2)
+)
+PREDICTION_MICRO_BATCH_MAX_SIZE: int = int(
+    os.getenv("PREDICTION_MICRO_BATCH_MAX_SIZE", 64)
+)
+
+# PREDICTION STREAM RELATED CONSTANT START WITH PREDICTION_STREAM VARIABLE NAME
+PREDICTION_STREAM_CHUNK_ROWS: int = int(os.getenv("PREDICTION_STREAM_CHUNK_ROWS", 1000))
+PREDICTION_STREAM_MAX_LINE_BYTES: int = 64 * 1024
+PREDICTION_STREAM_MAX_DECOMPRESSED_CHUNK_BYTES: int = 1024 * 1024
+
+# MODEL WARMUP RELATED CONSTANT START WITH MODEL_WARMUP VARIABLE NAME
+MODEL_WARMUP_ROUNDS: int = int(os.getenv("MODEL_WARMUP_ROUNDS", 3))
+MODEL_WARMUP_RECORDS: int = int(os.getenv("MODEL_WARMUP_RECORDS", 8))
+MODEL_WARMUP_RETRY_SECONDS: float = float(os.getenv("MODEL_WARMUP_RETRY_SECONDS", 30))
+
+# PREDICTION CACHE RELATED CONSTANT START WITH PREDICTION_CACHE VARIABLE NAME
+PREDICTION_CACHE_ENABLED: bool = (
+    os.getenv("PREDICTION_CACHE_ENABLED", "false").lower() == "true"
+)
+PREDICTION_CACHE_MAX_ENTRIES: int = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", 100000))
+PREDICTION_CACHE_MAX_BYTES: int = int(
+    os.getenv("PREDICTION_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+PREDICTION_CACHE_TTL_SECONDS: float = float(
+    os.getenv("PREDICTION_CACHE_TTL_SECONDS", 3600)
+)
+
+# BATCH PREDICTION RELATED CONSTANT START WITH BATCH_PREDICTION VARIABLE NAME
+BATCH_PREDICTION_CHUNK_SIZE: int = 10000
+BATCH_PREDICTION_WORKERS: int = os.cpu_count() or 1
+BATCH_PREDICTION_ID_COLUMN: str = "case_id"
+
+# EXECUTOR RELATED CONSTANT START WITH EXECUTOR VARIABLE NAME
+EXECUTOR_PREDICT_WORKERS: int = int(
+    os.getenv("EXECUTOR_PREDICT_WORKERS", os.cpu_count() or 1)
+)
+EXECUTOR_IO_WORKERS: int = int(os.getenv("EXECUTOR_IO_WORKERS", 8))
+
+# TRAINING JOB RELATED CONSTANT START WITH TRAINING_JOB VARIABLE NAME
+TRAINING_JOB_HISTORY_SIZE: int = 20
+# shared by every api worker, so it has to be on a disk all of them see
+TRAINING_JOB_DIR: str = os.getenv("TRAINING_JOB_DIR", os.path.join(ARTIFACT_DIR, "training_jobs"))
+TRAINING_JOB_SHUTDOWN_TIMEOUT_SECONDS: float = float(
+    os.getenv("TRAINING_JOB_SHUTDOWN_TIMEOUT_SECONDS", 10)
+)
+TRAINING_JOB_STAGES = [
+    "data_ingestion",
+    "data_validation",
+    "data_transformation",
+    "model_trainer",
+    "model_evaluation",
+    "model_pusher",
+]
+
 APP_HOST = "0.0.0.0"
 APP_PORT = 8080
@@ -1,38 +1,274 @@
-from us_visa.Mongodb.mongodb_connection import MongoDBClient
-from us_visa.constants import DATABASE_NAME
+from us_visa.MongoDB.mongodb_connection import MongoDBClient
+from us_visa.constants import (
+    DATABASE_NAME,
+    DATA_INGESTION_EXPORT_BATCH_SIZE,
+    DATA_INGESTION_EXPORT_PARTITIONS,
+    DATA_INGESTION_EXPORT_SAMPLES_PER_PARTITION,
+    SCHEMA_CONFIG_FILE_PATH,
+)
+from us_visa.utils.main_utils import read_yaml_files
+from us_visa.utils.feature_store import FeatureStoreWriter, get_arrow_schema, get_file_format
 import pandas as pd
-from typing import Optional
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import numpy as np
 
+import os
 import sys
 from us_visa.logger import logging
 from us_visa.exception import USvisaException
+from us_visa.monitoring.profiler import profiled
 
 
 class USvisaData:
-    def __init__(self) -> None:
+    """
+    This class exports the us_visa collection with the columns of the schema, reading the documents
+    batch_size at a time and building the dataframe chunk by chunk instead of from one list of every document.
+    The collection is split in _id ranges read concurrently, one cursor per range on the shared connection pool
+    """
+
+    def __init__(
+        self,
+        batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+        partitions: int = DATA_INGESTION_EXPORT_PARTITIONS,
+    ) -> None:
+        """
+        :param batch_size: Documents per cursor batch and rows per dataframe chunk
+        :param partitions: Number of _id ranges exported concurrently, 1 reads the collection with one cursor
+        """
         try:
             self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
+            self.batch_size = batch_size
+            self.partitions = partitions
+            self._schema_config = read_yaml_files(file_path=SCHEMA_CONFIG_FILE_PATH)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def get_collection(self, collection_name: str, database_name: Optional[str] = None):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    def get_max_value(
+        self, collection_name: str, field: str, database_name: Optional[str] = None
+    ) -> Optional[Any]:
+        """
+        Largest value of field in the collection, read from its index when field is indexed
+        :return: None when no document has the field
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            cursor = (
+                collection.find({field: {"$exists": True}}, {field: 1})
+                .sort(field, -1)
+                .limit(1)
+            )
+            for document in cursor:
+                return document[field]
+            return None
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def get_schema_columns(self) -> Dict[str, str]:
+        """
+        :return: Type of every column of the schema by column name, in schema order
+        """
+        columns = {}
+        for column in self._schema_config["columns"]:
+            columns.update(column)
+        return columns
+
+    @staticmethod
+    def _build_chunk(documents: List[dict], columns: Dict[str, str]) -> pd.DataFrame:
+        chunk = pd.DataFrame.from_records(documents, columns=list(columns))
+        for name, column_type in columns.items():
+            column = chunk[name]
+            if column_type == "category" and column.dtype != object:
+                column = chunk[name] = column.astype(object)
+            if column.dtype == object:
+                is_nan_string = column.values == "nan"
+                if is_nan_string.any():
+                    chunk.loc[is_nan_string, name] = np.nan
+        return chunk
+
+    def get_partition_bounds(
+        self,
+        collection_name: str,
+        database_name: Optional[str] = None,
+        query: Optional[dict] = None,
+    ) -> List[ObjectId]:
+        """
+        Split points of the _id ranges, quantiles of a random sample of the matching _id values
+        :return: Sorted split points, empty when the collection is read as one range
+        """
+        try:
+            if self.partitions <= 1:
+                return []
+
+            collection = self.get_collection(collection_name, database_name)
+            sample = collection.aggregate(
+                [
+                    {"$match": query or {}},
+                    {"$sample": {"size": self.partitions * DATA_INGESTION_EXPORT_SAMPLES_PER_PARTITION}},
+                    {"$project": {"_id": 1}},
+                ]
+            )
+            ids = sorted({document["_id"] for document in sample if isinstance(document["_id"], ObjectId)})
+            if len(ids) < self.partitions:
+                return []
+
+            return sorted({ids[len(ids) * number // self.partitions] for number in range(1, self.partitions)})
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    @staticmethod
+    def get_partition_queries(bounds: List[ObjectId], query: Optional[dict] = None) -> List[dict]:
+        """
+        One query per _id range. The first range takes every _id before the first split point,
+        $not also matches the _id values that are not ObjectIds, so no document falls between ranges
+        """
+        if not bounds:
+            return [query or {}]
+
+        id_ranges = [{"$not": {"$gte": bounds[0]}}]
+        id_ranges += [{"$gte": lower, "$lt": upper} for lower, upper in zip(bounds, bounds[1:])]
+        id_ranges.append({"$gte": bounds[-1]})
+
+        partition_queries = []
+        for id_range in id_ranges:
+            partition_query = {"_id": id_range}
+            if query:
+                partition_query = {"$and": [query, partition_query]}
+            partition_queries.append(partition_query)
+        return partition_queries
+
+    def map_partitions(
+        self,
+        function: Callable[[int, dict], Any],
+        collection_name: str,
+        database_name: Optional[str] = None,
+        query: Optional[dict] = None,
+    ) -> List[Any]:
+        """
+        Call function(partition_number, partition_query) for every _id range on a thread pool
+        :return: Results in partition order
+        """
+        bounds = self.get_partition_bounds(collection_name, database_name, query)
+        partition_queries = self.get_partition_queries(bounds, query)
+        logging.info(f"Exporting {collection_name} collection in {len(partition_queries)} partitions")
+
+        if len(partition_queries) == 1:
+            return [function(0, partition_queries[0])]
+
+        with ThreadPoolExecutor(len(partition_queries), thread_name_prefix="mongo-export") as executor:
+            return list(executor.map(function, range(len(partition_queries)), partition_queries))
+
+    def iter_collection_chunks(
+        self,
+        collection_name: str,
+        database_name: Optional[str] = None,
+        query: Optional[dict] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield the documents of the collection as dataframes of at most batch_size rows.
+        Only the schema columns are read, _id is left out by the server, and "nan" strings become NaN
+        :param query: Filter of the exported documents, all of them by default
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+
+            columns = self.get_schema_columns()
+            projection = {name: 1 for name in columns}
+            projection["_id"] = 0
+
+            cursor = collection.find(query or {}, projection, batch_size=self.batch_size)
+            try:
+                documents, chunks = [], 0
+                for document in cursor:
+                    documents.append(document)
+                    if len(documents) == self.batch_size:
+                        yield self._build_chunk(documents, columns)
+                        documents, chunks = [], chunks + 1
+
+                # an empty collection still gives one chunk, with the columns and no rows
+                if documents or chunks == 0:
+                    yield self._build_chunk(documents, columns)
+            finally:
+                cursor.close()
+
         except Exception as e:
             raise USvisaException(e, sys)
 
+    @profiled()
     def export_collection_as_dataframe(
-        self, collection_name: str, database_name: Optional[str] = None
+        self,
+        collection_name: str,
+        database_name: Optional[str] = None,
+        query: Optional[dict] = None,
     ) -> pd.DataFrame:
         try:
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client.database_name[collection_name]
 
-            df = pd.DataFrame(list(collection.find()))
+            def export_partition(number: int, partition_query: dict) -> pd.DataFrame:
+                return pd.concat(
+                    self.iter_collection_chunks(collection_name, database_name, partition_query),
+                    ignore_index=True,
+                )
 
-            if "_id" in df.columns.to_list():
-                df = df.drop(columns=["_id"], axis=1)
-
-            df.replace({"nan": np.nan}, inplace=True)
+            partition_dfs = self.map_partitions(export_partition, collection_name, database_name, query)
+            # an empty partition has object columns only, it would turn number columns into object ones
+            df = pd.concat(
+                [partition_df for partition_df in partition_dfs if len(partition_df)] or partition_dfs[:1],
+                ignore_index=True,
+            )
 
             return df
 
         except Exception as e:
             raise USvisaException(e, sys)
+
+    @profiled()
+    def export_collection_to_file(
+        self,
+        collection_name: str,
+        file_path: str,
+        database_name: Optional[str] = None,
+        query: Optional[dict] = None,
+    ) -> int:
+        """
+        Write the collection to the file_path feature store file chunk by chunk, never holding more than one chunk
+        per partition. The file is csv, parquet or feather by its extension, with the column types of the schema.
+        Every partition is written to its own shard file, the shards are then appended to file_path in partition order
+        :return: Number of exported rows
+        """
+        try:
+            arrow_schema = get_arrow_schema(self._schema_config)
+            file_format = get_file_format(file_path)
+
+            def export_partition(number: int, partition_query: dict) -> int:
+                with FeatureStoreWriter(
+                    f"{file_path}.part-{number:05d}", arrow_schema, file_format=file_format, header=False
+                ) as shard_writer:
+                    for chunk in self.iter_collection_chunks(collection_name, database_name, partition_query):
+                        shard_writer.write(chunk)
+                return shard_writer.rows
+
+            try:
+                partition_rows = self.map_partitions(
+                    export_partition, collection_name, database_name, query
+                )
+                with FeatureStoreWriter(file_path, arrow_schema) as writer:
+                    for number in range(len(partition_rows)):
+                        writer.append_file(f"{file_path}.part-{number:05d}")
+            finally:
+                for number in range(max(self.partitions, 1)):
+                    if os.path.exists(f"{file_path}.part-{number:05d}"):
+                        os.remove(f"{file_path}.part-{number:05d}")
+            rows = sum(partition_rows)
+
+            logging.info(f"Exported {rows} rows of {collection_name} collection to {file_path}")
+            return rows
+
+        except Exception as e:
+            raise USvisaException(e, sys)
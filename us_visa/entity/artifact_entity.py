@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -29,10 +30,23 @@ class ClassificationMetricsArtifact:
     recall_score: float
 
 
+@dataclass
+class KNNOptimizationArtifact:
+    index_type: str
+    prototype_reduction: str
+    original_n_samples: int
+    reduced_n_samples: int
+    reduced_metric_artifact: ClassificationMetricsArtifact
+    accuracy_change: float
+    is_reduction_accepted: bool
+    report_file_path: str
+
+
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path: str
     metric_artifact: ClassificationMetricsArtifact
+    knn_optimization_artifact: Optional[KNNOptimizationArtifact] = None
 
 
 @dataclass
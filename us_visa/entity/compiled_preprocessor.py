@@ -0,0 +1,430 @@
+import sys
+import math
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import (
+    StandardScaler,
+    OneHotEncoder,
+    OrdinalEncoder,
+    PowerTransformer,
+)
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+_EPS = np.spacing(1.0)
+
+
+def _yeo_johnson(x: float, lmbda: float) -> float:
+    """
+    Scalar version of the yeo-johnson transform of sklearn PowerTransformer
+    """
+    if x >= 0:
+        if abs(lmbda) < _EPS:
+            return math.log1p(x)
+        return (math.pow(x + 1, lmbda) - 1) / lmbda
+
+    if abs(lmbda - 2) > _EPS:
+        return -(math.pow(-x + 1, 2 - lmbda) - 1) / (2 - lmbda)
+    return -math.log1p(-x)
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _yeo_johnson_array(x: np.ndarray, lmbda: float) -> np.ndarray:
+    out = np.zeros_like(x)
+    pos = x >= 0
+
+    if abs(lmbda) < _EPS:
+        out[pos] = np.log1p(x[pos])
+    else:
+        out[pos] = (np.power(x[pos] + 1, lmbda) - 1) / lmbda
+
+    if abs(lmbda - 2) > _EPS:
+        out[~pos] = -(np.power(-x[~pos] + 1, 2 - lmbda) - 1) / (2 - lmbda)
+    else:
+        out[~pos] = -np.log1p(-x[~pos])
+
+    return out
+
+
+class CompiledPreprocessor:
+    """
+    This class holds the fitted parameters of the preprocessing ColumnTransformer as plain python tables
+    (category indexes, yeo-johnson lambdas, scaler means and scales) and applies them without pandas
+    and sklearn input validation, so one application becomes a feature vector in a few microseconds.
+    """
+
+    def __init__(
+        self, input_columns: List[str], blocks: List[dict], n_features: int, dtype=np.float32
+    ) -> None:
+        """
+        :param input_columns: Raw fields in the order expected for tuple records
+        :param blocks: One entry per fitted transformer of the ColumnTransformer
+        :param n_features: Width of the transformed feature vector
+        :param dtype: dtype of the returned feature arrays
+        """
+        self.input_columns = input_columns
+        self.blocks = blocks
+        self.n_features = n_features
+        self.dtype = dtype
+
+    @staticmethod
+    def _category_block(
+        kind: str, columns: List[str], offset: int, categories: List[list]
+    ) -> dict:
+        if kind == "onehot":
+            tables = []
+            width = 0
+            for column_categories in categories:
+                tables.append(
+                    {category: offset + width + i for i, category in enumerate(column_categories)}
+                )
+                width += len(column_categories)
+        else:
+            tables = [
+                {category: float(i) for i, category in enumerate(column_categories)}
+                for column_categories in categories
+            ]
+            width = len(columns)
+
+        return {
+            "kind": kind,
+            "columns": columns,
+            "offset": offset,
+            "width": width,
+            "tables": tables,
+            "categories": categories,
+        }
+
+    @staticmethod
+    def _compile_numeric_steps(transformer, n_columns: int) -> List[tuple]:
+        steps = transformer.steps if isinstance(transformer, Pipeline) else [(None, transformer)]
+
+        compiled_steps = []
+        for _, step in steps:
+            if isinstance(step, PowerTransformer):
+                if step.method != "yeo-johnson":
+                    raise Exception(f"PowerTransformer method {step.method} is not supported")
+                compiled_steps.append(("yeo_johnson", [float(l) for l in step.lambdas_]))
+                if step.standardize:
+                    compiled_steps.append(
+                        (
+                            "scale",
+                            [float(m) for m in step._scaler.mean_],
+                            [float(s) for s in step._scaler.scale_],
+                        )
+                    )
+            elif isinstance(step, StandardScaler):
+                mean = step.mean_ if step.with_mean else np.zeros(n_columns)
+                scale = step.scale_ if step.with_std else np.ones(n_columns)
+                compiled_steps.append(
+                    ("scale", [float(m) for m in mean], [float(s) for s in scale])
+                )
+            else:
+                raise Exception(f"{type(step).__name__} can not be compiled")
+
+        return compiled_steps
+
+    @classmethod
+    def compile(
+        cls, preprocessor: ColumnTransformer, dtype=np.float32
+    ) -> "CompiledPreprocessor":
+        """
+        Extract the fitted parameters of the preprocessor
+        :param preprocessor: ColumnTransformer fitted by DataTransformation
+        :param dtype: dtype of the returned feature arrays
+        :return: CompiledPreprocessor
+        """
+        logging.info("Entered compile method of CompiledPreprocessor class")
+        try:
+            if preprocessor.sparse_output_:
+                raise Exception("Sparse ColumnTransformer output can not be compiled")
+
+            blocks = []
+            offset = 0
+            for name, transformer, columns in preprocessor.transformers_:
+                if transformer == "drop" or len(columns) == 0:
+                    continue
+                if transformer == "passthrough":
+                    raise Exception("passthrough columns can not be compiled")
+
+                columns = list(columns)
+                if isinstance(transformer, (OneHotEncoder, OrdinalEncoder)):
+                    kind = "onehot" if isinstance(transformer, OneHotEncoder) else "ordinal"
+                    if kind == "onehot" and transformer.drop_idx_ is not None:
+                        raise Exception("OneHotEncoder with drop can not be compiled")
+                    block = cls._category_block(
+                        kind,
+                        columns,
+                        offset,
+                        [[_to_python(c) for c in categories] for categories in transformer.categories_],
+                    )
+                    blocks.append(block)
+                    offset += block["width"]
+                else:
+                    blocks.append(
+                        {
+                            "kind": "numeric",
+                            "columns": columns,
+                            "offset": offset,
+                            "steps": cls._compile_numeric_steps(transformer, len(columns)),
+                        }
+                    )
+                    offset += len(columns)
+
+            logging.info(f"Compiled preprocessor into {len(blocks)} blocks of {offset} features")
+            return cls(
+                input_columns=list(preprocessor.feature_names_in_),
+                blocks=blocks,
+                n_features=offset,
+                dtype=dtype,
+            )
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def categories(self) -> Dict[str, list]:
+        """
+        Known categories of every encoded column
+        """
+        return {
+            column: column_categories
+            for block in self.blocks
+            if block["kind"] in ("onehot", "ordinal")
+            for column, column_categories in zip(block["columns"], block["categories"])
+        }
+
+    def to_bundle(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        """
+        Split the compiled parameters into a json friendly header and raw numeric arrays
+        :return: header, arrays keyed by name
+        """
+        header_blocks = []
+        arrays = {}
+        for i, block in enumerate(self.blocks):
+            header_block = {
+                "kind": block["kind"],
+                "columns": block["columns"],
+                "offset": block["offset"],
+            }
+            if block["kind"] in ("onehot", "ordinal"):
+                header_block["categories"] = block["categories"]
+            else:
+                header_block["steps"] = [step[0] for step in block["steps"]]
+                for j, step in enumerate(block["steps"]):
+                    if step[0] == "yeo_johnson":
+                        arrays[f"{i}.{j}.lambdas"] = np.array(step[1], dtype=np.float64)
+                    else:
+                        arrays[f"{i}.{j}.mean"] = np.array(step[1], dtype=np.float64)
+                        arrays[f"{i}.{j}.scale"] = np.array(step[2], dtype=np.float64)
+            header_blocks.append(header_block)
+
+        header = {
+            "input_columns": self.input_columns,
+            "n_features": self.n_features,
+            "dtype": np.dtype(self.dtype).str,
+            "blocks": header_blocks,
+        }
+        return header, arrays
+
+    @classmethod
+    def from_bundle(cls, header: dict, arrays: Dict[str, np.ndarray]) -> "CompiledPreprocessor":
+        """
+        Rebuild the compiled preprocessor written by to_bundle
+        """
+        blocks = []
+        for i, header_block in enumerate(header["blocks"]):
+            if header_block["kind"] in ("onehot", "ordinal"):
+                blocks.append(
+                    cls._category_block(
+                        header_block["kind"],
+                        header_block["columns"],
+                        header_block["offset"],
+                        header_block["categories"],
+                    )
+                )
+                continue
+
+            steps = []
+            for j, step_kind in enumerate(header_block["steps"]):
+                if step_kind == "yeo_johnson":
+                    steps.append((step_kind, arrays[f"{i}.{j}.lambdas"].tolist()))
+                else:
+                    steps.append(
+                        (
+                            step_kind,
+                            arrays[f"{i}.{j}.mean"].tolist(),
+                            arrays[f"{i}.{j}.scale"].tolist(),
+                        )
+                    )
+            blocks.append(
+                {
+                    "kind": "numeric",
+                    "columns": header_block["columns"],
+                    "offset": header_block["offset"],
+                    "steps": steps,
+                }
+            )
+
+        return cls(
+            input_columns=header["input_columns"],
+            blocks=blocks,
+            n_features=header["n_features"],
+            dtype=np.dtype(header["dtype"]).type,
+        )
+
+    def transform_record(self, record: Union[dict, Sequence]) -> np.ndarray:
+        """
+        Transform one application given as a dict keyed by field name or a tuple in input_columns order
+        :return: 1d feature vector
+        """
+        if not isinstance(record, dict):
+            record = dict(zip(self.input_columns, record))
+
+        values = [0.0] * self.n_features
+        for block in self.blocks:
+            kind = block["kind"]
+            if kind == "onehot":
+                for column, table in zip(block["columns"], block["tables"]):
+                    values[table[record[column]]] = 1.0
+            elif kind == "ordinal":
+                offset = block["offset"]
+                for i, (column, table) in enumerate(zip(block["columns"], block["tables"])):
+                    values[offset + i] = table[record[column]]
+            else:
+                column_values = [float(record[column]) for column in block["columns"]]
+                for step in block["steps"]:
+                    if step[0] == "yeo_johnson":
+                        column_values = [
+                            _yeo_johnson(x, l) for x, l in zip(column_values, step[1])
+                        ]
+                    else:
+                        column_values = [
+                            (x - m) / s for x, m, s in zip(column_values, step[1], step[2])
+                        ]
+                values[block["offset"] : block["offset"] + len(column_values)] = column_values
+
+        return np.array(values, dtype=self.dtype)
+
+    def transform_records(self, records: Sequence[Union[dict, Sequence]]) -> np.ndarray:
+        """
+        Transform many applications, each given as for transform_record
+        :return: 2d feature array
+        """
+        try:
+            features = np.empty((len(records), self.n_features), dtype=self.dtype)
+            for i, record in enumerate(records):
+                features[i] = self.transform_record(record)
+            return features
+        except KeyError as e:
+            raise USvisaException(f"Unknown category or missing field {e}", sys)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def transform_frame(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Column at a time transform of a dataframe, the vectorized counterpart of transform_records
+        :return: 2d feature array
+        """
+        try:
+            n_rows = len(dataframe)
+            features = np.zeros((n_rows, self.n_features), dtype=np.float64)
+            rows = np.arange(n_rows)
+
+            for block in self.blocks:
+                kind = block["kind"]
+                if kind in ("onehot", "ordinal"):
+                    for i, (column, categories) in enumerate(
+                        zip(block["columns"], block["categories"])
+                    ):
+                        codes = pd.Categorical(
+                            dataframe[column], categories=categories
+                        ).codes
+                        if (codes < 0).any():
+                            unknown = dataframe[column][codes < 0].iloc[0]
+                            raise Exception(f"Unknown category {unknown!r} in column {column}")
+                        if kind == "onehot":
+                            features[rows, block["tables"][i][categories[0]] + codes] = 1.0
+                        else:
+                            features[:, block["offset"] + i] = codes
+                else:
+                    column_values = dataframe[block["columns"]].to_numpy(dtype=np.float64)
+                    for step in block["steps"]:
+                        if step[0] == "yeo_johnson":
+                            for j, lmbda in enumerate(step[1]):
+                                column_values[:, j] = _yeo_johnson_array(
+                                    column_values[:, j], lmbda
+                                )
+                        else:
+                            column_values = (column_values - np.array(step[1])) / np.array(
+                                step[2]
+                            )
+                    offset = block["offset"]
+                    features[:, offset : offset + column_values.shape[1]] = column_values
+
+            return features.astype(self.dtype, copy=False)
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def sample_frame(self) -> DataFrame:
+        """
+        Small dataframe that covers every known category once, used to check the compiled output
+        """
+        n_rows = max(
+            [len(c) for block in self.blocks for c in block.get("categories", [])] + [1]
+        )
+        columns: Dict[str, list] = {}
+        for block in self.blocks:
+            for i, column in enumerate(block["columns"]):
+                if block["kind"] in ("onehot", "ordinal"):
+                    categories = block["categories"][i]
+                    columns[column] = [categories[j % len(categories)] for j in range(n_rows)]
+                else:
+                    columns[column] = [float(10 ** (j % 6)) - 2 for j in range(n_rows)]
+
+        return DataFrame(columns, columns=self.input_columns)
+
+    def verify(
+        self,
+        preprocessor: ColumnTransformer,
+        dataframe: DataFrame = None,
+        rtol: float = 1e-5,
+        atol: float = 1e-5,
+    ) -> float:
+        """
+        Compare the compiled transform with the sklearn transform and raise if they are not close
+        :return: Largest absolute difference
+        """
+        try:
+            if dataframe is None:
+                dataframe = self.sample_frame()
+
+            expected = np.asarray(preprocessor.transform(dataframe), dtype=np.float64)
+            max_difference = 0.0
+            for got in (
+                self.transform_records(dataframe.to_dict("records")),
+                self.transform_frame(dataframe),
+            ):
+                got = got.astype(np.float64)
+                if not np.allclose(got, expected, rtol=rtol, atol=atol):
+                    raise Exception(
+                        f"Compiled preprocessor differs from sklearn by {np.max(np.abs(got - expected))}"
+                    )
+                max_difference = max(
+                    max_difference, float(np.max(np.abs(got - expected)))
+                )
+
+            return max_difference
+
+        except Exception as e:
+            raise USvisaException(e, sys)
@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import Optional
 from us_visa.constants import *
 
 
@@ -12,6 +13,15 @@ class TrainingPipelineConfig:
 training_pipeline_config = TrainingPipelineConfig()
 
 
+@dataclass
+class TrainingProfileConfig:
+    enabled: bool = TRAINING_PROFILE_ENABLED
+    trace_memory: bool = TRAINING_PROFILE_TRACE_MEMORY
+    profile_file_path: str = os.path.join(
+        training_pipeline_config.artifact_dir, TRAINING_PROFILE_FILE_NAME
+    )
+
+
 @dataclass
 class DataIngestionConfig:
     data_ingested_dir: str = os.path.join(
@@ -27,6 +37,18 @@ class DataIngestionConfig:
         data_ingested_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME
     )
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
+    export_batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE
+    export_partitions: int = DATA_INGESTION_EXPORT_PARTITIONS
+    incremental: bool = DATA_INGESTION_INCREMENTAL
+    incremental_feature_store_file_path: str = os.path.join(
+        DATA_INGESTION_INCREMENTAL_DIR, FILE_NAME
+    )
+    watermark_file_path: str = os.path.join(
+        DATA_INGESTION_INCREMENTAL_DIR, DATA_INGESTION_WATERMARK_FILE_NAME
+    )
+    watermark_field: str = DATA_INGESTION_WATERMARK_FIELD
+    watermark_lookback_seconds: int = DATA_INGESTION_WATERMARK_LOOKBACK_SECONDS
+    merge_key: Optional[str] = DATA_INGESTION_MERGE_KEY or None
 
 
 @dataclass
@@ -75,6 +97,13 @@ class ModelTrainerConfig:
     )
     expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
     model_trainer_config_file_path: str = MODEL_CONFIG_FILE_PATH
+    knn_index_type: str = MODEL_TRAINER_KNN_INDEX_TYPE
+    knn_leaf_size: int = MODEL_TRAINER_KNN_LEAF_SIZE
+    knn_prototype_reduction: str = MODEL_TRAINER_KNN_PROTOTYPE_REDUCTION
+    knn_max_accuracy_drop: float = MODEL_TRAINER_KNN_MAX_ACCURACY_DROP
+    knn_report_file_path: str = os.path.join(
+        model_trainer_dir, MODEL_TRAINER_KNN_REPORT_FILE_NAME
+    )
 
 
 @dataclass
@@ -90,7 +119,86 @@ class ModelPusherConfig:
     s3_model_key_path: str = MODEL_FILE_NAME
 
 
+@dataclass
+class StorageConfig:
+    backend: str = STORAGE_BACKEND
+    local_dir: str = STORAGE_LOCAL_DIR
+
+
+@dataclass
+class S3CacheConfig:
+    enabled: bool = S3_CACHE_ENABLED
+    cache_dir: str = S3_CACHE_DIR
+    max_bytes: int = S3_CACHE_MAX_BYTES
+    eviction_grace_seconds: float = S3_CACHE_EVICTION_GRACE_SECONDS
+
+
+@dataclass
+class S3TransferConfig:
+    part_size_bytes: int = S3_TRANSFER_PART_SIZE_BYTES
+    max_concurrency: int = S3_TRANSFER_MAX_CONCURRENCY
+    multipart_threshold_bytes: int = S3_TRANSFER_MULTIPART_THRESHOLD_BYTES
+    csv_chunk_rows: int = S3_TRANSFER_CSV_CHUNK_ROWS
+
+
 @dataclass
 class USvisaPredictorConfig:
     model_file_path: str = MODEL_FILE_NAME
     model_bucket_name: str = MODEL_BUCKET_NAME
+    model_cache_ttl_seconds: float = MODEL_CACHE_TTL_SECONDS
+    compiled_preprocessor_enabled: bool = PREDICTION_COMPILED_PREPROCESSOR_ENABLED
+
+
+@dataclass
+class PredictionCacheConfig:
+    enabled: bool = PREDICTION_CACHE_ENABLED
+    max_entries: int = PREDICTION_CACHE_MAX_ENTRIES
+    max_bytes: int = PREDICTION_CACHE_MAX_BYTES
+    ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS
+
+
+@dataclass
+class PredictionMicroBatcherConfig:
+    enabled: bool = PREDICTION_MICRO_BATCH_ENABLED
+    window_ms: float = PREDICTION_MICRO_BATCH_WINDOW_MS
+    max_batch_size: int = PREDICTION_MICRO_BATCH_MAX_SIZE
+
+
+@dataclass
+class PredictionStreamConfig:
+    chunk_rows: int = PREDICTION_STREAM_CHUNK_ROWS
+    max_line_bytes: int = PREDICTION_STREAM_MAX_LINE_BYTES
+    max_decompressed_chunk_bytes: int = PREDICTION_STREAM_MAX_DECOMPRESSED_CHUNK_BYTES
+
+
+@dataclass
+class USvisaExecutorConfig:
+    predict_workers: int = EXECUTOR_PREDICT_WORKERS
+    io_workers: int = EXECUTOR_IO_WORKERS
+
+
+@dataclass
+class ModelWarmupConfig:
+    rounds: int = MODEL_WARMUP_ROUNDS
+    n_records: int = MODEL_WARMUP_RECORDS
+    retry_seconds: float = MODEL_WARMUP_RETRY_SECONDS
+
+
+@dataclass
+class TrainingJobConfig:
+    job_dir: str = TRAINING_JOB_DIR
+    history_size: int = TRAINING_JOB_HISTORY_SIZE
+    shutdown_timeout_seconds: float = TRAINING_JOB_SHUTDOWN_TIMEOUT_SECONDS
+
+
+@dataclass
+class BatchPredictionConfig:
+    chunk_size: int = BATCH_PREDICTION_CHUNK_SIZE
+    n_workers: int = BATCH_PREDICTION_WORKERS
+    max_pending_chunks: int = 2 * BATCH_PREDICTION_WORKERS
+    id_column: str = BATCH_PREDICTION_ID_COLUMN
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    model_file_path: str = MODEL_FILE_NAME
+    local_model_path: Optional[str] = None
+    use_model_bundle: bool = MODEL_BUNDLE_ENABLED
+    compile_preprocessor: bool = False
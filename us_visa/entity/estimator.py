@@ -1,8 +1,19 @@
 import sys
+from typing import List, Optional, Sequence, Union
 
+from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import Pipeline
 from pandas import DataFrame
 
+from us_visa.constants import FOREST_ENGINE_ENABLED, FOREST_ENGINE_MAX_BATCH_ROWS
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.entity.forest_engine import FlatForest
+from us_visa.monitoring.metrics import (
+    DATAFRAME_BUILD_SECONDS,
+    PREDICT_SECONDS,
+    PREDICTED_ROWS,
+    TRANSFORM_SECONDS,
+)
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 
@@ -28,14 +39,88 @@ class USVisaModel:
         try:
             self.preprocessing_object = preprocessing_object
             self.trained_model_object = trained_model_object
+            self.compiled_preprocessor: Optional[CompiledPreprocessor] = None
         except Exception as e:
             raise USvisaException(e, sys)
 
+    def compile_preprocessor(self) -> None:
+        """
+        Compile the fitted preprocessing object and use it for predictions if it matches the sklearn transform
+        """
+        logging.info("Entered compile_preprocessor method of USVisaModel class")
+        try:
+            compiled_preprocessor = CompiledPreprocessor.compile(
+                self.preprocessing_object
+            )
+            max_difference = compiled_preprocessor.verify(self.preprocessing_object)
+            logging.info(
+                f"Compiled preprocessor differs from sklearn by at most {max_difference}"
+            )
+            self.compiled_preprocessor = compiled_preprocessor
+        except Exception as e:
+            logging.info(f"Using sklearn preprocessing, compile failed: {e}")
+            self.compiled_preprocessor = None
+
+    def get_estimator(self, n_rows: int = 1) -> object:
+        """
+        Estimator used to predict n_rows rows: the flattened forest engine when the trained model is a random forest
+        and the batch is small enough for it to beat sklearn, otherwise the trained model.
+        The engine is built on first use, so models pickled before it existed get it too
+        """
+        if not hasattr(self, "forest_engine"):
+            self.forest_engine: Optional[FlatForest] = None
+            trained_model = getattr(
+                self.trained_model_object, "best_estimator_", self.trained_model_object
+            )
+            if FOREST_ENGINE_ENABLED and isinstance(trained_model, RandomForestClassifier):
+                try:
+                    self.forest_engine = FlatForest.from_sklearn(trained_model)
+                except Exception as e:
+                    logging.info(f"Using sklearn forest, flattening failed: {e}")
+
+        if self.forest_engine is not None and n_rows <= FOREST_ENGINE_MAX_BATCH_ROWS:
+            return self.forest_engine
+        return self.trained_model_object
+
     def predict(self, dataframe: DataFrame) -> DataFrame:
         try:
-            transformed_features = self.preprocessing_object.transform(dataframe)
+            compiled_preprocessor = getattr(self, "compiled_preprocessor", None)
+            with TRANSFORM_SECONDS.time():
+                if compiled_preprocessor is not None:
+                    transformed_features = compiled_preprocessor.transform_frame(dataframe)
+                else:
+                    transformed_features = self.preprocessing_object.transform(dataframe)
+
+            return self._predict_transformed(transformed_features)
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def _predict_transformed(self, transformed_features) -> DataFrame:
+        with PREDICT_SECONDS.time():
+            predictions = self.get_estimator(len(transformed_features)).predict(
+                transformed_features
+            )
+        PREDICTED_ROWS.inc(len(predictions))
+        return predictions
+
+    def predict_records(self, records: List[Union[dict, Sequence]]) -> DataFrame:
+        """
+        Predict applications given as dicts keyed by field name, skipping the dataframe when the preprocessor is compiled
+        """
+        try:
+            compiled_preprocessor = getattr(self, "compiled_preprocessor", None)
+            if compiled_preprocessor is None:
+                with DATAFRAME_BUILD_SECONDS.time():
+                    dataframe = DataFrame.from_records(
+                        records, columns=list(self.preprocessing_object.feature_names_in_)
+                    )
+                return self.predict(dataframe)
+
+            with TRANSFORM_SECONDS.time():
+                transformed_features = compiled_preprocessor.transform_records(records)
 
-            return self.trained_model_object.predict(transformed_features)
+            return self._predict_transformed(transformed_features)
 
         except Exception as e:
             raise USvisaException(e, sys)
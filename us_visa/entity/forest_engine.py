@@ -0,0 +1,180 @@
+import sys
+from typing import Dict, Tuple
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class FlatForest:
+    """
+    This class packs the trees of a fitted RandomForestClassifier into flat node arrays
+    (feature, threshold, left child, normalized leaf value) and walks every tree
+    for a whole batch at once with numpy fancy indexing.
+    Siblings are stored next to each other, so the next node is left child + (feature > threshold),
+    and leaves point to themselves, so a (row, tree) pair that stops moving has reached its leaf.
+    Predictions match sklearn exactly: features are compared as float32, leaf probabilities are
+    summed tree by tree in float64 and ties go to the first class.
+    """
+
+    kind = "random_forest"
+
+    # the active (row, tree) pairs are compacted when less than this share of them moved
+    compact_ratio = 0.75
+    array_names = ["roots", "feature", "threshold", "children_left", "value", "classes"]
+
+    def __init__(
+        self,
+        roots: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children_left: np.ndarray,
+        value: np.ndarray,
+        classes: np.ndarray,
+        max_depth: int,
+    ) -> None:
+        """
+        :param roots: Index of the root node of every tree
+        :param feature: Feature compared at every node, 0 for leaves
+        :param threshold: Threshold of every node, a node goes left when feature <= threshold, inf for leaves
+        :param children_left: Left child of every node, the right child is the next node, the node itself for leaves
+        :param value: Class probabilities of every node, n_nodes x n_classes
+        :param classes: Class labels of the forest
+        :param max_depth: Depth of the deepest tree
+        """
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.value = value
+        self.classes_ = classes
+        self.max_depth = max_depth
+
+    @staticmethod
+    def _sibling_order(children_left: np.ndarray, children_right: np.ndarray) -> np.ndarray:
+        """
+        Breadth first node order of a tree, so the right child of every node directly follows its left child
+        """
+        order = [0]
+        for node in order:
+            if children_left[node] != -1:
+                order.append(children_left[node])
+                order.append(children_right[node])
+        return np.array(order, dtype=np.int64)
+
+    @classmethod
+    def from_sklearn(cls, estimator: RandomForestClassifier) -> "FlatForest":
+        """
+        Pack a fitted RandomForestClassifier, or the best estimator of a fitted search over one
+        """
+        logging.info("Entered from_sklearn method of FlatForest class")
+        try:
+            estimator = getattr(estimator, "best_estimator_", estimator)
+            if not isinstance(estimator, RandomForestClassifier):
+                raise Exception(f"{type(estimator).__name__} is not a RandomForestClassifier")
+            if estimator.n_outputs_ != 1:
+                raise Exception("Only single output forests can be flattened")
+
+            roots, features, thresholds, lefts, values = [], [], [], [], []
+            offset = 0
+            max_depth = 0
+            for tree_estimator in estimator.estimators_:
+                tree = tree_estimator.tree_
+                order = cls._sibling_order(tree.children_left, tree.children_right)
+                position = np.empty_like(order)
+                position[order] = np.arange(tree.node_count)
+
+                is_leaf = tree.children_left[order] == -1
+                roots.append(offset)
+                features.append(np.where(is_leaf, 0, tree.feature[order]))
+                # leaves always go "left" to themselves
+                thresholds.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+                lefts.append(
+                    offset
+                    + np.where(
+                        is_leaf,
+                        np.arange(tree.node_count),
+                        position[tree.children_left[order]],
+                    )
+                )
+
+                # same normalization as DecisionTreeClassifier.predict_proba
+                value = tree.value[order, 0, :].astype(np.float64)
+                normalizer = value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                values.append(value / normalizer)
+
+                offset += tree.node_count
+                max_depth = max(max_depth, tree.max_depth)
+
+            flat_forest = cls(
+                roots=np.array(roots, dtype=np.int64),
+                feature=np.concatenate(features).astype(np.int64),
+                threshold=np.concatenate(thresholds).astype(np.float64),
+                children_left=np.concatenate(lefts).astype(np.int64),
+                value=np.concatenate(values),
+                classes=np.asarray(estimator.classes_),
+                max_depth=max_depth,
+            )
+            logging.info(
+                f"Flattened {len(roots)} trees into {offset} nodes of max depth {max_depth}"
+            )
+            return flat_forest
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def to_bundle(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        arrays = {name: getattr(self, name) for name in self.array_names if name != "classes"}
+        arrays["classes"] = self.classes_
+        return {"kind": self.kind, "max_depth": self.max_depth}, arrays
+
+    @classmethod
+    def from_bundle(cls, header: dict, arrays: Dict[str, np.ndarray]) -> "FlatForest":
+        return cls(
+            **{name: arrays[name] for name in cls.array_names},
+            max_depth=header["max_depth"],
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        :return: Leaf node of every row in every tree, n_rows x n_trees
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        flat_X = X.ravel()
+
+        leaves = np.empty(n_rows * n_trees, dtype=np.int64)
+        # current node, start of the row in flat_X and output slot of every unfinished (row, tree) pair
+        node = np.tile(self.roots, n_rows)
+        row_start = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        slot = np.arange(n_rows * n_trees)
+        while node.size:
+            go_right = flat_X[row_start + self.feature[node]] > self.threshold[node]
+            following = self.children_left[node] + go_right
+            moved = following != node
+            node = following
+
+            # pairs at a leaf stay there, so they are only dropped once enough of them finished
+            n_moved = np.count_nonzero(moved)
+            if n_moved < self.compact_ratio * node.size:
+                finished = ~moved
+                leaves[slot[finished]] = node[finished]
+                node, row_start, slot = node[moved], row_start[moved], slot[moved]
+
+        return leaves.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], len(self.classes_)), dtype=np.float64)
+        # accumulate tree by tree like sklearn, a pairwise sum could flip exact ties
+        for tree in range(leaves.shape[1]):
+            proba += self.value[leaves[:, tree]]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -0,0 +1,396 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import BallTree, KDTree, KNeighborsClassifier
+
+from us_visa.constants import MODEL_BUNDLE_FILE_EXTENSION
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.entity.forest_engine import FlatForest
+from us_visa.entity.neighbor_index import (
+    NEIGHBOR_INDEX_CLASSES,
+    index_from_bundle,
+    index_to_bundle,
+)
+from us_visa.monitoring.metrics import PREDICT_SECONDS, PREDICTED_ROWS, TRANSFORM_SECONDS
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+BUNDLE_MAGIC = b"USVISAB1"
+BUNDLE_FORMAT_VERSION = 1
+
+# arrays start on 64 byte boundaries so every mapped array is aligned for any dtype
+_ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sQ")
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def get_bundle_path(model_file_path: str) -> str:
+    """
+    Path of the model bundle stored next to a pickled model, model.pkl -> model.bundle
+    """
+    return os.path.splitext(model_file_path)[0] + MODEL_BUNDLE_FILE_EXTENSION
+
+
+def write_bundle(file_path: str, header: dict, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Write a bundle file: magic, header length, json header, then every array as raw aligned bytes
+    :param file_path: Bundle file to write, replaced atomically
+    :param header: json serializable metadata
+    :param arrays: Numeric arrays keyed by name
+    """
+    array_table = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise Exception(f"Array {name} of dtype object can not be bundled")
+        array_table[name] = {
+            "dtype": array.dtype.descr if array.dtype.names else array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset = _aligned(offset + array.nbytes)
+
+    header_bytes = json.dumps(
+        dict(header, format_version=BUNDLE_FORMAT_VERSION, arrays=array_table)
+    ).encode()
+    data_start = _aligned(_PREAMBLE.size + len(header_bytes))
+
+    dir_path = os.path.dirname(file_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path or ".", suffix=MODEL_BUNDLE_FILE_EXTENSION)
+    try:
+        with os.fdopen(fd, "wb") as bundle_file:
+            bundle_file.write(_PREAMBLE.pack(BUNDLE_MAGIC, len(header_bytes)))
+            bundle_file.write(header_bytes)
+            for name, array in arrays.items():
+                bundle_file.seek(data_start + array_table[name]["offset"])
+                bundle_file.write(np.ascontiguousarray(array).tobytes())
+            # pad the file so the last array is inside the mapped length even when it is empty
+            bundle_file.truncate(data_start + offset)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_bundle(source: Union[str, bytes, memoryview]) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """
+    Map a bundle file read only, the returned arrays are views on the mapping and are never copied,
+    so processes loading the same file share its pages
+    :param source: Bundle file path, or a buffer already holding the bundle, the arrays are then views on it
+    :return: header, arrays keyed by name
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as bundle_file:
+            bundle_map = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        bundle_map = source
+
+    magic, header_length = _PREAMBLE.unpack_from(bundle_map, 0)
+    if magic != BUNDLE_MAGIC:
+        raise Exception(f"{source if isinstance(source, str) else 'Buffer'} is not a us_visa model bundle")
+
+    header = json.loads(bundle_map[_PREAMBLE.size : _PREAMBLE.size + header_length])
+    if header["format_version"] != BUNDLE_FORMAT_VERSION:
+        raise Exception(f"Unsupported model bundle format version {header['format_version']}")
+
+    data_start = _aligned(_PREAMBLE.size + header_length)
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = entry["dtype"]
+        # structured dtypes are stored as their descr, a list of [name, format] pairs
+        dtype = np.dtype([tuple(field) for field in dtype] if isinstance(dtype, list) else dtype)
+        shape = tuple(entry["shape"])
+        arrays[name] = np.frombuffer(
+            bundle_map,
+            dtype=dtype,
+            count=int(np.prod(shape)),
+            offset=data_start + entry["offset"],
+        ).reshape(shape)
+
+    return header, arrays
+
+
+def _prefixed(prefix: str, arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {f"{prefix}/{name}": array for name, array in arrays.items()}
+
+
+def _unprefixed(prefix: str, arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    start = len(prefix) + 1
+    return {name[start:]: array for name, array in arrays.items() if name.startswith(prefix + "/")}
+
+
+class BundledKNeighborsClassifier:
+    """
+    KNeighborsClassifier rebuilt from its training matrix, searching it with the persisted
+    KDTree or BallTree index when the model was fitted with one, otherwise by brute force in row chunks
+    """
+
+    kind = "k_neighbors"
+
+    # query rows per distance block, bounds the chunk x training rows distance matrix
+    chunk_rows = 256
+
+    def __init__(
+        self,
+        classes: np.ndarray,
+        fit_X: np.ndarray,
+        y: np.ndarray,
+        n_neighbors: int,
+        weights: str,
+        fit_X_squared: Optional[np.ndarray] = None,
+        index: Optional[Union[KDTree, BallTree]] = None,
+        leaf_size: int = 30,
+    ) -> None:
+        self.classes_ = classes
+        self.fit_X = fit_X
+        self.y = y
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.index = index
+        self.leaf_size = leaf_size
+        if fit_X_squared is None:
+            fit_X_squared = np.einsum("ij,ij->i", fit_X, fit_X)
+        self.fit_X_squared = fit_X_squared
+
+    @classmethod
+    def from_sklearn(cls, estimator: KNeighborsClassifier) -> "BundledKNeighborsClassifier":
+        euclidean = estimator.effective_metric_ == "euclidean" or (
+            estimator.effective_metric_ == "minkowski"
+            and estimator.effective_metric_params_.get("p", estimator.p) == 2
+        )
+        if not euclidean:
+            raise Exception(f"Metric {estimator.effective_metric_} can not be bundled")
+        if estimator.weights not in ("uniform", "distance"):
+            raise Exception("Only uniform and distance weights can be bundled")
+        if np.asarray(estimator._y).ndim != 1:
+            raise Exception("Only single output k neighbors classifiers can be bundled")
+
+        return cls(
+            classes=np.asarray(estimator.classes_),
+            fit_X=np.asarray(estimator._fit_X, dtype=np.float64),
+            y=np.asarray(estimator._y, dtype=np.int64),
+            n_neighbors=estimator.n_neighbors,
+            weights=estimator.weights,
+            index=estimator._tree if estimator._fit_method in NEIGHBOR_INDEX_CLASSES else None,
+            leaf_size=estimator.leaf_size,
+        )
+
+    def to_bundle(self) -> Tuple[dict, Dict[str, np.ndarray]]:
+        header = {
+            "kind": self.kind,
+            "n_neighbors": self.n_neighbors,
+            "weights": self.weights,
+        }
+        arrays = {
+            "classes": self.classes_,
+            "fit_X": self.fit_X,
+            "fit_X_squared": self.fit_X_squared,
+            "y": self.y,
+        }
+        if self.index is not None:
+            header["index"], index_arrays = index_to_bundle(
+                self.index, self.fit_X, self.leaf_size
+            )
+            arrays.update(_prefixed("index", index_arrays))
+        return header, arrays
+
+    @classmethod
+    def from_bundle(
+        cls, header: dict, arrays: Dict[str, np.ndarray]
+    ) -> "BundledKNeighborsClassifier":
+        index = None
+        if "index" in header:
+            index = index_from_bundle(
+                header["index"], _unprefixed("index", arrays), arrays["fit_X"]
+            )
+
+        return cls(
+            classes=arrays["classes"],
+            fit_X=arrays["fit_X"],
+            y=arrays["y"],
+            n_neighbors=header["n_neighbors"],
+            weights=header["weights"],
+            fit_X_squared=arrays["fit_X_squared"],
+            index=index,
+            leaf_size=header["index"]["leaf_size"] if index is not None else 30,
+        )
+
+    def kneighbors(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        X = np.asarray(X, dtype=np.float64)
+        k = self.n_neighbors
+        if self.index is not None:
+            return self.index.query(X, k=k)
+
+        distances = np.empty((X.shape[0], k))
+        indices = np.empty((X.shape[0], k), dtype=np.int64)
+        for start in range(0, X.shape[0], self.chunk_rows):
+            chunk = X[start : start + self.chunk_rows]
+            squared = (
+                np.einsum("ij,ij->i", chunk, chunk)[:, None]
+                - 2 * chunk @ self.fit_X.T
+                + self.fit_X_squared[None, :]
+            )
+            nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            nearest_squared = np.take_along_axis(squared, nearest, axis=1)
+            order = np.argsort(nearest_squared, axis=1, kind="stable")
+            indices[start : start + len(chunk)] = np.take_along_axis(nearest, order, axis=1)
+            distances[start : start + len(chunk)] = np.sqrt(
+                np.maximum(np.take_along_axis(nearest_squared, order, axis=1), 0)
+            )
+        return distances, indices
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        distances, indices = self.kneighbors(X)
+        neighbor_classes = self.y[indices]
+
+        if self.weights == "uniform":
+            weights = np.ones_like(distances)
+        else:
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / distances
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+
+        scores = np.zeros((X.shape[0], len(self.classes_)))
+        for class_index in range(len(self.classes_)):
+            scores[:, class_index] = (weights * (neighbor_classes == class_index)).sum(axis=1)
+        return self.classes_.take(np.argmax(scores, axis=1), axis=0)
+
+
+_BUNDLED_ESTIMATORS = {
+    estimator_class.kind: estimator_class
+    for estimator_class in (FlatForest, BundledKNeighborsClassifier)
+}
+
+
+def bundle_estimator(estimator: object) -> Union[FlatForest, BundledKNeighborsClassifier]:
+    """
+    Convert a fitted sklearn estimator, or the best estimator of a fitted search, to its bundled version
+    """
+    estimator = getattr(estimator, "best_estimator_", estimator)
+    if isinstance(estimator, RandomForestClassifier):
+        return FlatForest.from_sklearn(estimator)
+    if isinstance(estimator, KNeighborsClassifier):
+        return BundledKNeighborsClassifier.from_sklearn(estimator)
+    raise Exception(f"{type(estimator).__name__} can not be bundled")
+
+
+class BundledUSVisaModel:
+    """
+    us_visa model loaded from a bundle file: the compiled preprocessor and the estimator arrays
+    are read only views on the mapped file instead of unpickled python objects
+    """
+
+    def __init__(
+        self,
+        compiled_preprocessor: CompiledPreprocessor,
+        trained_model_object: Union[FlatForest, BundledKNeighborsClassifier],
+    ) -> None:
+        self.compiled_preprocessor = compiled_preprocessor
+        self.trained_model_object = trained_model_object
+
+    def compile_preprocessor(self) -> None:
+        """
+        Bundled models always predict with their compiled preprocessor
+        """
+
+    def predict(self, dataframe: DataFrame) -> np.ndarray:
+        try:
+            with TRANSFORM_SECONDS.time():
+                transformed_features = self.compiled_preprocessor.transform_frame(dataframe)
+            return self._predict_transformed(transformed_features)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def _predict_transformed(self, transformed_features: np.ndarray) -> np.ndarray:
+        with PREDICT_SECONDS.time():
+            predictions = self.trained_model_object.predict(transformed_features)
+        PREDICTED_ROWS.inc(len(predictions))
+        return predictions
+
+    def predict_records(self, records: List[Union[dict, Sequence]]) -> np.ndarray:
+        try:
+            with TRANSFORM_SECONDS.time():
+                transformed_features = self.compiled_preprocessor.transform_records(records)
+            return self._predict_transformed(transformed_features)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+
+def save_model_bundle(file_path: str, usvisa_model) -> None:
+    """
+    Write a USVisaModel as a bundle file
+    :param file_path: Bundle file to write
+    :param usvisa_model: USVisaModel with a fitted preprocessing object and estimator
+    """
+    logging.info("Entered the save_model_bundle method of model_bundle")
+    try:
+        compiled_preprocessor = getattr(usvisa_model, "compiled_preprocessor", None)
+        if compiled_preprocessor is None:
+            compiled_preprocessor = CompiledPreprocessor.compile(usvisa_model.preprocessing_object)
+            compiled_preprocessor.verify(usvisa_model.preprocessing_object)
+
+        estimator = bundle_estimator(usvisa_model.trained_model_object)
+
+        preprocessor_header, preprocessor_arrays = compiled_preprocessor.to_bundle()
+        estimator_header, estimator_arrays = estimator.to_bundle()
+
+        arrays = _prefixed("preprocessor", preprocessor_arrays)
+        arrays.update(_prefixed("estimator", estimator_arrays))
+        write_bundle(
+            file_path,
+            header={"preprocessor": preprocessor_header, "estimator": estimator_header},
+            arrays=arrays,
+        )
+        logging.info(
+            f"Saved {estimator.kind} model bundle of {os.path.getsize(file_path)} bytes to {file_path}"
+        )
+
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def load_model_bundle(source: Union[str, bytes, memoryview]) -> BundledUSVisaModel:
+    """
+    Map a bundle file written by save_model_bundle
+    :param source: Bundle file to load, or a buffer holding its content
+    :return: BundledUSVisaModel
+    """
+    logging.info("Entered the load_model_bundle method of model_bundle")
+    try:
+        header, arrays = read_bundle(source)
+
+        compiled_preprocessor = CompiledPreprocessor.from_bundle(
+            header["preprocessor"], _unprefixed("preprocessor", arrays)
+        )
+        estimator_header = header["estimator"]
+        estimator_class = _BUNDLED_ESTIMATORS.get(estimator_header["kind"])
+        if estimator_class is None:
+            raise Exception(f"Unknown bundled estimator {estimator_header['kind']}")
+        estimator = estimator_class.from_bundle(
+            estimator_header, _unprefixed("estimator", arrays)
+        )
+
+        logging.info("Exited the load_model_bundle method of model_bundle")
+        return BundledUSVisaModel(compiled_preprocessor, estimator)
+
+    except Exception as e:
+        raise USvisaException(e, sys) from e
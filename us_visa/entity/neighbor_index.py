@@ -0,0 +1,90 @@
+import sys
+import pickle
+from typing import Dict, Tuple, Union
+
+import numpy as np
+import sklearn
+from sklearn.neighbors import BallTree, KDTree
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+NEIGHBOR_INDEX_CLASSES = {"kd_tree": KDTree, "ball_tree": BallTree}
+
+
+def get_index_type(index: Union[KDTree, BallTree]) -> str:
+    for index_type, index_class in NEIGHBOR_INDEX_CLASSES.items():
+        if type(index) is index_class:
+            return index_type
+    raise Exception(f"{type(index).__name__} is not a supported neighbor index")
+
+
+def index_to_bundle(
+    index: Union[KDTree, BallTree], fit_X: np.ndarray, leaf_size: int
+) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """
+    Split the fitted state of a sklearn KDTree or BallTree into a json header and raw arrays.
+    The training matrix of the tree is not stored again when it is the bundled fit_X
+    :param index: Fitted neighbor index
+    :param fit_X: Training matrix already stored in the bundle
+    :param leaf_size: Leaf size the index was built with, used to rebuild it for another sklearn version
+    :return: header, arrays keyed by name
+    """
+    state_header = []
+    arrays = {}
+    for position, value in enumerate(index.__getstate__()):
+        name = str(position)
+        if position == 0 and np.array_equal(value, fit_X):
+            state_header.append({"fit_X": True})
+        elif isinstance(value, np.ndarray):
+            arrays[name] = value
+            state_header.append({"array": name})
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            state_header.append({"value": value})
+        else:
+            # the distance metric object, a few bytes
+            arrays[name] = np.frombuffer(pickle.dumps(value), dtype=np.uint8)
+            state_header.append({"pickle": name})
+
+    header = {
+        "index_type": get_index_type(index),
+        "leaf_size": leaf_size,
+        "sklearn_version": sklearn.__version__,
+        "state": state_header,
+    }
+    return header, arrays
+
+
+def index_from_bundle(
+    header: dict, arrays: Dict[str, np.ndarray], fit_X: np.ndarray
+) -> Union[KDTree, BallTree]:
+    """
+    Rebuild the neighbor index written by index_to_bundle on top of the mapped arrays, without copying them.
+    The state layout is private to sklearn, so an index written by another sklearn version is rebuilt from fit_X
+    """
+    try:
+        index_class = NEIGHBOR_INDEX_CLASSES[header["index_type"]]
+        if header["sklearn_version"] != sklearn.__version__:
+            logging.info(
+                f"Rebuilding {header['index_type']} index written by sklearn {header['sklearn_version']}"
+            )
+            return index_class(fit_X, leaf_size=header["leaf_size"])
+
+        state = []
+        for entry in header["state"]:
+            if "fit_X" in entry:
+                state.append(fit_X)
+            elif "array" in entry:
+                state.append(arrays[entry["array"]])
+            elif "pickle" in entry:
+                state.append(pickle.loads(arrays[entry["pickle"]].tobytes()))
+            else:
+                state.append(entry["value"])
+
+        index = index_class.__new__(index_class)
+        index.__setstate__(tuple(state))
+        return index
+
+    except Exception as e:
+        raise USvisaException(e, sys)
@@ -1,20 +1,220 @@
+import copy
+import itertools
 import logging
 import os
+import queue
+import re
+import atexit
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from from_root import from_root
 from datetime import datetime
 
+from us_visa.constants import (
+    LOG_BACKUP_COUNT,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_LOGGER_RATES,
+    LOG_SAMPLE_PATTERN,
+    LOG_SAMPLE_RATE,
+)
+
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 
 log_dir = "logs"
 
 logs_path = os.path.join(from_root(), log_dir, LOG_FILE)
 
-os.makedirs(log_dir, exist_ok=True)
+os.makedirs(os.path.dirname(logs_path), exist_ok=True)
+
+LOG_FORMAT = "[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s"
+
+_exception_formatter = logging.Formatter()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    This filter keeps one record out of every `rate` records of the same call site for high-frequency
+    messages, like the "Entered ... method" lines written on every prediction.
+    A record is sampled when its logger has a rate in logger_rates, or when its message matches pattern.
+    Warnings and errors are always kept, and the first record of every call site always passes.
+    """
+
+    def __init__(self, pattern: str, rate: int, logger_rates: dict) -> None:
+        super().__init__()
+        self.pattern = re.compile(pattern) if pattern else None
+        self.rate = max(int(rate), 1)
+        self.logger_rates = logger_rates
+        self._logger_rate_cache = {}
+        self._counters = {}
+
+    @staticmethod
+    def parse_logger_rates(logger_rates: str) -> dict:
+        """
+        :param logger_rates: "name=rate,name=rate"
+        """
+        rates = {}
+        for entry in filter(None, (part.strip() for part in logger_rates.split(","))):
+            name, rate = entry.split("=")
+            rates[name.strip()] = max(int(rate), 1)
+        return rates
+
+    def _logger_rate(self, name: str) -> int:
+        rate = self._logger_rate_cache.get(name)
+        if rate is None:
+            # the closest configured parent logger applies, like logger levels
+            rate = 1
+            parts = name.split(".")
+            for end in range(len(parts), 0, -1):
+                parent = ".".join(parts[:end])
+                if parent in self.logger_rates:
+                    rate = self.logger_rates[parent]
+                    break
+            self._logger_rate_cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self._logger_rate(record.name)
+        if (
+            rate == 1
+            and self.rate > 1
+            and self.pattern is not None
+            and isinstance(record.msg, str)
+            and self.pattern.search(record.msg)
+        ):
+            rate = self.rate
+        if rate == 1:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        # next() on itertools.count is atomic, so no lock is needed on this path
+        return next(counter) % rate == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting and file I/O to the listener thread.
+    When the queue is full records are dropped instead of blocking the caller,
+    and a warning with the number of dropped records is written once the queue drains.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported_drops = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the message with its arguments and render the traceback in the calling thread, like QueueHandler.
+        The arguments may change before the listener writes the record, and the traceback
+        would keep every frame of the failed call alive while the record waits in the queue
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # the file formatter appends exc_text when the record has no exc_info left
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self._unreported_drops:
+                self.queue.put_nowait(
+                    logging.makeLogRecord(
+                        {
+                            "name": __name__,
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": f"Dropped {self._unreported_drops} log records, the log queue was full",
+                        }
+                    )
+                )
+                self._unreported_drops = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported_drops += 1
 
 
-logging.basicConfig(
-    filename=logs_path,
-    format="[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s",
-    level=logging.DEBUG,
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # block until there is room, so the records queued before stop are all written
+        self.queue.put(self._sentinel)
+
+
+def _create_listener(file_handler: logging.Handler) -> QueueListener:
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler.queue = log_queue
+    queue_listener = DrainingQueueListener(
+        log_queue, file_handler, respect_handler_level=True
+    )
+    queue_listener.start()
+    return queue_listener
+
+
+def _hold_file_handler_before_fork() -> None:
+    # the listener thread must not be halfway through a write when the process forks,
+    # and what it wrote must not be flushed a second time by the child
+    file_handler.acquire()
+    file_handler.flush()
+
+
+def _release_file_handler_after_fork() -> None:
+    file_handler.release()
+
+
+def _restart_listener_after_fork() -> None:
+    """
+    A forked worker has no listener thread and may inherit the queue locked, it gets its own queue and listener.
+    The handler lock itself is reset in the child by the logging module
+    """
+    global listener
+    listener = _create_listener(file_handler)
+
+
+def stop_logging() -> None:
+    """
+    Write out the queued records and stop the listener thread
+    """
+    if listener._thread is not None:
+        listener.stop()
+
+
+file_handler = RotatingFileHandler(
+    logs_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True
+)
+file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+queue_handler.addFilter(
+    SamplingFilter(
+        pattern=LOG_SAMPLE_PATTERN,
+        rate=LOG_SAMPLE_RATE,
+        logger_rates=SamplingFilter.parse_logger_rates(LOG_SAMPLE_LOGGER_RATES),
+    )
 )
+
+listener = _create_listener(file_handler)
+
+root_logger = logging.getLogger()
+root_logger.setLevel(LOG_LEVEL)
+root_logger.addHandler(queue_handler)
+
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=_hold_file_handler_before_fork,
+        after_in_parent=_release_file_handler_after_fork,
+        after_in_child=_restart_listener_after_fork,
+    )
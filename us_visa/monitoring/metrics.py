@@ -0,0 +1,321 @@
+import math
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from us_visa.constants import METRICS_LATENCY_BUCKETS
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Timer:
+    """
+    Context manager observing the elapsed perf_counter time into a histogram child
+    """
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild") -> None:
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _InProgress:
+    __slots__ = ("_child",)
+
+    def __init__(self, child: "_GaugeChild") -> None:
+        self._child = child
+
+    def __enter__(self) -> None:
+        self._child.inc()
+
+    def __exit__(self, *exc_info) -> None:
+        self._child.dec()
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self, metric: "Counter") -> None:
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, label_names, label_values) -> List[str]:
+        return [f"{name}{_format_labels(label_names, label_values)} {_format_value(self.value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = float(value)
+
+    def track_inprogress(self) -> _InProgress:
+        return _InProgress(self)
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_upper_bounds", "_counts", "sum")
+
+    def __init__(self, metric: "Histogram") -> None:
+        self._lock = threading.Lock()
+        self._upper_bounds = metric.upper_bounds
+        # per bucket counts, made cumulative only when the metrics are scraped
+        self._counts = [0] * len(metric.upper_bounds)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def samples(self, name: str, label_names, label_values) -> List[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self.sum
+
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(self._upper_bounds, counts):
+            cumulative += count
+            le = 'le="' + _format_value(upper_bound) + '"'
+            lines.append(
+                f"{name}_bucket{_format_labels(label_names, label_values, le)} {cumulative}"
+            )
+        labels = _format_labels(label_names, label_values)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Metric:
+    """
+    A metric family: one child per combination of label values, created on first use.
+    A metric without labels forwards inc, observe, ... to its single child
+    """
+
+    type_name = ""
+    child_class = _CounterChild
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        registry: Optional["MetricsRegistry"] = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.label_names:
+            self._default = self.labels()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *label_values, **label_kwargs):
+        """
+        Child for the given label values, keep the returned child around on hot paths
+        """
+        if label_kwargs:
+            label_values = tuple(label_kwargs[name] for name in self.label_names)
+        key = tuple(str(value) for value in label_values)
+        if len(key) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self.child_class(self))
+        return child
+
+    def collect(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for label_values, child in list(self._children.items()):
+            lines.extend(child.samples(self.name, self.label_names, label_values))
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+    child_class = _CounterChild
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+    child_class = _GaugeChild
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def track_inprogress(self) -> _InProgress:
+        return self._default.track_inprogress()
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+    child_class = _HistogramChild
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = METRICS_LATENCY_BUCKETS,
+        registry: Optional["MetricsRegistry"] = None,
+    ) -> None:
+        self.upper_bounds = sorted(float(bucket) for bucket in buckets)
+        if self.upper_bounds[-1] != math.inf:
+            self.upper_bounds.append(math.inf)
+        super().__init__(name, documentation, label_names, registry)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+
+class MetricsRegistry:
+    """
+    This class holds the metrics of the process and renders them in the prometheus text exposition format.
+    Every uvicorn worker process has its own registry, so each worker is scraped as its own target
+    """
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def exposition(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+HTTP_REQUESTS = Counter(
+    "usvisa_http_requests_total",
+    "HTTP requests by method, route and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "usvisa_http_request_duration_seconds",
+    "HTTP request latency by method and route",
+    ["method", "route"],
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "usvisa_http_requests_in_flight",
+    "HTTP requests being served",
+)
+PREDICTION_ERRORS = Counter(
+    "usvisa_prediction_errors_total",
+    "Prediction requests that failed, by route",
+    ["route"],
+)
+PREDICTIONS_IN_FLIGHT = Gauge(
+    "usvisa_predictions_in_flight",
+    "Prediction calls waiting for or running on the predict pool",
+)
+PREDICTED_ROWS = Counter(
+    "usvisa_predicted_rows_total",
+    "Applications scored by the model",
+)
+PREDICTION_STAGE_SECONDS = Histogram(
+    "usvisa_prediction_stage_seconds",
+    "Latency of each prediction stage: form_parse, dataframe_build, transform, predict, s3_load",
+    ["stage"],
+)
+MODEL_LOADS = Counter(
+    "usvisa_model_loads_total",
+    "Model loads into the model cache by source (bundle or pickle) and result",
+    ["source", "result"],
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "usvisa_model_load_seconds",
+    "Duration of model loads into the model cache",
+    ["source"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+MICRO_BATCH_SIZE = Histogram(
+    "usvisa_micro_batch_size",
+    "Rows per batch scored by the prediction micro batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+MICRO_BATCH_QUEUE_WAIT_SECONDS = Histogram(
+    "usvisa_micro_batch_queue_wait_seconds",
+    "Time a prediction waits in the micro batcher queue before its batch is scored",
+)
+
+# pre-bound children, so the hot path skips the label lookup
+FORM_PARSE_SECONDS = PREDICTION_STAGE_SECONDS.labels(stage="form_parse")
+DATAFRAME_BUILD_SECONDS = PREDICTION_STAGE_SECONDS.labels(stage="dataframe_build")
+TRANSFORM_SECONDS = PREDICTION_STAGE_SECONDS.labels(stage="transform")
+PREDICT_SECONDS = PREDICTION_STAGE_SECONDS.labels(stage="predict")
+S3_LOAD_SECONDS = PREDICTION_STAGE_SECONDS.labels(stage="s3_load")
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import platform
+import functools
+import threading
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+from us_visa.entity.config_entity import TrainingProfileConfig
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+_MB = 1024 * 1024
+
+
+def get_rss_mb() -> Optional[float]:
+    """
+    Current resident set size of the process, None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / _MB
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_max_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of the whole process so far, not of the running stage: every stage after
+    the largest one sees the same value, see rss_start_mb and rss_end_mb of a record for the stage itself
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return max_rss / _MB if sys.platform == "darwin" else max_rss / 1024
+
+
+def count_rows(value: Any) -> Optional[int]:
+    """
+    Rows of a dataframe or array, or of the first element of a tuple of them like fit_resample returns
+    """
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    shape = getattr(value, "shape", None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+class ProfileBlock:
+    """
+    One timed block of a training run. Set rows_in, rows_out or extra inside the block to record them
+    """
+
+    def __init__(
+        self,
+        profiler: Optional["TrainingProfiler"],
+        name: str,
+        rows_in: Optional[int] = None,
+    ) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.extra: dict = {}
+        self.traced_peak = 0
+
+    def __enter__(self) -> "ProfileBlock":
+        if self.profiler is not None:
+            self.profiler._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self.profiler is not None:
+            self.profiler._exit(self, failed=exc_type is not None)
+
+
+class TrainingProfiler:
+    """
+    This class records wall time, cpu time, memory and row counts of the stages of one training run
+    and writes them as a json profile into the artifact directory.
+    The profiler of the running pipeline is kept at class level, so profiled functions deep inside
+    the components find it without it being passed around; outside a run they only call through.
+    """
+
+    active: Optional["TrainingProfiler"] = None
+
+    def __init__(self, training_profile_config: TrainingProfileConfig = TrainingProfileConfig()) -> None:
+        try:
+            self.training_profile_config = training_profile_config
+            self.records: List[dict] = []
+            self._local = threading.local()
+            self._started_tracemalloc = False
+            self._start_wall: Optional[float] = None
+            self._start_cpu: Optional[float] = None
+            self.started_at: Optional[str] = None
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def _stack(self) -> List[ProfileBlock]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, block: ProfileBlock) -> None:
+        stack = self._stack()
+        block.parent = stack[-1].name if stack else None
+        block.depth = len(stack)
+        block.rss_start_mb = get_rss_mb()
+        if tracemalloc.is_tracing():
+            block.traced_start, peak = tracemalloc.get_traced_memory()
+            # the peak is global: the enclosing block keeps the peak it reached so far before it is reset,
+            # and gets the peaks of its children back from them in _exit
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, peak)
+            tracemalloc.reset_peak()
+        stack.append(block)
+        block.start_wall = time.perf_counter()
+        block.start_cpu = time.process_time()
+
+    def _exit(self, block: ProfileBlock, failed: bool) -> None:
+        wall_seconds = time.perf_counter() - block.start_wall
+        cpu_seconds = time.process_time() - block.start_cpu
+
+        stack = self._stack()
+        stack.pop()
+
+        traced_peak_mb = None
+        if tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            block.traced_peak = max(block.traced_peak, peak)
+            traced_peak_mb = (block.traced_peak - block.traced_start) / _MB
+            if stack:
+                stack[-1].traced_peak = max(stack[-1].traced_peak, block.traced_peak)
+
+        rss_end_mb = get_rss_mb()
+        record = {
+            "name": block.name,
+            "parent": block.parent,
+            "depth": block.depth,
+            "status": "failed" if failed else "completed",
+            "start_offset_seconds": round(block.start_wall - self._start_wall, 6),
+            "wall_seconds": round(wall_seconds, 6),
+            "cpu_seconds": round(cpu_seconds, 6),
+            "rss_start_mb": block.rss_start_mb,
+            "rss_end_mb": rss_end_mb,
+            "rss_delta_mb": (
+                rss_end_mb - block.rss_start_mb
+                if rss_end_mb is not None and block.rss_start_mb is not None
+                else None
+            ),
+            "process_max_rss_mb": get_max_rss_mb(),
+            "tracemalloc_peak_mb": traced_peak_mb,
+            "rows_in": block.rows_in,
+            "rows_out": block.rows_out,
+        }
+        if block.extra:
+            record["extra"] = block.extra
+        self.records.append(record)
+
+        logging.info(
+            f"Profiled {block.name}: {wall_seconds:.3f}s wall, {cpu_seconds:.3f}s cpu, "
+            f"rows {block.rows_in} -> {block.rows_out}"
+        )
+
+    def __enter__(self) -> "TrainingProfiler":
+        if TrainingProfiler.active is not None:
+            raise Exception("A training profiler is already active")
+
+        if self.training_profile_config.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+        self.started_at = datetime.now().isoformat()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        TrainingProfiler.active = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        TrainingProfiler.active = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        try:
+            self.write(status="failed" if exc_type is not None else "completed")
+        except Exception as e:
+            logging.info(f"Training profile not written: {e}")
+
+    def write(self, status: str) -> str:
+        """
+        Write the profile of the run as json
+        :return: Path of the profile file
+        """
+        profile = {
+            "started_at": self.started_at,
+            "status": status,
+            "wall_seconds": round(time.perf_counter() - self._start_wall, 6),
+            "cpu_seconds": round(time.process_time() - self._start_cpu, 6),
+            "process_max_rss_mb": get_max_rss_mb(),
+            "trace_memory": self.training_profile_config.trace_memory,
+            "python_version": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "records": self.records,
+        }
+
+        file_path = self.training_profile_config.profile_file_path
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as profile_file:
+            json.dump(profile, profile_file, indent=2)
+
+        logging.info(f"Training profile written to {file_path}")
+        return file_path
+
+
+def profile_block(name: str, rows_in: Optional[int] = None) -> ProfileBlock:
+    """
+    Context manager recording a block into the active training profile, a no-op when no run is profiled
+    """
+    return ProfileBlock(TrainingProfiler.active, name, rows_in=rows_in)
+
+
+def profiled(name: Optional[str] = None) -> Callable:
+    """
+    Decorator recording every call into the active training profile.
+    Input rows are taken from the first positional argument with a shape, output rows from the return value
+    :param name: Name of the record, the qualified function name by default
+    """
+
+    def decorator(func: Callable) -> Callable:
+        block_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if TrainingProfiler.active is None:
+                return func(*args, **kwargs)
+
+            rows_in = next(
+                (rows for rows in map(count_rows, list(args) + list(kwargs.values())) if rows is not None),
+                None,
+            )
+            with profile_block(block_name, rows_in=rows_in) as block:
+                result = func(*args, **kwargs)
+                block.rows_out = count_rows(result)
+            return result
+
+        return wrapper
+
+    return decorator
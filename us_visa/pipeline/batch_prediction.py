@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import dataclasses
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import pandas as pd
+from pandas import DataFrame
+
+from us_visa.constants import CURRENT_YEAR, MODEL_BUNDLE_FILE_EXTENSION, TARGET_COLUMN
+from us_visa.entity.config_entity import BatchPredictionConfig
+from us_visa.entity.estimator import TargetValueMapping, USVisaModel
+from us_visa.entity.model_bundle import load_model_bundle
+from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaEstimator
+from us_visa.utils.main_utils import load_object
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+# model of the current worker process, loaded once by init_worker
+_worker_model: Optional[USVisaModel] = None
+
+
+def init_worker(batch_prediction_config: BatchPredictionConfig) -> None:
+    global _worker_model
+    local_model_path = batch_prediction_config.local_model_path
+    if local_model_path.endswith(MODEL_BUNDLE_FILE_EXTENSION):
+        # every worker maps the same bundle file, so the model pages are shared
+        _worker_model = load_model_bundle(local_model_path)
+    else:
+        _worker_model = load_object(local_model_path)
+
+    if batch_prediction_config.compile_preprocessor:
+        _worker_model.compile_preprocessor()
+
+
+def score_chunk(chunk: DataFrame, id_column: Optional[str]) -> DataFrame:
+    """
+    Derive company_age like DataTransformation does and predict the case_status of every row of the chunk
+    """
+    input_features = chunk.drop(columns=[TARGET_COLUMN], errors="ignore")
+    input_features["company_age"] = CURRENT_YEAR - input_features["yr_of_estab"]
+
+    predictions = _worker_model.predict(dataframe=input_features)
+
+    reverse_mapping = TargetValueMapping().reverse_mapping()
+    result = DataFrame(
+        {f"predicted_{TARGET_COLUMN}": [reverse_mapping[int(p)] for p in predictions]}
+    )
+    if id_column is not None:
+        result.insert(0, id_column, chunk[id_column].to_numpy())
+
+    return result
+
+
+class USvisaBatchPredictor:
+    """
+    This class scores large csv files in the Visadataset.csv layout.
+    The file is read in fixed size chunks that are scored in parallel by a pool of worker processes,
+    each loading the model from one local file, and the predictions are written in input order.
+    A model of the bucket is downloaded once by the parent process, not once per worker.
+    At most max_pending_chunks chunks are in flight, so memory does not grow with the file size.
+    """
+
+    def __init__(
+        self, batch_prediction_config: BatchPredictionConfig = BatchPredictionConfig()
+    ) -> None:
+        try:
+            self.batch_prediction_config = batch_prediction_config
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def predict_file(self, input_file_path: str, output_file_path: str) -> int:
+        """
+        :param input_file_path: csv file to score
+        :param output_file_path: csv file receiving the id column and the predicted case_status
+        :return: Number of scored rows
+        """
+        logging.info("Entered predict_file method of USvisaBatchPredictor class")
+        try:
+            config = self.batch_prediction_config
+
+            dir_path = os.path.dirname(output_file_path)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
+
+            start = time.perf_counter()
+
+            with tempfile.TemporaryDirectory(prefix="usvisa-batch-model-") as model_dir:
+                if config.local_model_path is None:
+                    config = dataclasses.replace(
+                        config,
+                        local_model_path=USvisaEstimator(
+                            bucket_name=config.model_bucket_name,
+                            model_path=config.model_file_path,
+                            use_bundle=config.use_model_bundle,
+                        ).download_model(model_dir),
+                    )
+                    logging.info(f"Downloaded model to {config.local_model_path} for the workers")
+
+                n_rows = self._score_file(config, input_file_path, output_file_path)
+
+            duration = time.perf_counter() - start
+            logging.info(
+                f"Scored {n_rows} rows of {input_file_path} in {duration:.1f} seconds into {output_file_path}"
+            )
+            return n_rows
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    @staticmethod
+    def _score_file(config: BatchPredictionConfig, input_file_path: str, output_file_path: str) -> int:
+        """
+        Score the file in a pool of workers that load the model from config.local_model_path
+        :return: Number of scored rows
+        """
+        id_column = config.id_column
+        n_rows = 0
+        pending = deque()
+
+        with ProcessPoolExecutor(
+            max_workers=config.n_workers,
+            initializer=init_worker,
+            initargs=(config,),
+        ) as pool, open(output_file_path, "w", newline="") as output_file:
+
+            def write_next() -> int:
+                result = pending.popleft().result()
+                result.to_csv(
+                    output_file, index=False, header=output_file.tell() == 0
+                )
+                return len(result)
+
+            for chunk in pd.read_csv(input_file_path, chunksize=config.chunk_size):
+                chunk_id_column = id_column if id_column in chunk.columns else None
+                pending.append(pool.submit(score_chunk, chunk, chunk_id_column))
+
+                while len(pending) >= config.max_pending_chunks:
+                    n_rows += write_next()
+
+            while pending:
+                n_rows += write_next()
+
+        return n_rows
+
+
+def main(argv=None) -> None:
+    defaults = BatchPredictionConfig()
+    parser = argparse.ArgumentParser(
+        description="Score a csv file of us visa applications in the Visadataset.csv layout"
+    )
+    parser.add_argument("input_file_path", help="csv file to score")
+    parser.add_argument("output_file_path", help="csv file to write the predictions to")
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+    parser.add_argument("--workers", type=int, default=defaults.n_workers)
+    parser.add_argument(
+        "--model-path",
+        default=None,
+        help="Local model.pkl or model.bundle to use instead of the model in the s3 bucket",
+    )
+    parser.add_argument("--bucket-name", default=defaults.model_bucket_name)
+    parser.add_argument("--s3-model-path", default=defaults.model_file_path)
+    parser.add_argument(
+        "--compile-preprocessor",
+        action="store_true",
+        help="Use the compiled numpy preprocessor in the workers",
+    )
+    args = parser.parse_args(argv)
+
+    batch_prediction_config = BatchPredictionConfig(
+        chunk_size=args.chunk_size,
+        n_workers=args.workers,
+        max_pending_chunks=2 * args.workers,
+        model_bucket_name=args.bucket_name,
+        model_file_path=args.s3_model_path,
+        local_model_path=args.model_path,
+        compile_preprocessor=args.compile_preprocessor,
+    )
+
+    n_rows = USvisaBatchPredictor(batch_prediction_config).predict_file(
+        input_file_path=args.input_file_path,
+        output_file_path=args.output_file_path,
+    )
+    logging.info(f"Scored {n_rows} rows into {args.output_file_path}")
+
+
+if __name__ == "__main__":
+    main()
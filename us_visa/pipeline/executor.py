@@ -0,0 +1,85 @@
+import sys
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from us_visa.entity.config_entity import USvisaExecutorConfig
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class USvisaExecutor:
+    """
+    This class runs blocking work of the api outside the event loop.
+    Model predictions go to a bounded pool sized to the cores, storage calls go to a separate pool,
+    so a slow s3 download never takes a slot from the predictions and the other way around.
+    """
+
+    predict_pool: Optional[ThreadPoolExecutor] = None
+    io_pool: Optional[ThreadPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
+    def __init__(
+        self, executor_config: USvisaExecutorConfig = USvisaExecutorConfig()
+    ) -> None:
+        try:
+            self.executor_config = executor_config
+            self._get_predict_pool()
+            self._get_io_pool()
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def _get_predict_pool(self) -> ThreadPoolExecutor:
+        # the pools are created again after a shutdown, e.g. for a request that comes in during the app teardown,
+        # instead of running the work on the default executor of the event loop
+        with USvisaExecutor._pool_lock:
+            if USvisaExecutor.predict_pool is None:
+                USvisaExecutor.predict_pool = ThreadPoolExecutor(
+                    max_workers=self.executor_config.predict_workers,
+                    thread_name_prefix="usvisa-predict",
+                )
+                logging.info(
+                    f"Created predict pool with {self.executor_config.predict_workers} workers"
+                )
+            return USvisaExecutor.predict_pool
+
+    def _get_io_pool(self) -> ThreadPoolExecutor:
+        with USvisaExecutor._pool_lock:
+            if USvisaExecutor.io_pool is None:
+                USvisaExecutor.io_pool = ThreadPoolExecutor(
+                    max_workers=self.executor_config.io_workers,
+                    thread_name_prefix="usvisa-io",
+                )
+                logging.info(f"Created io pool with {self.executor_config.io_workers} workers")
+            return USvisaExecutor.io_pool
+
+    @staticmethod
+    async def _run(pool: ThreadPoolExecutor, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+    async def run_predict(self, func: Callable, *args, **kwargs):
+        """
+        Run CPU bound work such as preprocessing and model predict in the predict pool
+        """
+        return await self._run(self._get_predict_pool(), func, *args, **kwargs)
+
+    async def run_io(self, func: Callable, *args, **kwargs):
+        """
+        Run blocking storage work such as s3 downloads and unpickling in the io pool
+        """
+        return await self._run(self._get_io_pool(), func, *args, **kwargs)
+
+    @staticmethod
+    def shutdown() -> None:
+        with USvisaExecutor._pool_lock:
+            pools = (USvisaExecutor.predict_pool, USvisaExecutor.io_pool)
+            USvisaExecutor.predict_pool = None
+            USvisaExecutor.io_pool = None
+
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
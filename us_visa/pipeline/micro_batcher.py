@@ -0,0 +1,174 @@
+import sys
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from us_visa.entity.config_entity import PredictionMicroBatcherConfig
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+from us_visa.monitoring.metrics import MICRO_BATCH_QUEUE_WAIT_SECONDS, MICRO_BATCH_SIZE
+
+# record, future of its caller and loop time it was queued at
+QueuedRecord = Tuple[dict, asyncio.Future, float]
+
+
+class PredictionMicroBatcher:
+    """
+    This class collects single predictions that arrive close together and scores them in one call.
+    Each caller awaits its own future and gets back only its own prediction.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[dict]], Awaitable[Sequence]],
+        micro_batcher_config: PredictionMicroBatcherConfig = PredictionMicroBatcherConfig(),
+    ) -> None:
+        """
+        :param predict_fn: Coroutine function scoring a list of records, awaited once per batch
+        :param micro_batcher_config: Window and maximum size of a batch
+        """
+        try:
+            self.predict_fn = predict_fn
+            self.window_seconds = micro_batcher_config.window_ms / 1000
+            self.max_batch_size = micro_batcher_config.max_batch_size
+            self.micro_batcher_config = micro_batcher_config
+
+            self._queue: Optional[asyncio.Queue] = None
+            self._worker: Optional[asyncio.Task] = None
+
+            self.batch_count = 0
+            self.row_count = 0
+            self.last_batch_size = 0
+            self.max_achieved_batch_size = 0
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue()
+
+            # records queued for a worker that stopped are moved to the new worker, or failed when their
+            # caller awaits them on another event loop, instead of being left pending forever
+            while self._queue is not None and not self._queue.empty():
+                record, future, queued_at = self._queue.get_nowait()
+                if future.done():
+                    continue
+                if future.get_loop() is loop:
+                    queue.put_nowait((record, future, queued_at))
+                else:
+                    self._fail([(record, future, queued_at)], RuntimeError("Prediction micro batcher worker stopped"))
+
+            self._queue = queue
+            self._worker = loop.create_task(self._run())
+
+    @staticmethod
+    def _fail(batch: List[QueuedRecord], error: BaseException) -> None:
+        for _, future, _ in batch:
+            if future.done():
+                continue
+            try:
+                future.set_exception(error)
+            except RuntimeError:
+                # the event loop of the future is closed, nobody awaits it anymore
+                pass
+
+    async def predict(self, record: dict):
+        """
+        :param record: One application keyed by the USvisaData fields
+        :return: Prediction of the model for this record
+        """
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue.put((record, future, loop.time()))
+        return await future
+
+    async def _collect_batch(self, batch: List[QueuedRecord]) -> None:
+        """
+        Fill batch with the queued records, in place so a worker that is cancelled meanwhile can still fail them
+        """
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.window_seconds
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _predict_bisect(self, records: List[dict]) -> list:
+        """
+        Score the records, splitting them in halves while a part fails, e.g. on an unknown category,
+        so only the callers of the bad records get an error
+        :return: Prediction or exception of every record
+        """
+        try:
+            result = await self.predict_fn(records)
+            if len(result) != len(records):
+                raise ValueError(f"Micro batch of {len(records)} rows got {len(result)} predictions")
+            return list(result)
+        except Exception as e:
+            if len(records) == 1:
+                return [e]
+            logging.info(f"Micro batch of {len(records)} rows failed, splitting it: {e}")
+
+        middle = len(records) // 2
+        return await self._predict_bisect(records[:middle]) + await self._predict_bisect(records[middle:])
+
+    async def _score_batch(self, batch: List[QueuedRecord]) -> None:
+        dispatched_at = asyncio.get_running_loop().time()
+        MICRO_BATCH_SIZE.observe(len(batch))
+        for _, _, queued_at in batch:
+            MICRO_BATCH_QUEUE_WAIT_SECONDS.observe(dispatched_at - queued_at)
+
+        records = [record for record, _, _ in batch]
+        result = await self._predict_bisect(records)
+
+        self.batch_count += 1
+        self.row_count += len(batch)
+        self.last_batch_size = len(batch)
+        self.max_achieved_batch_size = max(self.max_achieved_batch_size, len(batch))
+
+        for (_, future, _), value in zip(batch, result):
+            if future.done():
+                continue
+            if isinstance(value, Exception):
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+    async def _run(self) -> None:
+        batch: List[QueuedRecord] = []
+        try:
+            while True:
+                batch = []
+                await self._collect_batch(batch)
+                await self._score_batch(batch)
+        finally:
+            # the worker only stops when it is cancelled, its callers must not wait for it
+            self._fail(batch, RuntimeError("Prediction micro batcher worker stopped"))
+
+    def stats(self) -> dict:
+        """
+        Settings of the batcher and the batch sizes it achieved so far
+        """
+        return {
+            "window_ms": self.micro_batcher_config.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "batch_count": self.batch_count,
+            "row_count": self.row_count,
+            "last_batch_size": self.last_batch_size,
+            "max_achieved_batch_size": self.max_achieved_batch_size,
+            "mean_batch_size": (
+                self.row_count / self.batch_count if self.batch_count else 0.0
+            ),
+        }
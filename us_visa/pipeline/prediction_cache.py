@@ -0,0 +1,157 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+from us_visa.entity.config_entity import PredictionCacheConfig
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class PredictionCache:
+    """
+    This class keeps recent predictions in a bounded LRU cache keyed on the canonicalized application fields.
+    Entries expire after ttl_seconds and the whole cache is dropped when the model version changes.
+    """
+
+    key_columns = [
+        "continent",
+        "education_of_employee",
+        "has_job_experience",
+        "requires_job_training",
+        "no_of_employees",
+        "region_of_employment",
+        "prevailing_wage",
+        "unit_of_wage",
+        "full_time_position",
+        "company_age",
+    ]
+    numeric_columns = {"no_of_employees", "prevailing_wage", "company_age"}
+
+    # rough size of one OrderedDict slot with its key tuple, value and timestamp
+    entry_overhead_bytes = 200
+
+    def __init__(
+        self, prediction_cache_config: PredictionCacheConfig = PredictionCacheConfig()
+    ) -> None:
+        try:
+            self.max_entries = prediction_cache_config.max_entries
+            self.max_bytes = prediction_cache_config.max_bytes
+            self.ttl_seconds = prediction_cache_config.ttl_seconds
+
+            self._lock = threading.Lock()
+            self._entries: "OrderedDict[Hashable, Tuple[object, float, int]]" = OrderedDict()
+            self._model_version: Optional[Hashable] = None
+
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    @classmethod
+    def make_key(cls, record: dict) -> tuple:
+        """
+        Canonical key of an application: strings are stripped and numbers compare equal whether
+        they were sent as 10, 10.0 or "10"
+        """
+        key = []
+        for column in cls.key_columns:
+            value = record[column]
+            if column in cls.numeric_columns:
+                value = float(value)
+                if value.is_integer():
+                    value = int(value)
+            else:
+                value = str(value).strip()
+            key.append(value)
+        return tuple(key)
+
+    def _entry_size(self, key: tuple) -> int:
+        return self.entry_overhead_bytes + sum(sys.getsizeof(v) for v in key)
+
+    def _check_model_version(self, model_version: Hashable) -> None:
+        if self._model_version != model_version:
+            if self._entries:
+                logging.info(
+                    f"Model version changed from {self._model_version} to {model_version}, clearing prediction cache"
+                )
+                self.invalidations += 1
+            self._entries.clear()
+            self.current_bytes = 0
+            self._model_version = model_version
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def get_many(self, keys: Sequence[tuple], model_version: Hashable) -> List[Optional[tuple]]:
+        """
+        :return: For every key a one element tuple with the cached prediction, or None on a miss
+        """
+        now = time.monotonic()
+        results: List[Optional[tuple]] = []
+        with self._lock:
+            self._check_model_version(model_version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl_seconds > 0 and now - entry[1] > self.ttl_seconds:
+                    self._remove(key)
+                    self.expirations += 1
+                    entry = None
+
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    results.append((entry[0],))
+        return results
+
+    def put_many(self, keys: Sequence[tuple], values: Sequence, model_version: Hashable) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._check_model_version(model_version)
+            for key, value in zip(keys, values):
+                if key in self._entries:
+                    self._remove(key)
+
+                size = self._entry_size(key)
+                self._entries[key] = (value, now, size)
+                self.current_bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "model_version": self._model_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -1,9 +1,14 @@
 import sys
+import numpy as np
+from typing import List, Optional
 from pandas import DataFrame
 
-from us_visa.entity.config_entity import USvisaPredictorConfig
-from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaEstimator
+from us_visa.entity.config_entity import USvisaPredictorConfig, PredictionCacheConfig
+from us_visa.aws_cloud_storage.aws_s3_estimator import USvisaModelCache
+from us_visa.pipeline.prediction_cache import PredictionCache
+from us_visa.entity.estimator import TargetValueMapping
 
+from us_visa.monitoring.metrics import DATAFRAME_BUILD_SECONDS
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 
@@ -62,32 +67,166 @@ class USvisaData:
         except Exception as e:
             raise USvisaException(e, sys)
 
+    def get_us_visa_data_as_record(self) -> dict:
+        """
+        Same fields as get_us_visa_data_as_dict but with one value per field instead of a list
+        """
+        try:
+            return {
+                "continent": self.continent,
+                "education_of_employee": self.education_of_employee,
+                "has_job_experience": self.has_job_experience,
+                "requires_job_training": self.requires_job_training,
+                "no_of_employees": self.no_of_employees,
+                "region_of_employment": self.region_of_employment,
+                "prevailing_wage": self.prevailing_wage,
+                "unit_of_wage": self.unit_of_wage,
+                "full_time_position": self.full_time_position,
+                "company_age": self.company_age,
+            }
+        except Exception as e:
+            raise USvisaException(e, sys)
+
     def get_usvisa_input_data_frame(self) -> DataFrame:
         try:
-            usvisa_input_dict = self.get_us_visa_data_as_dict()
+            with DATAFRAME_BUILD_SECONDS.time():
+                usvisa_input_dict = self.get_us_visa_data_as_dict()
+
+                return DataFrame(usvisa_input_dict)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+
+class USvisaBatchData:
+    """
+    This class holds many usvisa applications and turns them into one columnar dataframe
+    """
+
+    columns = [
+        "continent",
+        "education_of_employee",
+        "has_job_experience",
+        "requires_job_training",
+        "no_of_employees",
+        "region_of_employment",
+        "prevailing_wage",
+        "unit_of_wage",
+        "full_time_position",
+        "company_age",
+    ]
+    numeric_columns = {"no_of_employees", "prevailing_wage", "company_age"}
+
+    def __init__(self, applications: List[dict]) -> None:
+        """
+        :param applications: list of dicts keyed by the USvisaData fields
+        """
+        try:
+            self.applications = applications
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    @classmethod
+    def validate_application(cls, application: dict) -> dict:
+        """
+        Check one application before it is scored with others: every field present, text fields as strings
+        and number fields as finite floats, so a bad row fails alone instead of failing its whole batch
+        :return: Application with only the model fields, numbers converted to float
+        """
+        validated = {}
+        for column in cls.columns:
+            if column not in application:
+                raise ValueError(f"Missing field {column}")
+            value = application[column]
+            if column in cls.numeric_columns:
+                if isinstance(value, bool):
+                    raise ValueError(f"Field {column} is not a number: {value!r}")
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Field {column} is not a number: {value!r}")
+                if not np.isfinite(value):
+                    raise ValueError(f"Field {column} is not a finite number: {value!r}")
+            elif not isinstance(value, str):
+                raise ValueError(f"Field {column} is not a string: {value!r}")
+            validated[column] = value
+        return validated
+
+    def get_usvisa_batch_data_as_dict(self) -> dict:
+        logging.info("Entered get_usvisa_batch_data_as_dict method of USvisaBatchData class")
+        try:
+            input_data = {
+                column: [application[column] for application in self.applications]
+                for column in self.columns
+            }
+
+            logging.info(
+                f"Exited get_usvisa_batch_data_as_dict method of USvisaBatchData class with {len(self.applications)} rows"
+            )
 
-            return DataFrame(usvisa_input_dict)
+            return input_data
+
+        except KeyError as e:
+            raise USvisaException(f"Missing field {e} in application", sys)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def get_usvisa_input_data_frame(self) -> DataFrame:
+        try:
+            with DATAFRAME_BUILD_SECONDS.time():
+                return DataFrame(self.get_usvisa_batch_data_as_dict(), columns=self.columns)
         except Exception as e:
             raise USvisaException(e, sys)
 
 
 class USvisaClassifier:
+    prediction_cache: Optional[PredictionCache] = None
+
     def __init__(
         self,
         prediction_pipeline_config: USvisaPredictorConfig = USvisaPredictorConfig(),
+        prediction_cache_config: PredictionCacheConfig = PredictionCacheConfig(),
     ) -> None:
         try:
+            if prediction_cache_config.enabled and USvisaClassifier.prediction_cache is None:
+                USvisaClassifier.prediction_cache = PredictionCache(
+                    prediction_cache_config=prediction_cache_config
+                )
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.model_cache = USvisaModelCache(
+                bucket_name=prediction_pipeline_config.model_bucket_name,
+                model_path=prediction_pipeline_config.model_file_path,
+                ttl_seconds=prediction_pipeline_config.model_cache_ttl_seconds,
+                compile_preprocessor=prediction_pipeline_config.compiled_preprocessor_enabled,
+            )
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def load_model(self):
+        """
+        Return the cached model, downloading it from s3 bucket only when the cache is empty or expired
+        """
+        try:
+            return self.model_cache.get_model()
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def reload_model(self) -> None:
+        try:
+            logging.info("Entered reload_model method of USvisaClassifier class")
+            self.model_cache.reload()
         except Exception as e:
             raise USvisaException(e, sys)
 
     def predict(self, dataframe) -> str:
+        """
+        Predict every row of the dataframe, through the prediction cache when it is enabled
+        """
         try:
             logging.info("Entered predict method of USvisaClassifier class")
-            model = USvisaEstimator(
-                self.prediction_pipeline_config.model_bucket_name,
-                self.prediction_pipeline_config.model_file_path,
-            )
+            if USvisaClassifier.prediction_cache is not None:
+                return self.predict_records(dataframe.to_dict("records"))
+
+            model = self.model_cache.get_model()
 
             result = model.predict(dataframe=dataframe)
 
@@ -95,3 +234,52 @@ class USvisaClassifier:
 
         except Exception as e:
             raise USvisaException(e, sys)
+
+    def predict_records(self, records: List[dict]):
+        """
+        Predict applications given as dicts keyed by the USvisaData fields
+        """
+        try:
+            logging.info("Entered predict_records method of USvisaClassifier class")
+            prediction_cache = USvisaClassifier.prediction_cache
+            if prediction_cache is None:
+                return self.model_cache.get_model().predict_records(records)
+
+            # the version is the one of this model, a reload in between can not mix two models under one version
+            model, model_version = self.model_cache.get_model_and_version()
+            keys = [PredictionCache.make_key(record) for record in records]
+            cached = prediction_cache.get_many(keys, model_version=model_version)
+
+            missed = [i for i, hit in enumerate(cached) if hit is None]
+            if not missed:
+                return np.array([hit[0] for hit in cached])
+
+            predicted = model.predict_records([records[i] for i in missed])
+            prediction_cache.put_many(
+                [keys[i] for i in missed], predicted, model_version=model_version
+            )
+
+            result = np.empty(len(records), dtype=np.asarray(predicted).dtype)
+            result[missed] = predicted
+            for i, hit in enumerate(cached):
+                if hit is not None:
+                    result[i] = hit[0]
+            return result
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def predict_labels(self, dataframe) -> List[str]:
+        """
+        Predict every row of the dataframe in one call and map the values to case_status labels
+        """
+        try:
+            logging.info("Entered predict_labels method of USvisaClassifier class")
+            result = self.predict(dataframe=dataframe)
+
+            reverse_mapping = TargetValueMapping().reverse_mapping()
+
+            return [reverse_mapping[int(value)] for value in result]
+
+        except Exception as e:
+            raise USvisaException(e, sys)
@@ -0,0 +1,153 @@
+import sys
+import json
+import zlib
+from typing import AsyncIterator, Awaitable, Callable, List, Sequence
+
+from us_visa.entity.config_entity import PredictionStreamConfig
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.pipeline.prediction_pipeline import USvisaBatchData
+
+from us_visa.monitoring.metrics import PREDICTION_ERRORS
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+STREAM_ERRORS = PREDICTION_ERRORS.labels(route="/predict/stream")
+
+
+class NDJSONStreamPredictor:
+    """
+    This class scores a newline delimited json upload while it is still arriving.
+    The body is decompressed and split into lines incrementally, rows are scored chunk by chunk
+    and every scored chunk is yielded back as ndjson, so neither the request nor the response is buffered.
+    Rows are validated before they are scored, a chunk that still fails is split in halves until the failing rows are found
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[dict]], Awaitable[Sequence]],
+        prediction_stream_config: PredictionStreamConfig = PredictionStreamConfig(),
+    ) -> None:
+        """
+        :param predict_fn: Coroutine function scoring a list of records
+        :param prediction_stream_config: Rows per scored chunk and size limits of the stream
+        """
+        try:
+            self.predict_fn = predict_fn
+            self.prediction_stream_config = prediction_stream_config
+            self._reverse_mapping = TargetValueMapping().reverse_mapping()
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    async def _decompressed(
+        self, body: AsyncIterator[bytes], gzipped: bool
+    ) -> AsyncIterator[bytes]:
+        if not gzipped:
+            async for data in body:
+                yield data
+            return
+
+        max_length = self.prediction_stream_config.max_decompressed_chunk_bytes
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        async for data in body:
+            while data:
+                yield decompressor.decompress(data, max_length)
+                data = decompressor.unconsumed_tail
+                if decompressor.eof:
+                    # concatenated gzip members, as written by gzip for appended files
+                    data = decompressor.unused_data + data
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield decompressor.flush()
+
+    async def _lines(self, body: AsyncIterator[bytes], gzipped: bool) -> AsyncIterator[bytes]:
+        max_line_bytes = self.prediction_stream_config.max_line_bytes
+        tail = b""
+        async for data in self._decompressed(body, gzipped):
+            lines = (tail + data).split(b"\n")
+            tail = lines.pop()
+            # complete lines of one decompressed block are checked too, not only the unfinished tail
+            for line in lines:
+                if len(line) > max_line_bytes:
+                    raise Exception(f"Line longer than {max_line_bytes} bytes in stream")
+                yield line
+            if len(tail) > max_line_bytes:
+                raise Exception(f"Line longer than {max_line_bytes} bytes in stream")
+        yield tail
+
+    async def _predict_bisect(self, records: List[dict]) -> list:
+        """
+        Score the records, splitting them in halves while a part fails, e.g. on an unknown category.
+        A few bad rows cost a few calls per bad row instead of one call per row of the chunk
+        :return: Prediction or exception of every record
+        """
+        try:
+            return list(await self.predict_fn(records))
+        except Exception as e:
+            if len(records) == 1:
+                return [e]
+            logging.info(f"Stream chunk of {len(records)} rows failed, splitting it: {e}")
+
+        middle = len(records) // 2
+        return await self._predict_bisect(records[:middle]) + await self._predict_bisect(records[middle:])
+
+    async def _score(self, items: List[tuple]) -> bytes:
+        records = [item for _, item in items if isinstance(item, dict)]
+        values = await self._predict_bisect(records) if records else []
+
+        values = iter(values)
+        out = []
+        for line_number, item in items:
+            if not isinstance(item, dict):
+                result = {"line": line_number, "error": item}
+            else:
+                value = next(values)
+                if isinstance(value, Exception):
+                    result = {"line": line_number, "error": str(value)}
+                else:
+                    result = {
+                        "line": line_number,
+                        "case_status": self._reverse_mapping[int(value)],
+                    }
+            if "error" in result:
+                STREAM_ERRORS.inc()
+            out.append(json.dumps(result))
+        return ("\n".join(out) + "\n").encode()
+
+    async def predict_stream(
+        self, body: AsyncIterator[bytes], gzipped: bool = False
+    ) -> AsyncIterator[bytes]:
+        """
+        :param body: Request body chunks, one json application per line
+        :param gzipped: Whether the body is gzip compressed
+        :return: ndjson results with the line number of each application, in input order
+        """
+        chunk_rows = self.prediction_stream_config.chunk_rows
+        items: List[tuple] = []
+        line_number = 0
+        try:
+            async for line in self._lines(body, gzipped):
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("line is not a json object")
+                except ValueError as e:
+                    items.append((line_number, f"Invalid json: {e}"))
+                else:
+                    try:
+                        items.append((line_number, USvisaBatchData.validate_application(record)))
+                    except ValueError as e:
+                        items.append((line_number, f"Invalid application: {e}"))
+
+                if len(items) >= chunk_rows:
+                    yield await self._score(items)
+                    items = []
+
+            if items:
+                yield await self._score(items)
+
+        except Exception as e:
+            logging.info(f"Prediction stream stopped at line {line_number}: {e}")
+            yield (json.dumps({"line": line_number, "error": str(e)}) + "\n").encode()
@@ -0,0 +1,309 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import tempfile
+import threading
+import multiprocessing
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+from us_visa.constants import TRAINING_JOB_STAGES
+from us_visa.entity.config_entity import TrainingJobConfig
+from us_visa.pipeline.training_pipeline import TrainingPipeline
+from us_visa.utils.main_utils import file_lock
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    status: str = "queued"
+    stages: Dict[str, str] = field(
+        default_factory=lambda: {stage: "pending" for stage in TRAINING_JOB_STAGES}
+    )
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    pid: Optional[int] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def is_process_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class TrainingJobStore:
+    """
+    This class keeps every training job as a json file of job_dir, next to an active marker holding the id
+    of the job that was started last. The api workers and the training processes all read and write it,
+    every read-modify-write of a job holds the flock of job_dir/jobs.lock
+    """
+
+    def __init__(self, job_dir: str) -> None:
+        """
+        :param job_dir: Directory of the job files, shared by the api workers
+        """
+        self.job_dir = job_dir
+        self.lock_file_path = os.path.join(job_dir, "jobs.lock")
+        self.active_file_path = os.path.join(job_dir, "active")
+
+    def lock(self):
+        return file_lock(self.lock_file_path)
+
+    def get_job_file_path(self, job_id: str) -> str:
+        # the id comes from the request path, it must not point outside of job_dir
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            raise Exception(f"Invalid training job id {job_id}")
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _write_file(self, file_path: str, content: str) -> None:
+        os.makedirs(self.job_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.job_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as tmp_file:
+                tmp_file.write(content)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def read(self, job_id: str) -> Optional[TrainingJob]:
+        try:
+            with open(self.get_job_file_path(job_id)) as job_file:
+                return TrainingJob(**json.load(job_file))
+        except FileNotFoundError:
+            return None
+
+    def write(self, job: TrainingJob) -> None:
+        self._write_file(self.get_job_file_path(job.job_id), json.dumps(job.to_dict()))
+
+    def update(self, job_id: str, update: Callable[[TrainingJob], None]) -> Optional[TrainingJob]:
+        """
+        Apply update to the stored job under the lock
+        :return: The updated job, None when there is no such job
+        """
+        with self.lock():
+            job = self.read(job_id)
+            if job is not None:
+                update(job)
+                self.write(job)
+            return job
+
+    def read_active_job_id(self) -> Optional[str]:
+        try:
+            with open(self.active_file_path) as active_file:
+                return active_file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def write_active_job_id(self, job_id: str) -> None:
+        self._write_file(self.active_file_path, job_id)
+
+    def list_job_ids(self) -> List[str]:
+        """
+        Ids of the stored jobs, oldest first
+        """
+        if not os.path.isdir(self.job_dir):
+            return []
+        job_files = [
+            file_name
+            for file_name in os.listdir(self.job_dir)
+            if file_name.endswith(".json") and JOB_ID_PATTERN.fullmatch(file_name[:-5])
+        ]
+        job_files.sort(key=lambda file_name: os.path.getmtime(os.path.join(self.job_dir, file_name)))
+        return [file_name[:-5] for file_name in job_files]
+
+    def trim(self, history_size: int, keep: str) -> None:
+        job_ids = [job_id for job_id in self.list_job_ids() if job_id != keep]
+        for job_id in job_ids[: max(len(job_ids) - history_size + 1, 0)]:
+            os.remove(self.get_job_file_path(job_id))
+
+
+def _set_stage(stage: str, state: str) -> Callable[[TrainingJob], None]:
+    def update(job: TrainingJob) -> None:
+        job.stages[stage] = state
+
+    return update
+
+
+def _set_status(status: str, error: Optional[str] = None) -> Callable[[TrainingJob], None]:
+    def update(job: TrainingJob) -> None:
+        job.status = status
+        if status == "running":
+            job.started_at = time.time()
+        else:
+            job.error = error
+            job.finished_at = time.time()
+
+    return update
+
+
+def run_training_job(job_id: str, job_dir: str) -> None:
+    """
+    Entry point of the training worker process, writes the progress of the pipeline to the job file
+    """
+    job_store = TrainingJobStore(job_dir)
+    try:
+        job_store.update(job_id, _set_status("running"))
+        TrainingPipeline(
+            progress_callback=lambda stage, state: job_store.update(job_id, _set_stage(stage, state))
+        ).run_pipeline()
+        job_store.update(job_id, _set_status("completed"))
+    except Exception as e:
+        job_store.update(job_id, _set_status("failed", str(e)))
+
+
+class TrainingJobManager:
+    """
+    This class runs the training pipeline in a separate worker process and keeps track of the jobs.
+    Only one job runs at a time on the host: the jobs are files of the job directory shared by all api workers,
+    so submitting from any worker while a job is active returns the active job and every worker can report on it.
+    """
+
+    def __init__(
+        self,
+        on_completed=None,
+        training_job_config: TrainingJobConfig = TrainingJobConfig(),
+        run_job: Callable[[str, str], None] = run_training_job,
+    ) -> None:
+        """
+        :param on_completed: Called in the api process that started the job after it completed successfully
+        :param training_job_config: Job directory, history size and shutdown timeout
+        :param run_job: Entry point of the training process, called with the job id and the job directory
+        """
+        self.on_completed = on_completed
+        self.training_job_config = training_job_config
+        self.run_job = run_job
+        self.job_store = TrainingJobStore(training_job_config.job_dir)
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._processes: Dict[str, multiprocessing.Process] = {}
+
+    def _get_active_job(self) -> Optional[TrainingJob]:
+        """
+        The job started last if it is still active, a job whose process is gone is marked failed
+        """
+        active_job_id = self.job_store.read_active_job_id()
+        if active_job_id is None:
+            return None
+
+        job = self.job_store.read(active_job_id)
+        if job is None or not job.is_active:
+            return None
+
+        if not is_process_alive(job.pid):
+            _set_status("failed", f"Training process {job.pid} is gone")(job)
+            self.job_store.write(job)
+            return None
+
+        return job
+
+    def submit(self) -> TrainingJob:
+        """
+        Start a training job or attach to the one already running
+        :return: TrainingJob
+        """
+        try:
+            with self.job_store.lock():
+                active_job = self._get_active_job()
+                if active_job is not None:
+                    logging.info(f"Training job {active_job.job_id} is already running")
+                    return active_job
+
+                job = TrainingJob(job_id=uuid.uuid4().hex)
+                self.job_store.trim(self.training_job_config.history_size, keep=job.job_id)
+
+                # not daemonic, so the pipeline can start its own worker processes, e.g. joblib n_jobs
+                process = self._mp_context.Process(
+                    target=self.run_job,
+                    args=(job.job_id, self.job_store.job_dir),
+                    name=f"usvisa-training-{job.job_id}",
+                    daemon=False,
+                )
+                process.start()
+                job.pid = process.pid
+                self.job_store.write(job)
+                self.job_store.write_active_job_id(job.job_id)
+
+            with self._lock:
+                self._processes[job.job_id] = process
+            logging.info(f"Started training job {job.job_id} in process {process.pid}")
+
+            threading.Thread(
+                target=self._watch,
+                args=(job.job_id, process),
+                name=f"usvisa-training-watch-{job.job_id}",
+                daemon=True,
+            ).start()
+
+            return job
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def _watch(self, job_id: str, process) -> None:
+        process.join()
+        with self._lock:
+            self._processes.pop(job_id, None)
+
+        def fail_if_active(job: TrainingJob) -> None:
+            if job.is_active:
+                _set_status("failed", f"Training process exited with code {process.exitcode}")(job)
+
+        job = self.job_store.update(job_id, fail_if_active)
+
+        status = job.status if job is not None else None
+        logging.info(f"Training job {job_id} finished with status {status}")
+        if status == "completed" and self.on_completed is not None:
+            self.on_completed()
+
+    def get_job(self, job_id: str) -> Optional[TrainingJob]:
+        try:
+            return self.job_store.read(job_id)
+        except Exception:
+            return None
+
+    def shutdown(self) -> None:
+        """
+        Stop the training processes started by this api process, they are not daemonic and would
+        otherwise keep the interpreter from exiting until they finish
+        """
+        with self._lock:
+            processes = list(self._processes.items())
+
+        for job_id, process in processes:
+            logging.info(f"Stopping training job {job_id} in process {process.pid}")
+            process.terminate()
+            process.join(self.training_job_config.shutdown_timeout_seconds)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+            def fail_if_active(job: TrainingJob) -> None:
+                if job.is_active:
+                    _set_status("failed", "Training process stopped at shutdown")(job)
+
+            self.job_store.update(job_id, fail_if_active)
@@ -5,6 +5,7 @@ from us_visa.entity.config_entity import (
     ModelTrainerConfig,
     ModelEvaluationConfig,
     ModelPusherConfig,
+    TrainingProfileConfig,
 )
 from us_visa.entity.artifact_entity import (
     DataIngestionArtifact,
@@ -21,16 +22,28 @@ from us_visa.components.data_transformation import DataTransformation
 from us_visa.components.model_trainer import ModelTrainer
 from us_visa.components.model_evaluation import ModelEvaluation
 from us_visa.components.model_pusher import ModelPusher
+from us_visa.monitoring.profiler import TrainingProfiler, profile_block
 
 
 import sys
+from typing import Callable, Optional
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 
 
 class TrainingPipeline:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        progress_callback: Optional[Callable[[str, str], None]] = None,
+        training_profile_config: TrainingProfileConfig = TrainingProfileConfig(),
+    ) -> None:
+        """
+        :param progress_callback: Called with (stage_name, state) when a stage starts, completes, fails or is skipped
+        :param training_profile_config: Where and how the per-run stage profile is written
+        """
         try:
+            self.progress_callback = progress_callback
+            self.training_profile_config = training_profile_config
             self.data_ingestion_config = DataIngestionConfig()
             self.data_validation_config = DataValidationConfig()
             self.data_transformation_config = DataTransformationConfig()
@@ -159,29 +172,67 @@ class TrainingPipeline:
         except Exception as e:
             raise USvisaException(e, sys)
 
+    def report_progress(self, stage_name: str, state: str) -> None:
+        if self.progress_callback is not None:
+            self.progress_callback(stage_name, state)
+
+    def run_stage(self, stage_name: str, stage_method: Callable, **kwargs):
+        """
+        Run one start_* method, report its state to the progress callback and record it in the training profile
+        """
+        self.report_progress(stage_name, "running")
+        try:
+            with profile_block(stage_name):
+                artifact = stage_method(**kwargs)
+        except Exception:
+            self.report_progress(stage_name, "failed")
+            raise
+        self.report_progress(stage_name, "completed")
+        return artifact
+
     def run_pipeline(self) -> None:
+        if not self.training_profile_config.enabled:
+            return self._run_pipeline()
+
+        with TrainingProfiler(self.training_profile_config):
+            return self._run_pipeline()
+
+    def _run_pipeline(self) -> None:
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(
-                data_ingestion_artifact=data_ingestion_artifact
+            data_ingestion_artifact = self.run_stage(
+                "data_ingestion", self.start_data_ingestion
             )
-            data_transformation_artifact = self.start_data_transformation(
+            data_validation_artifact = self.run_stage(
+                "data_validation",
+                self.start_data_validation,
+                data_ingestion_artifact=data_ingestion_artifact,
+            )
+            data_transformation_artifact = self.run_stage(
+                "data_transformation",
+                self.start_data_transformation,
                 data_validation_artifact=data_validation_artifact,
                 Data_ingestion_artifact=data_ingestion_artifact,
             )
-            model_trainer_artifact = self.start_model_trainer(
-                data_transformation_artifact=data_transformation_artifact
+            model_trainer_artifact = self.run_stage(
+                "model_trainer",
+                self.start_model_trainer,
+                data_transformation_artifact=data_transformation_artifact,
             )
-            model_evaluation_artifact = self.start_model_evaluation(
+            model_evaluation_artifact = self.run_stage(
+                "model_evaluation",
+                self.start_model_evaluation,
                 model_trainer_artifact=model_trainer_artifact,
                 data_ingestion_artifact=data_ingestion_artifact,
             )
 
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info(f"Model not accepted.")
+                self.report_progress("model_pusher", "skipped")
                 return None
-            model_pusher_artifact = self.start_model_pusher(
-                model_evaluation_artifact=model_evaluation_artifact
+            model_pusher_artifact = self.run_stage(
+                "model_pusher",
+                self.start_model_pusher,
+                model_evaluation_artifact=model_evaluation_artifact,
             )
 
         except Exception as e:
@@ -0,0 +1,110 @@
+import sys
+import time
+from typing import List, Optional
+
+from pandas import DataFrame
+
+from us_visa.constants import SCHEMA_CONFIG_FILE_PATH
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.entity.config_entity import ModelWarmupConfig
+from us_visa.entity.estimator import USVisaModel
+from us_visa.pipeline.prediction_pipeline import USvisaClassifier
+from us_visa.utils.main_utils import read_yaml_files
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+class USvisaModelWarmer:
+    """
+    This class preloads the serving model and runs synthetic predictions through it,
+    so the first real request of a worker does not pay for the download, unpickling and lazy initialization.
+    """
+
+    def __init__(
+        self,
+        model_warmup_config: ModelWarmupConfig = ModelWarmupConfig(),
+        model_predictor: Optional[USvisaClassifier] = None,
+    ) -> None:
+        try:
+            self.model_warmup_config = model_warmup_config
+            self.model_predictor = model_predictor or USvisaClassifier()
+            self._schema_config = read_yaml_files(SCHEMA_CONFIG_FILE_PATH)
+
+            self.is_ready = False
+            self.warmup_seconds: Optional[float] = None
+            self.error: Optional[str] = None
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def get_synthetic_records(self, model: USVisaModel) -> List[dict]:
+        """
+        Build applications that cover every category the fitted encoders know for the schema columns
+        """
+        try:
+            compiled_preprocessor = getattr(model, "compiled_preprocessor", None)
+            if compiled_preprocessor is None:
+                compiled_preprocessor = CompiledPreprocessor.compile(model.preprocessing_object)
+            categories = compiled_preprocessor.categories()
+
+            categorical_columns = (
+                self._schema_config["oh_columns"] + self._schema_config["or_columns"]
+            )
+            numerical_columns = self._schema_config["num_features"]
+
+            n_records = max(
+                [len(categories[column]) for column in categorical_columns]
+                + [self.model_warmup_config.n_records]
+            )
+
+            records = []
+            for i in range(n_records):
+                record = {
+                    column: categories[column][i % len(categories[column])]
+                    for column in categorical_columns
+                }
+                for column in numerical_columns:
+                    record[column] = 10 ** (i % 5)
+                records.append(record)
+
+            return records
+
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def warm_up(self) -> float:
+        """
+        Load the model into the model cache and predict the synthetic applications one by one and as a batch
+        :return: Warm up duration in seconds
+        """
+        logging.info("Entered warm_up method of USvisaModelWarmer class")
+        try:
+            start = time.perf_counter()
+
+            model = self.model_predictor.load_model()
+            records = self.get_synthetic_records(model)
+
+            for _ in range(self.model_warmup_config.rounds):
+                for record in records:
+                    model.predict_records([record])
+                model.predict(DataFrame(records))
+
+            self.warmup_seconds = time.perf_counter() - start
+            self.is_ready = True
+            self.error = None
+
+            logging.info(
+                f"Warmed up model with {len(records)} synthetic records in {self.warmup_seconds:.3f} seconds"
+            )
+            return self.warmup_seconds
+
+        except Exception as e:
+            self.error = str(e)
+            raise USvisaException(e, sys)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+        }
@@ -0,0 +1,173 @@
+import os
+import sys
+import shutil
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from us_visa.constants import FEATURE_STORE_COMPRESSION
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+FILE_FORMATS = ("csv", "parquet", "feather")
+
+# column types of config/schema.yaml
+ARROW_TYPES = {
+    "category": pa.string(),
+    "int": pa.int64(),
+    "float": pa.float64(),
+}
+
+
+def get_file_format(file_path: str) -> str:
+    """
+    :return: csv, parquet or feather, from the extension of file_path
+    """
+    file_format = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if file_format not in FILE_FORMATS:
+        raise Exception(f"Unknown feature store file format of {file_path}, expected one of {FILE_FORMATS}")
+    return file_format
+
+
+def get_arrow_schema(schema_config: dict, dataframe: Optional[pd.DataFrame] = None) -> pa.Schema:
+    """
+    Arrow schema with the types of config/schema.yaml, for the columns of dataframe or all the schema columns.
+    Columns that are not in the schema keep the type arrow infers for them
+    """
+    column_types = {}
+    for column in schema_config["columns"]:
+        column_types.update(column)
+
+    if dataframe is None:
+        return pa.schema([(name, ARROW_TYPES[column_type]) for name, column_type in column_types.items()])
+
+    fields = []
+    for name in dataframe.columns:
+        if name in column_types:
+            fields.append((name, ARROW_TYPES[column_types[name]]))
+        else:
+            fields.append((name, pa.array(dataframe[name], from_pandas=True).type))
+    return pa.schema(fields)
+
+
+class FeatureStoreWriter:
+    """
+    This class writes dataframes to one csv, parquet or feather file as they come, e.g. one chunk of an export at a time.
+    Parquet and feather columns get the types of the arrow schema and are compressed, every write is a row group
+    or a record batch of the file
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        arrow_schema: pa.Schema,
+        file_format: Optional[str] = None,
+        compression: str = FEATURE_STORE_COMPRESSION,
+        header: bool = True,
+    ) -> None:
+        """
+        :param arrow_schema: Columns of the file, see get_arrow_schema
+        :param file_format: Format of the file, taken from the extension of file_path by default
+        :param compression: Codec of parquet and feather files, e.g. zstd, lz4 or uncompressed
+        :param header: Write the header line of a csv file
+        """
+        try:
+            self.file_path = file_path
+            self.arrow_schema = arrow_schema
+            self.file_format = file_format or get_file_format(file_path)
+            self.rows = 0
+            codec = None if compression == "uncompressed" else compression
+
+            if self.file_format == "parquet":
+                self._writer = pq.ParquetWriter(file_path, arrow_schema, compression=codec or "none")
+            elif self.file_format == "feather":
+                self._writer = pa.ipc.new_file(
+                    file_path, arrow_schema, options=pa.ipc.IpcWriteOptions(compression=codec)
+                )
+            else:
+                self._writer = open(file_path, "w", newline="")
+                if header:
+                    self._writer.write(",".join(arrow_schema.names) + "\n")
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def write(self, dataframe: pd.DataFrame) -> None:
+        try:
+            dataframe = dataframe[self.arrow_schema.names]
+            if self.file_format == "csv":
+                dataframe.to_csv(self._writer, index=False, header=False)
+            elif len(dataframe):
+                self._writer.write_table(
+                    pa.Table.from_pandas(dataframe, schema=self.arrow_schema, preserve_index=False)
+                )
+            self.rows += len(dataframe)
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def append_file(self, file_path: str) -> None:
+        """
+        Append the rows of a file written by a FeatureStoreWriter with the same schema and format,
+        record batch by record batch or, for a csv file without header, byte for byte
+        """
+        try:
+            if self.file_format == "csv":
+                with open(file_path, "r", newline="") as csv_file:
+                    shutil.copyfileobj(csv_file, self._writer)
+            elif self.file_format == "parquet":
+                parquet_file = pq.ParquetFile(file_path, memory_map=True)
+                for row_group in range(parquet_file.num_row_groups):
+                    self._writer.write_table(parquet_file.read_row_group(row_group))
+            else:
+                with pa.memory_map(file_path) as source:
+                    reader = pa.ipc.open_file(source)
+                    for batch in range(reader.num_record_batches):
+                        self._writer.write_batch(reader.get_batch(batch))
+        except Exception as e:
+            raise USvisaException(e, sys)
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self) -> "FeatureStoreWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_dataframe(file_path: str, dataframe: pd.DataFrame, schema_config: dict) -> None:
+    """
+    Write the dataframe to file_path in the format of its extension, with the column types of schema_config
+    """
+    logging.info("Entered the write_dataframe method of utils")
+    try:
+        dir_path = os.path.dirname(file_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        with FeatureStoreWriter(file_path, get_arrow_schema(schema_config, dataframe)) as writer:
+            writer.write(dataframe)
+
+        logging.info("Exited the write_dataframe method of utils")
+    except Exception as e:
+        raise USvisaException(e, sys)
+
+
+def read_dataframe(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read a csv, parquet or feather file. Parquet and feather files are memory mapped
+    and only the requested columns are read from them
+    :param columns: Columns to read, all of them by default
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "parquet":
+            return pq.read_table(file_path, columns=columns, memory_map=True).to_pandas()
+        if file_format == "feather":
+            return feather.read_table(file_path, columns=columns, memory_map=True).to_pandas()
+        return pd.read_csv(file_path, usecols=columns)
+    except Exception as e:
+        raise USvisaException(e, sys)
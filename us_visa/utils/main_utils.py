@@ -1,8 +1,11 @@
 import os
 import sys
+import fcntl
 import yaml, dill
+from contextlib import contextmanager
 from pandas import DataFrame
 import numpy as np
+from us_visa.constants import TARGET_COLUMN
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 
@@ -22,6 +25,46 @@ def drop_columns(df: DataFrame, columns: list) -> DataFrame:
         raise USvisaException(e, sys)
 
 
+def get_training_columns(schema_config: dict) -> list:
+    """
+    Columns of the ingested data that training and evaluation read, in schema order:
+    the model features, yr_of_estab that company_age is derived from and the target
+    """
+    used_columns = set(
+        schema_config["oh_columns"]
+        + schema_config["or_columns"]
+        + schema_config["num_features"]
+        + schema_config["transform_columns"]
+        + ["yr_of_estab", TARGET_COLUMN]
+    )
+    return [
+        name
+        for column in schema_config["columns"]
+        for name in column
+        if name in used_columns
+    ]
+
+
+# FILE LOCKS
+@contextmanager
+def file_lock(lock_file_path: str):
+    """
+    Hold an exclusive flock on lock_file_path, shared by the threads and the processes of the host.
+    The kernel drops the lock of a process that dies, so a crashed holder never blocks the others
+    """
+    dir_path = os.path.dirname(lock_file_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+
+    fd = os.open(lock_file_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # closing the descriptor releases the lock
+        os.close(fd)
+
+
 # YAML FILES
 def read_yaml_files(file_path) -> dict:
     try: